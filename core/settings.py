@@ -99,6 +99,30 @@ DATABASES = {
     }
 }
 
+# Cache
+# En desarrollo/tests se usa memoria local; en producción el catálogo público
+# se cachea en disco (o en DB con CATALOGO_CACHE_BACKEND=...db.DatabaseCache
+# y `python manage.py createcachetable`).
+CATALOGO_CACHE_ALIAS = "catalogo"
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "catalogo": {
+        "BACKEND": os.getenv(
+            "CATALOGO_CACHE_BACKEND",
+            "django.core.cache.backends.locmem.LocMemCache" if DEBUG
+            else "django.core.cache.backends.filebased.FileBasedCache",
+        ),
+        "LOCATION": os.getenv("CATALOGO_CACHE_LOCATION", str(BASE_DIR / "cache" / "catalogo")),
+        "TIMEOUT": int(os.getenv("CATALOGO_CACHE_TIMEOUT", "600")),
+    },
+}
+
+# Snapshot de KPIs del panel admin: cache compartido entre procesos para que
+# el comando refrescar_resumen_admin y los workers web vean el mismo valor
+KPIS_CACHE_ALIAS = os.getenv("KPIS_CACHE_ALIAS", CATALOGO_CACHE_ALIAS)
+
 # Static
 STATIC_URL = "/static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
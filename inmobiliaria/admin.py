@@ -3,6 +3,8 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from .models import *
 from .utils import slots_disponibles_para_propiedad
+from .aprobaciones import transicionar_propiedades
+from .conciliacion import conciliar, fila_reporte, ENCABEZADO_REPORTE
 
 def _choices_from_times(times):
     return [(t.strftime("%H:%M"), t.strftime("%H:%M")) for t in times]
@@ -27,8 +29,26 @@ class UsuarioAdmin(UserAdmin):
 
 @admin.action(description="Aprobar propiedades seleccionadas")
 def aprobar_propiedades(modeladmin, request, queryset):
-    updated = queryset.update(aprobada=True)
-    modeladmin.message_user(request, f"{updated} propiedades aprobadas.")
+    _transicionar(modeladmin, request, queryset, "aprobar", "aprobadas")
+
+@admin.action(description="Pausar propiedades seleccionadas")
+def pausar_propiedades(modeladmin, request, queryset):
+    _transicionar(modeladmin, request, queryset, "pausar", "pausadas")
+
+@admin.action(description="Rechazar propiedades seleccionadas")
+def rechazar_propiedades(modeladmin, request, queryset):
+    _transicionar(modeladmin, request, queryset, "rechazar", "rechazadas")
+
+def _transicionar(modeladmin, request, queryset, accion, participio):
+    # Historial y notificaciones en lote (ver aprobaciones.transicionar_propiedades)
+    resultado = transicionar_propiedades(
+        queryset.values("id"), accion, usuario=request.user.get_username()
+    )
+    modeladmin.message_user(
+        request,
+        f"{len(resultado['actualizadas'])} propiedades {participio} "
+        f"({len(resultado['sin_cambio'])} ya estaban así).",
+    )
 
 @admin.action(description="Marcar notificaciones como leídas")
 def marcar_leidas(modeladmin, request, queryset):
@@ -43,7 +63,7 @@ class PropiedadAdmin(admin.ModelAdmin):
     list_filter  = ("aprobada", "estado", "tipo", "ciudad")
     search_fields = ("titulo", "ciudad", "propietario__rut", "propietario__primer_nombre")
     list_display_links = ("titulo",) 
-    actions = [aprobar_propiedades]
+    actions = [aprobar_propiedades, pausar_propiedades, rechazar_propiedades]
 
     def has_change_permission(self, request, obj=None):
         if request.user.is_superuser or getattr(request.user, "rol", "") == "ADMIN":
@@ -76,6 +96,74 @@ class NotificacionAdmin(admin.ModelAdmin):
     search_fields = ("titulo", "mensaje", "usuario__username", "usuario__email")
     actions = [marcar_leidas]
 
+
+@admin.register(NotificacionOutbox)
+class NotificacionOutboxAdmin(admin.ModelAdmin):
+    list_display = ("id", "evento", "estado", "intentos", "disponible_en", "created_at", "procesado_en")
+    list_filter = ("estado",)
+    search_fields = ("evento",)
+    readonly_fields = ("payload", "ultimo_error", "created_at", "procesado_en")
+
+class CartolaForm(forms.Form):
+    archivo = forms.FileField(help_text="CSV con columnas fecha, monto, rut y opcional descripcion")
+    ventana = forms.IntegerField(min_value=0, max_value=60, initial=5, help_text="Días de tolerancia")
+    simular = forms.BooleanField(required=False, help_text="Concilia sin registrar pagos")
+
+
+@admin.register(Pago)
+class PagoAdmin(admin.ModelAdmin):
+    list_display = ("id", "contrato", "fecha", "monto", "medio")
+    list_filter = ("medio", "fecha")
+    change_list_template = "admin/inmobiliaria/pago/change_list.html"
+    MAX_FILAS_REPORTE = 500
+
+    def get_urls(self):
+        from django.urls import path
+        propias = [
+            path(
+                "conciliar/",
+                self.admin_site.admin_view(self.conciliar_view),
+                name="inmobiliaria_pago_conciliar",
+            ),
+        ]
+        return propias + super().get_urls()
+
+    def conciliar_view(self, request):
+        import io
+        from django.core.exceptions import PermissionDenied
+        from django.template.response import TemplateResponse
+
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+
+        resumen, filas = None, []
+        form = CartolaForm(request.POST or None, request.FILES or None)
+        if request.method == "POST" and form.is_valid():
+            # El archivo subido se lee en streaming; en pantalla se muestran las primeras líneas del reporte
+            def reportar(linea, motivo):
+                if len(filas) < self.MAX_FILAS_REPORTE:
+                    filas.append(fila_reporte(linea, motivo))
+
+            archivo = io.TextIOWrapper(form.cleaned_data["archivo"].file, encoding="utf-8-sig", newline="")
+            resumen = conciliar(
+                archivo, reportar,
+                ventana=form.cleaned_data["ventana"],
+                simular=form.cleaned_data["simular"],
+            )
+
+        contexto = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Conciliar cartola bancaria",
+            "form": form,
+            "resumen": resumen,
+            "encabezado": ENCABEZADO_REPORTE,
+            "filas": filas,
+            "max_filas": self.MAX_FILAS_REPORTE,
+        }
+        return TemplateResponse(request, "admin/inmobiliaria/pago/conciliar.html", contexto)
+
+
 class VisitaAdminForm(forms.ModelForm):
     class Meta:
         model = Visita
@@ -138,7 +226,8 @@ admin.site.register(Interesado)
 admin.site.register(Reserva)
 admin.site.register(Contrato)
 admin.site.register(Historial)
-admin.site.register(Pago)
+admin.site.register(HistorialArchivado)
+admin.site.register(SaldoContrato)
 admin.site.register(PropiedadFoto)
 admin.site.register(PropiedadDocumento)
 
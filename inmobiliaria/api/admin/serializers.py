@@ -5,6 +5,7 @@ from inmobiliaria.config import *
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import Prefetch, Q
 from datetime import timedelta
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
@@ -137,65 +138,110 @@ class AdminUsuarioSerializer(serializers.ModelSerializer):
         ]
 
     def get_perfil(self, obj):
-        email = (obj.email or "").strip().lower()
-
-        # ---- PROPIETARIO ----
-        p = Propietario.objects.filter(email__iexact=email).first()
-        if p:
-            dir_p = (
-                p.direcciones.filter(principal=True)
-                .select_related("comuna", "region")
-                .first()
-            )
+        # El listado pasa los perfiles de la página ya resueltos (ver resolver_perfiles)
+        perfiles = self.context.get("perfiles")
+        if perfiles is None:
+            perfiles = resolver_perfiles([obj])
+        return perfiles.get(obj.pk)
+
 
-            direccion_data = None
-            if dir_p:
-                direccion_data = {
-                    "id": dir_p.id,
-                    "calle_o_pasaje": dir_p.calle_o_pasaje or "",
-                    "numero": dir_p.numero or "",
-                    "poblacion_o_villa": dir_p.poblacion_o_villa or "",
-                    "comuna_id": dir_p.comuna_id,
-                    "region_id": dir_p.region_id,
-                    "comuna_nombre": dir_p.comuna.nombre_comuna if dir_p.comuna else "",
-                    "region_nombre": dir_p.region.nombre_region if dir_p.region else "",
-                    "referencia": dir_p.referencia or "",
-                    "codigo_postal": dir_p.codigo_postal or "",
-                }
-
-            return {
-                "tipo": "PROPIETARIO",
-                "id": p.id,
-                "nombre": f"{p.primer_nombre} {p.primer_apellido}".strip(),
-                "rut": p.rut,
-                "telefono": p.telefono,
-                "email": p.email,
-                "primer_nombre": p.primer_nombre,
-                "segundo_nombre": p.segundo_nombre,
-                "primer_apellido": p.primer_apellido,
-                "segundo_apellido": p.segundo_apellido,
-                "direccion_principal": direccion_data,
-            }
-
-        # ---- CLIENTE / INTERESADO ----
-        c = Interesado.objects.filter(email__iexact=email).first()
-        if c:
-            return {
-                "tipo": "CLIENTE",
-                "id": c.id,
-                "nombre": f"{c.primer_nombre} {c.primer_apellido}".strip(),
-                "rut": c.rut,
-                "telefono": c.telefono,
-                "email": c.email,
-                "primer_nombre": c.primer_nombre,
-                "segundo_nombre": c.segundo_nombre,
-                "primer_apellido": c.primer_apellido,
-                "segundo_apellido": c.segundo_apellido,
-                "direccion_principal": None,
-            }
-
-        # ---- SIN PERFIL ----
+def _datos_direccion(dir_p):
+    if dir_p is None:
         return None
+    return {
+        "id": dir_p.id,
+        "calle_o_pasaje": dir_p.calle_o_pasaje or "",
+        "numero": dir_p.numero or "",
+        "poblacion_o_villa": dir_p.poblacion_o_villa or "",
+        "comuna_id": dir_p.comuna_id,
+        "region_id": dir_p.region_id,
+        "comuna_nombre": dir_p.comuna.nombre_comuna if dir_p.comuna else "",
+        "region_nombre": dir_p.region.nombre_region if dir_p.region else "",
+        "referencia": dir_p.referencia or "",
+        "codigo_postal": dir_p.codigo_postal or "",
+    }
+
+
+def _datos_perfil(tipo, p, direccion=None):
+    return {
+        "tipo": tipo,
+        "id": p.id,
+        "nombre": f"{p.primer_nombre} {p.primer_apellido}".strip(),
+        "rut": p.rut,
+        "telefono": p.telefono,
+        "email": p.email,
+        "primer_nombre": p.primer_nombre,
+        "segundo_nombre": p.segundo_nombre,
+        "primer_apellido": p.primer_apellido,
+        "segundo_apellido": p.segundo_apellido,
+        "direccion_principal": direccion,
+    }
+
+
+def _emparejar(usuarios, perfiles):
+    # {user_id: perfil}: primero por FK usuario, luego por email normalizado; ante duplicados gana el id menor
+    por_usuario, por_email = {}, {}
+    for p in sorted(perfiles, key=lambda p: p.id):
+        if p.usuario_id:
+            por_usuario.setdefault(p.usuario_id, p)
+        if p.email:
+            por_email.setdefault(p.email.strip().lower(), p)
+    resultado = {}
+    for u in usuarios:
+        p = por_usuario.get(u.pk) or por_email.get((u.email or "").strip().lower())
+        if p is not None:
+            resultado[u.pk] = p
+    return resultado
+
+
+def resolver_perfiles(usuarios):
+    """
+    Resuelve el perfil de cada usuario en dos consultas (Propietario con su
+    dirección principal precargada, e Interesado). Retorna {user_id: dict | None}.
+    """
+    usuarios = list(usuarios)
+    if not usuarios:
+        return {}
+    ids = [u.pk for u in usuarios]
+    emails = {(u.email or "").strip().lower() for u in usuarios} - {""}
+    filtro = Q(usuario_id__in=ids) | Q(email__in=emails)
+
+    propietarios = _emparejar(
+        usuarios,
+        Propietario.objects.filter(filtro).prefetch_related(
+            Prefetch(
+                "direcciones",
+                queryset=(
+                    Direccion_propietario.objects.filter(principal=True)
+                    .select_related("comuna", "region")
+                    .order_by("id")
+                ),
+                to_attr="direcciones_principales",
+            )
+        ),
+    )
+    # Los clientes solo se buscan para quienes no resultaron propietarios
+    restantes = [u for u in usuarios if u.pk not in propietarios]
+    clientes = {}
+    if restantes:
+        ids = [u.pk for u in restantes]
+        emails = {(u.email or "").strip().lower() for u in restantes} - {""}
+        clientes = _emparejar(
+            restantes,
+            Interesado.objects.filter(Q(usuario_id__in=ids) | Q(email__in=emails)),
+        )
+
+    perfiles = {}
+    for u in usuarios:
+        if u.pk in propietarios:
+            p = propietarios[u.pk]
+            principal = p.direcciones_principales[0] if p.direcciones_principales else None
+            perfiles[u.pk] = _datos_perfil("PROPIETARIO", p, _datos_direccion(principal))
+        elif u.pk in clientes:
+            perfiles[u.pk] = _datos_perfil("CLIENTE", clientes[u.pk])
+        else:
+            perfiles[u.pk] = None
+    return perfiles
 
 
 class AdminUsuarioUpdateSerializer(serializers.Serializer):
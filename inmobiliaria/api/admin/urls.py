@@ -1,6 +1,7 @@
 from django.urls import path
 from .views import (
     admin_resumen,
+    admin_kpis,
     admin_usuarios_list,
     admin_usuario_detail,
     admin_usuario_desactivar,
@@ -16,6 +17,7 @@ from .views import (
 
 urlpatterns = [
     path("resumen/", admin_resumen),
+    path("kpis/", admin_kpis),
     path("propietarios/", AdminPropietarioListCreateView.as_view()),
     path("propietarios/<int:pk>/", AdminPropietarioRetrieveUpdateView.as_view()),
     path("propiedades/", AdminPropiedadListCreateView.as_view()),
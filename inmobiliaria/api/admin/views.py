@@ -1,3 +1,5 @@
+from datetime import datetime, timedelta
+
 from django.db.models import Sum, Q
 from django.utils import timezone
 from django.contrib.auth import get_user_model
@@ -10,6 +12,10 @@ from rest_framework.permissions import IsAdminUser
 
 from inmobiliaria.models import Propietario, Propiedad, SolicitudCliente, Reserva, Pago
 from inmobiliaria.permisssions_roles import IsAdmin
+from inmobiliaria.kpis import respuesta_resumen, serie_kpis
+from inmobiliaria.busqueda import buscar_usuarios
+from inmobiliaria.config import MAX_DIAS_KPIS
+from inmobiliaria.pagination import PaginacionMixta
 
 from .serializers import *
 from inmobiliaria.serializers import SolicitudClienteSerializer
@@ -18,38 +24,31 @@ from inmobiliaria.serializers import SolicitudClienteSerializer
 @api_view(["GET"])
 @permission_classes([permissions.IsAuthenticated, IsAdmin])
 def admin_resumen(request):
-    hoy = timezone.localdate()
-
-    propiedades_por_aprobar = Propiedad.objects.filter(
-        estado_aprobacion__in=["pendiente", "en_revision"]
-    ).count()
-
-    reservas_activas = Reserva.objects.filter(
-        activa=True,
-        expires_at__gt=timezone.now(),
-    ).count()
-
-    solicitudes_nuevas = SolicitudCliente.objects.filter(
-        estado="nueva"
-    ).count()
-
-    pagos_mes = (
-        Pago.objects.filter(
-            fecha__year=hoy.year,
-            fecha__month=hoy.month,
-        ).aggregate(total=Sum("monto"))["total"]
-        or 0
-    )
+    # Snapshot cacheado (ver kpis.resumen_admin); el cálculo vive en kpis.calcular_resumen
+    return Response(respuesta_resumen())
 
-    data = {
-        "total_propiedades": Propiedad.objects.count(),
-        "total_propietarios": Propietario.objects.count(),
-        "propiedades_por_aprobar": propiedades_por_aprobar,
-        "reservas_activas": reservas_activas,
-        "solicitudes_nuevas": solicitudes_nuevas,
-        "pagos_mes": pagos_mes,
-    }
-    return Response(data)
+@api_view(["GET"])
+@permission_classes([permissions.IsAuthenticated, IsAdmin])
+def admin_kpis(request):
+    # Serie histórica desde el acumulado diario: ?desde=YYYY-MM-DD&hasta=YYYY-MM-DD&agrupar=dia|semana|mes
+    hoy = timezone.localdate()
+    try:
+        hasta = datetime.strptime(request.query_params["hasta"], "%Y-%m-%d").date() if request.query_params.get("hasta") else hoy
+        desde = datetime.strptime(request.query_params["desde"], "%Y-%m-%d").date() if request.query_params.get("desde") else hasta - timedelta(days=29)
+    except ValueError:
+        return Response({"detail": "Formato de fecha inválido (YYYY-MM-DD)"}, status=status.HTTP_400_BAD_REQUEST)
+    agrupar = request.query_params.get("agrupar", "dia")
+    if agrupar not in ("dia", "semana", "mes"):
+        return Response({"detail": "agrupar debe ser dia, semana o mes"}, status=status.HTTP_400_BAD_REQUEST)
+    if desde > hasta or (hasta - desde).days > MAX_DIAS_KPIS:
+        return Response({"detail": f"Rango inválido (máximo {MAX_DIAS_KPIS} días)"}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        "desde": desde,
+        "hasta": hasta,
+        "agrupar": agrupar,
+        "series": serie_kpis(desde, hasta, agrupar),
+    })
 
 # PROPIETARIO
 class AdminPropietarioListCreateView(generics.ListCreateAPIView):
@@ -67,6 +66,8 @@ class AdminPropiedadListCreateView(generics.ListCreateAPIView):
     queryset = Propiedad.objects.select_related('propietario').all().order_by('-id')
     serializer_class = AdminPropiedadSerializer
     permission_classes = [permissions.IsAuthenticated, IsAdmin]
+    pagination_class = PaginacionMixta
+    cursor_ordering = ("-id",)
 
 
 class AdminPropiedadRetrieveUpdateView(generics.RetrieveUpdateAPIView):
@@ -104,39 +105,15 @@ def admin_usuarios_list(request):
             qs = qs.filter(rol=rol)
 
         if search:
-            search_l = search.lower()
-
-            emails_perfiles = set(
-                Propietario.objects.filter(
-                    Q(email__icontains=search_l)
-                    | Q(rut__icontains=search_l)
-                    | Q(primer_nombre__icontains=search_l)
-                    | Q(primer_apellido__icontains=search_l)
-                    | Q(segundo_nombre__icontains=search_l)
-                    | Q(segundo_apellido__icontains=search_l)
-                ).values_list("email", flat=True)
-            )
-
-            emails_perfiles |= set(
-                Interesado.objects.filter(
-                    Q(email__icontains=search_l)
-                    | Q(rut__icontains=search_l)
-                    | Q(primer_nombre__icontains=search_l)
-                    | Q(primer_apellido__icontains=search_l)
-                    | Q(segundo_nombre__icontains=search_l)
-                    | Q(segundo_apellido__icontains=search_l)
-                ).values_list("email", flat=True)
-            )
-
-            emails_perfiles = [e.strip().lower() for e in emails_perfiles if e]
-
-            qs = qs.filter(
-                Q(email__icontains=search_l)
-                | Q(username__icontains=search_l)
-                | Q(email__in=emails_perfiles)
-            )
-
-        return Response(AdminUsuarioSerializer(qs, many=True).data)
+            # Prefijos sobre el índice de personas (usuario + propietario + interesado), por relevancia
+            qs = buscar_usuarios(qs, search)
+
+        paginador = PaginacionMixta()
+        pagina = paginador.paginate_queryset(qs, request)
+        ser = AdminUsuarioSerializer(
+            pagina, many=True, context={"request": request, "perfiles": resolver_perfiles(pagina)}
+        )
+        return paginador.get_paginated_response(ser.data)
 
     # ---- POST: crear usuario + perfil ----
     ser = AdminUsuarioCreateSerializer(data=request.data)
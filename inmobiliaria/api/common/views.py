@@ -9,6 +9,9 @@ from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework_simplejwt.views import TokenObtainPairView
 
 from inmobiliaria.models import Propiedad, Contrato, Pago, Reserva
+from inmobiliaria.utils import con_fotos, con_totales_pago
+from inmobiliaria.cache import cache_catalogo, version_catalogo, clave_catalogo, etag_catalogo
+from inmobiliaria.filters import BusquedaTextoFilter
 from inmobiliaria.serializers import (
     PropiedadConFotosSerializer,
     ContratoSerializer,
@@ -64,7 +67,7 @@ class CustomTokenObtainPairView(TokenObtainPairView):
 class CatalogoPropiedadesView(generics.ListAPIView):
     permission_classes = [AllowAny]
     serializer_class = PropiedadConFotosSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, BusquedaTextoFilter]
 
     # filtros básicos
     filterset_fields = {
@@ -74,12 +77,28 @@ class CatalogoPropiedadesView(generics.ListAPIView):
         "baos": ["gte", "lte"],     
         "precio": ["gte", "lte"],
     }
-    search_fields = ["titulo", "descripcion", "ciudad"]
     ordering_fields = ["precio", "metros2", "dormitorios", "baos", "fecha_registro"]
     ordering = ["-fecha_registro"]
 
     def get_queryset(self):
-        return Propiedad.objects.filter(aprobada=True).order_by("-fecha_registro")
+        return con_fotos(Propiedad.objects.filter(aprobada=True).order_by("-fecha_registro"))
+
+    def list(self, request, *args, **kwargs):
+        # Respuesta cacheada por query normalizada; la versión del catálogo
+        # cambia con cada escritura de Propiedad/PropiedadFoto y la invalida.
+        clave = clave_catalogo(request, version_catalogo())
+        etag = etag_catalogo(clave)
+        headers = {"ETag": etag, "Cache-Control": "public, max-age=0, must-revalidate"}
+
+        if etag in request.headers.get("If-None-Match", ""):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        cache = cache_catalogo()
+        data = cache.get(clave)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(clave, data)
+        return Response(data, headers=headers)
 
 
 # Mixtas
@@ -90,16 +109,13 @@ class MisContratosView(generics.ListAPIView):
     def get_queryset(self):
         user = self.request.user
         rol = getattr(user, "rol", "")
+        qs = con_totales_pago(Contrato.objects.select_related("comprador_arrendatario", "propiedad"))
         if rol == "ADMIN":
-            return Contrato.objects.all().select_related("comprador_arrendatario", "propiedad")
+            return qs
         if rol == "CLIENTE":
-            return Contrato.objects.filter(
-                comprador_arrendatario__usuario=user
-            ).select_related("comprador_arrendatario", "propiedad")
+            return qs.filter(comprador_arrendatario__usuario=user)
         if rol == "PROPIETARIO":
-            return Contrato.objects.filter(
-                propiedad__propietario_user=user
-            ).select_related("comprador_arrendatario", "propiedad")
+            return qs.filter(propiedad__propietario_user=user)
         return Contrato.objects.none()
 
 class MisPagosView(generics.ListAPIView):
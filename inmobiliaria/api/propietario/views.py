@@ -2,6 +2,7 @@ from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
 
 from inmobiliaria.models import Propiedad, Propietario, Reserva, Contrato, Pago
+from inmobiliaria.utils import con_fotos, con_totales_pago
 from .serializers import PropietarioPerfilSerializer
 
 from inmobiliaria.serializers import *
@@ -30,7 +31,7 @@ class MisPropiedadesPropietarioView(generics.ListAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        return Propiedad.objects.filter(propietario_user=user).order_by("-fecha_registro")
+        return con_fotos(Propiedad.objects.filter(propietario_user=user).order_by("-fecha_registro"))
 
 
 class MisReservasPropietarioView(generics.ListAPIView):
@@ -53,12 +54,11 @@ class MisContratosPropietarioView(generics.ListAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        return (
+        return con_totales_pago(
             Contrato.objects
             .filter(propiedad__propietario_user=user)
             .select_related("comprador_arrendatario", "propiedad")
-            .order_by("-fecha_firma")
-        )
+        ).order_by("-fecha_firma")
 
 
 class MisPagosPropietarioView(generics.ListAPIView):
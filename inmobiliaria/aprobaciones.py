@@ -0,0 +1,79 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import invalidar_catalogo
+from .models import Propiedad, Historial
+from .notifications import despacho_notificaciones
+
+# accion -> estado_aprobacion destino
+TRANSICIONES = {
+    "aprobar": "aprobada",
+    "rechazar": "rechazada",
+    "pausar": "pausada",
+}
+
+
+def descripcion_aprobacion(antes, despues):
+    return f"Cambio de aprobación: {antes} → {despues}"
+
+
+def aviso_transicion(destino, titulo, ciudad, observacion):
+    if destino == "aprobada":
+        return (
+            "Tu propiedad fue aprobada",
+            f"La propiedad '{titulo}' en {ciudad} ha sido aprobada y ahora es pública.",
+        )
+    if destino == "rechazada":
+        detalle = f" Observación: {observacion}" if observacion else ""
+        return "Tu propiedad fue rechazada", f"La propiedad '{titulo}' fue rechazada.{detalle}"
+    return "Tu propiedad fue pausada", f"La propiedad '{titulo}' fue pausada y dejó de ser pública."
+
+
+def transicionar_propiedades(ids, accion, observacion="", usuario=""):
+    """
+    Aprueba, rechaza o pausa en una transacción las propiedades 'ids' (lista o
+    subconsulta de ids) con un número fijo de consultas: bloqueo y lectura,
+    UPDATE, bulk_create de Historial y de la notificación al propietario.
+    Retorna {"actualizadas": [ids], "sin_cambio": [ids]}.
+    """
+    destino = TRANSICIONES[accion]
+    ahora = timezone.now()
+
+    with transaction.atomic(), despacho_notificaciones() as despacho:
+        filas = list(
+            Propiedad.objects
+            .filter(id__in=ids)
+            .select_for_update()
+            .order_by("id")
+            .values_list("id", "titulo", "ciudad", "estado_aprobacion", "propietario_user_id")
+        )
+        cambian = [f for f in filas if f[3] != destino]
+        sin_cambio = [f[0] for f in filas if f[3] == destino]
+        if not cambian:
+            return {"actualizadas": [], "sin_cambio": sin_cambio}
+
+        valores = {"estado_aprobacion": destino, "aprobada": destino == "aprobada"}
+        if destino == "aprobada":
+            valores.update(observacion_admin="", fecha_aprobacion=ahora)
+        elif destino == "rechazada":
+            valores["observacion_admin"] = observacion
+        Propiedad.objects.filter(id__in=[f[0] for f in cambian]).update(**valores)
+
+        Historial.objects.bulk_create([
+            Historial(
+                propiedad_id=pid,
+                fecha=ahora,
+                accion="cambio_aprobacion",
+                descripcion=descripcion_aprobacion(antes, destino),
+                usuario=usuario[:100],
+            )
+            for pid, _, _, antes, _ in cambian
+        ], batch_size=1000)
+
+        for pid, titulo, ciudad, _, propietario_id in cambian:
+            asunto, mensaje = aviso_transicion(destino, titulo, ciudad, observacion)
+            despacho.agregar(propietario_id, asunto, mensaje, tipo="SISTEMA", evento=(f"propiedad_{destino}", pid))
+
+        transaction.on_commit(invalidar_catalogo)
+
+    return {"actualizadas": [f[0] for f in cambian], "sin_cambio": sin_cambio}
@@ -0,0 +1,184 @@
+import re
+import unicodedata
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+# Pesos para ordenar resultados: documento/email > nombres > contacto
+PESO_DOCUMENTO = 5
+PESO_NOMBRE = 3
+PESO_CONTACTO = 2
+LARGO_TERMINO = 100
+MAX_TERMINOS_CONSULTA = 8
+
+CAMPOS_USUARIO = {"username", "email", "first_name", "last_name"}
+CAMPOS_PERFIL = {
+    "usuario", "email", "primer_nombre", "segundo_nombre",
+    "primer_apellido", "segundo_apellido", "rut", "telefono",
+}
+
+
+def normalizar(texto):
+    # Minúsculas y sin tildes: "Núñez" -> "nunez"
+    t = unicodedata.normalize("NFKD", str(texto or ""))
+    return "".join(c for c in t if not unicodedata.combining(c)).lower().strip()
+
+
+def _palabras(texto):
+    return re.findall(r"[a-z0-9]+", normalizar(texto))
+
+
+def _sumar(terminos, termino, peso):
+    termino = termino[:LARGO_TERMINO]
+    if termino and peso > terminos.get(termino, 0):
+        terminos[termino] = peso
+
+
+def _terminos_texto(terminos, texto, peso):
+    for palabra in _palabras(texto):
+        _sumar(terminos, palabra, peso)
+
+
+def _terminos_email(terminos, email):
+    email = normalizar(email)
+    if not email:
+        return
+    _sumar(terminos, email, PESO_DOCUMENTO)
+    _terminos_texto(terminos, email.split("@")[0], PESO_CONTACTO)
+
+
+def _terminos_rut(terminos, rut):
+    # "12.345.678-K" -> "12345678k" y el cuerpo "12345678"
+    compacto = re.sub(r"[^0-9k]", "", normalizar(rut))
+    if compacto:
+        _sumar(terminos, compacto, PESO_DOCUMENTO)
+        _sumar(terminos, compacto[:-1], PESO_DOCUMENTO)
+
+
+def _terminos_telefono(terminos, telefono):
+    # "+56 9 1234 5678" -> completo, sin código de país (9) y sin prefijo móvil (8)
+    digitos = re.sub(r"\D", "", telefono or "")
+    for sufijo in {digitos, digitos[-9:], digitos[-8:]}:
+        _sumar(terminos, sufijo, PESO_CONTACTO)
+
+
+def _terminos_perfil(terminos, email, nombres, rut, telefono):
+    _terminos_email(terminos, email)
+    for nombre in nombres:
+        _terminos_texto(terminos, nombre, PESO_NOMBRE)
+    _terminos_rut(terminos, rut)
+    _terminos_telefono(terminos, telefono)
+
+
+def reindexar_usuarios(usuario_ids, apps=global_apps):
+    """
+    Reconstruye los términos de búsqueda de 'usuario_ids' con tres lecturas
+    (usuarios, propietarios, interesados), un DELETE y un bulk_create.
+    Un perfil se asocia al usuario por FK o por email normalizado.
+    """
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Propietario = apps.get_model("inmobiliaria", "Propietario")
+    Interesado = apps.get_model("inmobiliaria", "Interesado")
+    Termino = apps.get_model("inmobiliaria", "TerminoBusquedaUsuario")
+
+    ids = {i for i in usuario_ids if i}
+    if not ids:
+        return 0
+
+    terminos, por_email = {}, {}
+    for uid, username, email, nombre, apellido in (
+        User.objects.filter(id__in=ids).values_list("id", "username", "email", "first_name", "last_name")
+    ):
+        t = terminos[uid] = {}
+        _terminos_texto(t, username, PESO_CONTACTO)
+        _terminos_email(t, email)
+        _terminos_texto(t, nombre, PESO_NOMBRE)
+        _terminos_texto(t, apellido, PESO_NOMBRE)
+        if email:
+            por_email.setdefault(email.strip().lower(), []).append(uid)
+
+    if terminos:
+        filtro = Q(usuario_id__in=list(terminos)) | Q(email__in=list(por_email))
+        campos = (
+            "usuario_id", "email", "primer_nombre", "segundo_nombre",
+            "primer_apellido", "segundo_apellido", "rut", "telefono",
+        )
+        for modelo in (Propietario, Interesado):
+            for usuario_id, email, n1, n2, a1, a2, rut, telefono in modelo.objects.filter(filtro).values_list(*campos):
+                destinos = set(por_email.get((email or "").strip().lower(), ()))
+                if usuario_id in terminos:
+                    destinos.add(usuario_id)
+                for uid in destinos:
+                    _terminos_perfil(terminos[uid], email, (n1, n2, a1, a2), rut, telefono)
+
+    filas = [
+        Termino(usuario_id=uid, termino=termino, peso=peso)
+        for uid, t in terminos.items()
+        for termino, peso in t.items()
+    ]
+    with transaction.atomic():
+        Termino.objects.filter(usuario_id__in=ids).delete()
+        Termino.objects.bulk_create(filas, batch_size=1000)
+    return len(filas)
+
+
+def usuarios_vinculados(pares):
+    """Ids de usuarios enlazados a perfiles dados como pares (usuario_id, email)."""
+    User = global_apps.get_model(settings.AUTH_USER_MODEL)
+    ids = {usuario_id for usuario_id, _ in pares if usuario_id}
+    filtro = Q(pk__in=ids)
+    for _, email in pares:
+        if email:
+            filtro |= Q(email__iexact=email.strip())
+    return ids | set(User.objects.filter(filtro).values_list("id", flat=True))
+
+
+def terminos_consulta(texto):
+    t = normalizar(texto)
+    # RUT o teléfono escrito con puntos, guiones o espacios: un solo término compacto
+    if re.search(r"\d", t) and re.fullmatch(r"[\d\s.\-+k]+", t):
+        return [re.sub(r"[^0-9k]", "", t)[:LARGO_TERMINO]]
+    terminos = []
+    for palabra in t.split():
+        for termino in ([palabra] if "@" in palabra else _palabras(palabra)):
+            if termino[:LARGO_TERMINO] not in terminos:
+                terminos.append(termino[:LARGO_TERMINO])
+    return terminos[:MAX_TERMINOS_CONSULTA]
+
+
+def buscar_usuarios(qs, texto):
+    """
+    Filtra 'qs' (usuarios) a quienes tengan, para cada palabra buscada, algún
+    término que empiece con ella; anota 'relevancia' (suma de pesos, las
+    coincidencias exactas cuentan doble) y ordena por ella.
+    """
+    from .models import TerminoBusquedaUsuario
+
+    terminos = terminos_consulta(texto)
+    if not terminos:
+        return qs
+
+    # El término más largo es el más selectivo: acota los candidatos por índice
+    guia = max(terminos, key=len)
+    qs = qs.filter(
+        pk__in=TerminoBusquedaUsuario.objects.filter(termino__startswith=guia).values("usuario_id")
+    )
+
+    cubre = {}
+    relevancia = Value(0)
+    for i, termino in enumerate(terminos):
+        prefijo = Q(terminos_busqueda__termino__startswith=termino)
+        cubre[f"cubre_{i}"] = Count("terminos_busqueda", filter=prefijo)
+        relevancia = (
+            relevancia
+            + Coalesce(Sum("terminos_busqueda__peso", filter=prefijo), 0)
+            + Coalesce(Sum("terminos_busqueda__peso", filter=Q(terminos_busqueda__termino=termino)), 0)
+        )
+    return (
+        qs.annotate(**cubre, relevancia=relevancia)
+        .filter(**{f"{nombre}__gt": 0 for nombre in cubre})
+        .order_by("-relevancia", "-id")
+    )
@@ -0,0 +1,180 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .busqueda import normalizar
+from .utils import upsert
+
+# Índice de texto del catálogo: una fila de IndiceBusquedaPropiedad por propiedad
+# con el texto ya normalizado (sin tildes, minúsculas, sin stopwords, plurales
+# reducidos). En MySQL la columna tiene un índice FULLTEXT; en SQLite se mantiene
+# una tabla FTS5 de contenido externo sincronizada por triggers.
+
+TABLA_FTS = "inmobiliaria_propiedad_fts"
+INDICE_FULLTEXT = "indice_busq_texto_ft"
+
+STOPWORDS = frozenset(
+    "a al con de del el en la las lo los o para por se sin su sus un una unos unas y".split()
+)
+VOCALES = "aeiou"
+
+
+def raiz(palabra):
+    # Plural simple del español: "casas" -> "casa", "ciudades" -> "ciudad"
+    if len(palabra) > 4 and palabra.endswith("es") and palabra[-3] not in VOCALES + "s":
+        return palabra[:-2]
+    if len(palabra) > 3 and palabra.endswith("s") and palabra[-2] in VOCALES:
+        return palabra[:-1]
+    return palabra
+
+
+def tokens(texto):
+    return [raiz(p) for p in re.findall(r"[a-z0-9]+", normalizar(texto)) if p not in STOPWORDS]
+
+
+def texto_indexado(titulo, descripcion, ciudad, tipo, nombres, rut):
+    # El título va dos veces: pesa más en el ranking de ambos motores
+    partes = [titulo, titulo, ciudad, tipo, descripcion, *nombres]
+    texto = " ".join(" ".join(tokens(p)) for p in partes if p)
+    compacto = re.sub(r"[^0-9k]", "", normalizar(rut))
+    return f"{texto} {compacto}".strip()
+
+
+def asegurar_indice(conexion=connection):
+    """
+    Crea, si falta, el índice de texto: FULLTEXT sobre la columna en MySQL, o la
+    tabla FTS5 con sus triggers en SQLite. Idempotente; lo llaman la migración
+    y post_migrate (las bases de test se crean sin migraciones).
+    """
+    from .models import IndiceBusquedaPropiedad
+
+    tabla = IndiceBusquedaPropiedad._meta.db_table
+    with conexion.cursor() as cursor:
+        if conexion.vendor == "mysql":
+            cursor.execute(f"SHOW INDEX FROM `{tabla}` WHERE Key_name = %s", [INDICE_FULLTEXT])
+            if cursor.fetchone() is None:
+                cursor.execute(f"CREATE FULLTEXT INDEX {INDICE_FULLTEXT} ON `{tabla}` (texto)")
+            return
+        if conexion.vendor != "sqlite":
+            return
+
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [TABLA_FTS])
+        if cursor.fetchone() is not None:
+            return
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE {TABLA_FTS} USING fts5("
+            f"texto, content='{tabla}', content_rowid='propiedad_id', "
+            f"tokenize='unicode61 remove_diacritics 2')"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER {TABLA_FTS}_ai AFTER INSERT ON {tabla} BEGIN "
+            f"INSERT INTO {TABLA_FTS}(rowid, texto) VALUES (new.propiedad_id, new.texto); END"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER {TABLA_FTS}_ad AFTER DELETE ON {tabla} BEGIN "
+            f"INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, texto) VALUES ('delete', old.propiedad_id, old.texto); END"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER {TABLA_FTS}_au AFTER UPDATE ON {tabla} BEGIN "
+            f"INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, texto) VALUES ('delete', old.propiedad_id, old.texto); "
+            f"INSERT INTO {TABLA_FTS}(rowid, texto) VALUES (new.propiedad_id, new.texto); END"
+        )
+        # Filas que ya existieran en la tabla de contenido
+        cursor.execute(f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('rebuild')")
+
+
+def _fila_indice(pid, titulo, descripcion, ciudad, tipo, nombre, apellido, rut):
+    from .models import IndiceBusquedaPropiedad
+
+    return IndiceBusquedaPropiedad(
+        propiedad_id=pid,
+        texto=texto_indexado(titulo, descripcion, ciudad, tipo, (nombre, apellido), rut or ""),
+    )
+
+
+def _guardar(filas):
+    from .models import IndiceBusquedaPropiedad
+
+    upsert(IndiceBusquedaPropiedad, filas, "propiedad", ["texto"], batch_size=1000)
+
+
+def indexar_propiedad(propiedad):
+    """Reindexa una instancia ya cargada: solo el upsert (el propietario suele venir en caché)."""
+    p = propiedad.propietario
+    _guardar([_fila_indice(
+        propiedad.pk, propiedad.titulo, propiedad.descripcion, propiedad.ciudad, propiedad.tipo,
+        p.primer_nombre, p.primer_apellido, p.rut,
+    )])
+
+
+def indexar_propiedades(ids):
+    """Recalcula el texto indexado de 'ids' con una lectura y un upsert. Retorna filas escritas."""
+    from .models import Propiedad
+
+    ids = list(ids)
+    if not ids:
+        return 0
+    filas = [
+        _fila_indice(*valores)
+        for valores in Propiedad.objects.filter(id__in=ids).values_list(
+            "id", "titulo", "descripcion", "ciudad", "tipo",
+            "propietario__primer_nombre", "propietario__primer_apellido", "propietario__rut",
+        )
+    ]
+    _guardar(filas)
+    return len(filas)
+
+
+def _consulta(palabras, vendor):
+    # Todas las palabras deben aparecer, como prefijo: "casa talca" -> casa* AND talca*
+    if vendor == "mysql":
+        return " ".join(f"+{p}*" for p in palabras)
+    return " ".join(f'"{p}"*' for p in palabras)
+
+
+def buscar_propiedades(qs, texto):
+    """
+    Filtra 'qs' a las propiedades cuyo texto indexado contiene todas las palabras
+    buscadas (prefijo, sin tildes) y anota 'relevancia' (mayor es mejor).
+    """
+    from .models import Propiedad, IndiceBusquedaPropiedad
+
+    palabras = tokens(texto)
+    if not palabras:
+        return qs
+
+    vendor = connection.vendor
+    if vendor == "mysql":
+        # InnoDB no indexa términos bajo innodb_ft_min_token_size (3 por defecto)
+        palabras = [p for p in palabras if len(p) >= 3]
+        if not palabras:
+            return qs
+    consulta = _consulta(palabras, vendor)
+    qn = connection.ops.quote_name
+    propiedad = qn(Propiedad._meta.db_table)
+    indice = qn(IndiceBusquedaPropiedad._meta.db_table)
+
+    if vendor == "mysql":
+        coincide = "MATCH(i.texto) AGAINST (%s IN BOOLEAN MODE)"
+        ids = RawSQL(f"SELECT i.propiedad_id FROM {indice} i WHERE {coincide}", [consulta])
+        puntaje = RawSQL(
+            f"SELECT {coincide} FROM {indice} i WHERE i.propiedad_id = {propiedad}.id", [consulta]
+        )
+    elif vendor == "sqlite":
+        ids = RawSQL(f"SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s", [consulta])
+        # bm25 es menor cuanto más relevante: se invierte el signo
+        puntaje = RawSQL(
+            f"SELECT -bm25({TABLA_FTS}) FROM {TABLA_FTS} "
+            f"WHERE {TABLA_FTS} MATCH %s AND rowid = {propiedad}.id",
+            [consulta],
+        )
+    else:
+        # Otros motores: LIKE sobre el texto ya normalizado, sin ranking
+        filtro = Q()
+        for p in palabras:
+            filtro &= Q(indice_busqueda__texto__contains=p)
+        return qs.filter(filtro).annotate(relevancia=RawSQL("0", []))
+
+    return qs.filter(pk__in=ids).annotate(relevancia=puntaje)
@@ -0,0 +1,56 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+CATALOGO_VERSION_KEY = "catalogo:version"
+
+
+def cache_catalogo():
+    return caches[getattr(settings, "CATALOGO_CACHE_ALIAS", "default")]
+
+
+def version_catalogo():
+    # Versión actual del catálogo público (se crea en 1 si no existe)
+    cache = cache_catalogo()
+    version = cache.get(CATALOGO_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOGO_VERSION_KEY, 1, timeout=None)
+        version = cache.get(CATALOGO_VERSION_KEY, 1)
+    return version
+
+
+def _incrementar_version():
+    cache = cache_catalogo()
+    try:
+        cache.incr(CATALOGO_VERSION_KEY)
+    except ValueError:
+        # La clave no existía (cache reiniciado): cualquier valor nuevo invalida
+        cache.add(CATALOGO_VERSION_KEY, 2, timeout=None)
+
+
+def invalidar_catalogo():
+    # Se incrementa al confirmar la transacción para no cachear datos aún no visibles
+    transaction.on_commit(_incrementar_version)
+
+
+def normalizar_query(query_params):
+    # Ordena los parámetros y descarta los vacíos para que ?a=1&b= y ?b=&a=1 compartan entrada
+    pares = sorted(
+        (k, v)
+        for k in query_params.keys()
+        for v in query_params.getlist(k)
+        if v != ""
+    )
+    return "&".join(f"{k}={v}" for k, v in pares)
+
+
+def clave_catalogo(request, version):
+    base = f"{request.get_host()}|{request.path}|{normalizar_query(request.query_params)}"
+    digest = hashlib.md5(base.encode("utf-8")).hexdigest()
+    return f"catalogo:v{version}:{digest}"
+
+
+def etag_catalogo(clave):
+    return '"%s"' % clave.split(":", 1)[1]
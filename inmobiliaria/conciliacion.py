@@ -0,0 +1,153 @@
+import bisect
+import csv
+import re
+from collections import namedtuple
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from .cuotas import pagar_cuotas
+from .models import CuotaContrato
+from .validators import normalizar_rut
+
+VENTANA_DIAS = 5
+LOTE = 500
+FORMATOS_FECHA = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y")
+
+LineaCartola = namedtuple("LineaCartola", "numero fecha monto rut descripcion error")
+
+
+def _parsear_monto(texto):
+    # Formato chileno: "1.234.567" o "1.234.567,50"; también acepta "1234567.50"
+    t = re.sub(r"[$\s]", "", texto or "")
+    if "," in t:
+        t = t.replace(".", "").replace(",", ".")
+    elif re.fullmatch(r"-?\d{1,3}(\.\d{3})+", t):
+        t = t.replace(".", "")
+    return Decimal(t).quantize(Decimal("0.01"))
+
+
+def _parsear_fecha(texto):
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime((texto or "").strip(), formato).date()
+        except ValueError:
+            continue
+    raise ValueError(f"fecha inválida '{texto}'")
+
+
+def leer_cartola(fh):
+    """
+    Recorre una cartola CSV (columnas fecha, monto, rut y opcional descripcion)
+    línea a línea, sin cargarla completa. Las líneas mal formadas se entregan
+    con 'error' en vez de cortar la importación.
+    """
+    lector = csv.reader(fh)
+    encabezado = [c.strip().lower() for c in next(lector, [])]
+    for n, valores in enumerate(lector, start=2):
+        if not any(v.strip() for v in valores):
+            continue
+        fila = dict(zip(encabezado, valores))
+        try:
+            fecha = _parsear_fecha(fila.get("fecha"))
+            monto = _parsear_monto(fila.get("monto"))
+        except (ValueError, InvalidOperation) as e:
+            yield LineaCartola(n, None, None, fila.get("rut", ""), fila.get("descripcion", ""), str(e) or "monto inválido")
+            continue
+        yield LineaCartola(n, fecha, monto, normalizar_rut(fila.get("rut", "")), fila.get("descripcion", "").strip(), None)
+
+
+class IndiceCuotas:
+    """
+    Cuotas pendientes indexadas por (RUT del arrendatario, monto), cada una con
+    sus vencimientos ordenados. Se carga una vez por importación.
+    """
+
+    def __init__(self):
+        self.por_clave = {}
+
+    @classmethod
+    def cargar(cls):
+        indice = cls()
+        filas = (
+            CuotaContrato.objects
+            .filter(pagada=False)
+            .values_list("id", "vencimiento", "monto", "contrato__comprador_arrendatario__rut")
+            .iterator(chunk_size=2000)
+        )
+        for cuota_id, vencimiento, monto, rut in filas:
+            indice.por_clave.setdefault((normalizar_rut(rut), monto), []).append((vencimiento, cuota_id))
+        for candidatas in indice.por_clave.values():
+            candidatas.sort()
+        return indice
+
+    def tomar(self, rut, monto, fecha, ventana):
+        """
+        Retira y retorna (cuota_id, None) con el vencimiento más antiguo dentro
+        de fecha ± ventana, o (None, motivo) si no hay candidata.
+        """
+        candidatas = self.por_clave.get((rut, monto))
+        if not candidatas:
+            return None, "sin_cuota"
+        i = bisect.bisect_left(candidatas, (fecha - timedelta(days=ventana), 0))
+        if i == len(candidatas) or candidatas[i][0] > fecha + timedelta(days=ventana):
+            return None, "fuera_de_ventana"
+        return candidatas.pop(i)[1], None
+
+
+def conciliar(fh, reportar, ventana=VENTANA_DIAS, lote=LOTE, simular=False):
+    """
+    Concilia una cartola contra las cuotas pendientes y registra los pagos en
+    lotes de 'lote' líneas (cuotas.pagar_cuotas). Cada línea no conciliada se
+    entrega a reportar(linea, motivo) apenas se conoce. Retorna un resumen.
+    """
+    indice = IndiceCuotas.cargar()
+    resumen = {"lineas": 0, "conciliadas": 0, "no_conciliadas": 0}
+    pendientes = []
+
+    def _no_conciliada(linea, motivo):
+        resumen["no_conciliadas"] += 1
+        reportar(linea, motivo)
+
+    def _registrar():
+        if simular:
+            resumen["conciliadas"] += len(pendientes)
+        else:
+            resultados = pagar_cuotas([
+                {
+                    "cuota": cuota_id,
+                    "monto": linea.monto,
+                    "fecha": linea.fecha,
+                    "medio": "transferencia",
+                    "notas": f"Cartola línea {linea.numero}: {linea.descripcion}".strip(": "),
+                }
+                for linea, cuota_id in pendientes
+            ])
+            for (linea, _), r in zip(pendientes, resultados):
+                if r["estado"] == "pagada":
+                    resumen["conciliadas"] += 1
+                else:
+                    _no_conciliada(linea, r["estado"])
+        pendientes.clear()
+
+    for linea in leer_cartola(fh):
+        resumen["lineas"] += 1
+        if linea.error:
+            _no_conciliada(linea, f"formato: {linea.error}")
+            continue
+        cuota_id, motivo = indice.tomar(linea.rut, linea.monto, linea.fecha, ventana)
+        if cuota_id is None:
+            _no_conciliada(linea, motivo)
+            continue
+        pendientes.append((linea, cuota_id))
+        if len(pendientes) >= lote:
+            _registrar()
+    if pendientes:
+        _registrar()
+    return resumen
+
+
+ENCABEZADO_REPORTE = ["linea", "fecha", "monto", "rut", "descripcion", "motivo"]
+
+
+def fila_reporte(linea, motivo):
+    return [linea.numero, linea.fecha or "", linea.monto if linea.monto is not None else "", linea.rut, linea.descripcion, motivo]
@@ -17,5 +17,42 @@ ESTADOS_ACTIVOS = ("agendada", "confirmada")
 DEFAULT_DAYS_PAGE = 14
 MAX_DAYS_PAGE = 31
 
+# Máximo de propiedades por consulta de agenda en lote
+MAX_PROPIEDADES_AGENDA = 100
+
+# Segundos que un proceso conserva el calendario de feriados en memoria
+FERIADOS_CACHE_TTL = 600
+
+# Outbox de notificaciones: tamaño de lote, reintentos y backoff (segundos)
+OUTBOX_LOTE = 200
+OUTBOX_MAX_INTENTOS = 5
+OUTBOX_BACKOFF_SEG = 30
+# Tiempo que un worker retiene un evento reclamado antes de que otro pueda tomarlo
+OUTBOX_LEASE_SEG = 300
+
+# Límites de la generación de cronogramas de cuotas en lote
+MAX_CUOTAS_CRONOGRAMA = 120
+MAX_CONTRATOS_CRONOGRAMA = 5000
+# Máximo de cuotas por pago en lote
+MAX_PAGOS_LOTE = 5000
+# Máximo de propiedades por transición de aprobación en lote
+MAX_PROPIEDADES_LOTE = 5000
+
+# Segundos que el snapshot de KPIs del panel admin se considera fresco
+ADMIN_RESUMEN_TTL = 60
+
+# Margen (segundos) que acumular_kpis deja sin procesar al avanzar por fecha
+KPIS_MARGEN_SEG = 60
+# Rango máximo (días) de la API de series de KPIs
+MAX_DIAS_KPIS = 3 * 366
+
+# Tramos del reporte de morosidad: (nombre, días de atraso desde, hasta)
+TRAMOS_MOROSIDAD = (
+    ("0-30", 0, 30),
+    ("31-60", 31, 60),
+    ("61-90", 61, 90),
+    ("90+", 91, None),
+)
+
 # Minutos mínimos antes de la reservación (0 = solo bloquear pasado)
 LEAD_MINUTES = 0
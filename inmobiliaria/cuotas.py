@@ -0,0 +1,193 @@
+import calendar
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.utils import timezone
+
+from .feriados import feriados_entre
+from .models import Contrato, CuotaContrato, Pago
+from .notifications import despacho_notificaciones
+from .saldos import calcular_saldos, guardar_saldos
+
+
+def _sumar_meses(fecha, meses, dia):
+    # Mes 'meses' después de 'fecha', en el día 'dia' (o el último día del mes si no existe)
+    total = fecha.year * 12 + fecha.month - 1 + meses
+    anio, mes = divmod(total, 12)
+    mes += 1
+    return date(anio, mes, min(dia, calendar.monthrange(anio, mes)[1]))
+
+
+def calcular_vencimientos(fecha_firma, cantidad, dia=None, feriados=None):
+    """
+    Vencimientos mensuales a partir del mes siguiente a 'fecha_firma'. Un
+    vencimiento que cae en feriado se corre al siguiente día no feriado.
+    Retorna [(fecha_nominal, vencimiento)].
+    """
+    dia = dia or fecha_firma.day
+    nominales = [_sumar_meses(fecha_firma, i, dia) for i in range(1, cantidad + 1)]
+    if feriados is None:
+        feriados = feriados_entre(nominales[0], nominales[-1] + timedelta(days=31)) if nominales else set()
+    resultado = []
+    for nominal in nominales:
+        vencimiento = nominal
+        while vencimiento in feriados:
+            vencimiento += timedelta(days=1)
+        resultado.append((nominal, vencimiento))
+    return resultado
+
+
+def redondear(monto, paso=1):
+    # Redondea al múltiplo de 'paso' más cercano (1 = pesos enteros)
+    paso = Decimal(paso)
+    return ((Decimal(monto) / paso).quantize(Decimal("1"), rounding=ROUND_HALF_UP) * paso).quantize(Decimal("0.01"))
+
+
+def generar_cronogramas(contrato_ids, cantidad, dia=None, monto=None, redondeo=1, reemplazar=False):
+    """
+    Genera el cronograma de cuotas de varios contratos de arriendo con un solo
+    bulk_create. Con 'reemplazar' se borran antes las cuotas pendientes; los
+    meses con una cuota ya pagada se omiten. Retorna (contratos, cuotas creadas).
+    """
+    contratos = list(
+        Contrato.objects.filter(id__in=contrato_ids, tipo="arriendo")
+        .values_list("id", "fecha_firma", "precio_pactado")
+    )
+    if not contratos:
+        return 0, 0
+    ids = [c[0] for c in contratos]
+
+    if reemplazar:
+        # Un solo DELETE sin cargar las cuotas ni emitir post_delete (saldo_cuota_eliminada
+        # recalcularía el saldo por cuota): no tienen dependientes y el saldo se recalcula abajo
+        pendientes = CuotaContrato.objects.filter(contrato_id__in=ids, pagada=False)
+        pendientes._raw_delete(pendientes.db)
+
+    existentes = {
+        (cid, v.year, v.month)
+        for cid, v in CuotaContrato.objects.filter(contrato_id__in=ids).values_list("contrato_id", "vencimiento")
+    }
+
+    # Un solo rango de feriados para todos los contratos
+    primera = min(c[1] for c in contratos)
+    ultima = _sumar_meses(max(c[1] for c in contratos), cantidad, 31)
+    feriados = feriados_entre(primera, ultima + timedelta(days=31))
+
+    nuevas = []
+    for cid, fecha_firma, precio in contratos:
+        valor = redondear(monto if monto is not None else precio, redondeo)
+        for nominal, vencimiento in calcular_vencimientos(fecha_firma, cantidad, dia, feriados):
+            if (cid, nominal.year, nominal.month) in existentes:
+                continue
+            nuevas.append(CuotaContrato(contrato_id=cid, vencimiento=vencimiento, monto=valor))
+
+    CuotaContrato.objects.bulk_create(nuevas, batch_size=1000)
+    # bulk_create no emite señales: se actualiza el saldo de todos los contratos de una vez
+    guardar_saldos(calcular_saldos(ids))
+    return len(ids), len(nuevas)
+
+
+def pagar_cuotas(items):
+    """
+    Paga en una transacción varias cuotas de distintos contratos.
+    'items': [{"cuota", "monto", "fecha"?, "medio"?, "notas"?}]. Las cuotas se
+    bloquean con select_for_update(skip_locked): una cuota tomada por otra
+    transacción se informa como "bloqueada" en vez de esperar. Los Pago se crean
+    con un bulk_create. Retorna un resultado por item, en el mismo orden.
+    """
+    hoy = timezone.localdate()
+    ids = [it["cuota"] for it in items]
+
+    with transaction.atomic():
+        bloqueadas = {
+            c.id: c
+            for c in CuotaContrato.objects
+            .filter(id__in=ids, pagada=False)
+            .select_for_update(skip_locked=True)
+            .only("id", "contrato_id", "monto", "pagada", "pago")
+        }
+        # Motivo de las que no se pudieron tomar (una consulta, sin bloquear)
+        faltantes = set(ids) - set(bloqueadas)
+        pagada_por_id = dict(
+            CuotaContrato.objects.filter(id__in=faltantes).values_list("id", "pagada")
+        ) if faltantes else {}
+
+        lote = uuid.uuid4()
+        resultados, pagos, a_pagar, vistas = [], [], [], set()
+        for it in items:
+            cid = it["cuota"]
+            cuota = bloqueadas.get(cid)
+            if cid in vistas:
+                estado = "duplicada"
+            elif cuota is not None:
+                estado = "pagada" if it["monto"] == cuota.monto else "monto_distinto"
+            elif cid not in pagada_por_id:
+                estado = "no_existe"
+            else:
+                estado = "ya_pagada" if pagada_por_id[cid] else "bloqueada"
+            vistas.add(cid)
+            resultados.append({"cuota": cid, "estado": estado, "pago_id": None})
+            if estado == "pagada":
+                pagos.append(Pago(
+                    contrato_id=cuota.contrato_id,
+                    fecha=it.get("fecha") or hoy,
+                    monto=it["monto"],
+                    medio=it.get("medio") or "transferencia",
+                    notas=it.get("notas") or "",
+                    lote=lote,
+                ))
+                a_pagar.append((len(resultados) - 1, cuota))
+
+        if not pagos:
+            return resultados
+
+        Pago.objects.bulk_create(pagos, batch_size=1000)
+        if pagos[0].pk is None:
+            # MySQL no devuelve los ids del INSERT múltiple: se leen por lote.
+            # Pagos con los mismos datos son intercambiables entre sí.
+            libres = {}
+            for pid, *datos in (
+                Pago.objects.filter(lote=lote).order_by("id")
+                .values_list("id", "contrato_id", "fecha", "monto", "medio", "notas")
+            ):
+                libres.setdefault(tuple(datos), []).append(pid)
+            for p in pagos:
+                p.pk = libres[(p.contrato_id, p.fecha, p.monto, p.medio, p.notas)].pop(0)
+
+        for (i, cuota), pago in zip(a_pagar, pagos):
+            cuota.pagada = True
+            cuota.pago_id = pago.pk
+            resultados[i]["pago_id"] = pago.pk
+        CuotaContrato.objects.bulk_update([c for _, c in a_pagar], ["pagada", "pago"], batch_size=1000)
+
+        # bulk_create/bulk_update no emiten señales: saldo y notificaciones en lote
+        contrato_ids = {p.contrato_id for p in pagos}
+        guardar_saldos(calcular_saldos(list(contrato_ids)))
+        _notificar_pagos(pagos, contrato_ids)
+
+    return resultados
+
+
+def _notificar_pagos(pagos, contrato_ids):
+    datos = {
+        cid: (titulo, cliente_id, propietario_id)
+        for cid, titulo, cliente_id, propietario_id in Contrato.objects.filter(id__in=contrato_ids).values_list(
+            "id", "propiedad__titulo", "comprador_arrendatario__usuario_id", "propiedad__propietario_user_id",
+        )
+    }
+    with despacho_notificaciones() as despacho:
+        for pago in pagos:
+            titulo, cliente_id, propietario_id = datos[pago.contrato_id]
+            evento = ("pago_creado", pago.pk)
+            despacho.agregar(
+                cliente_id, "Pago registrado",
+                f"Se registró un pago de ${pago.monto:.0f} para tu contrato de '{titulo}'.",
+                tipo="PAGO", evento=evento,
+            )
+            despacho.agregar(
+                propietario_id, "Pago registrado",
+                f"Se registró un pago de ${pago.monto:.0f} en el contrato de '{titulo}'.",
+                tipo="PAGO", evento=evento,
+            )
@@ -0,0 +1,56 @@
+import threading
+import time
+
+from .config import FERIADOS_CACHE_TTL
+
+# Calendario de feriados en memoria del proceso: {anio: (frozenset(fechas), cargado_en)}.
+# Se invalida con las señales de Feriado (save/delete) en este proceso; el TTL
+# acota cuánto puede tardar otro worker en ver un cambio hecho en otro proceso.
+# Una tupla por año: una sola lectura del dict, sin tomar el lock.
+_lock = threading.Lock()
+_por_anio = {}
+
+
+def _vigentes(anio, ahora):
+    entrada = _por_anio.get(anio)
+    if entrada is not None and ahora - entrada[1] < FERIADOS_CACHE_TTL:
+        return entrada[0]
+    return None
+
+
+def feriados_del_anio(anio):
+    fechas = _vigentes(anio, time.monotonic())
+    if fechas is not None:
+        return fechas
+
+    from .models import Feriado
+    with _lock:
+        # Otro hilo pudo cargarlo mientras se esperaba el lock
+        ahora = time.monotonic()
+        fechas = _vigentes(anio, ahora)
+        if fechas is None:
+            fechas = frozenset(
+                Feriado.objects.filter(fecha__year=anio).values_list("fecha", flat=True)
+            )
+            _por_anio[anio] = (fechas, ahora)
+    return fechas
+
+
+def es_feriado(fecha):
+    return fecha in feriados_del_anio(fecha.year)
+
+
+def feriados_entre(desde, hasta):
+    # Set de fechas feriadas en [desde, hasta] (una consulta por año no cacheado)
+    fechas = set()
+    for anio in range(desde.year, hasta.year + 1):
+        fechas.update(f for f in feriados_del_anio(anio) if desde <= f <= hasta)
+    return fechas
+
+
+def invalidar_feriados(anio=None):
+    with _lock:
+        if anio is None:
+            _por_anio.clear()
+        else:
+            _por_anio.pop(anio, None)
@@ -1,5 +1,7 @@
 import django_filters as df
+from rest_framework import filters
 from .models import Propiedad
+from .busqueda_propiedades import buscar_propiedades
 
 class PropiedadFilter(df.FilterSet):
     precio_min = df.NumberFilter(field_name="precio", lookup_expr="gte")
@@ -15,4 +17,23 @@ class PropiedadFilter(df.FilterSet):
 
     class Meta:
         model = Propiedad
-        fields = ["tipo", "estado", "ciudad", "orientacion"]
\ No newline at end of file
+        fields = ["tipo", "estado", "ciudad", "orientacion"]
+
+
+class BusquedaTextoFilter(filters.BaseFilterBackend):
+    """
+    Reemplaza SearchFilter en el catálogo: usa el índice de texto (?search=) y,
+    si el cliente no pidió otro orden (?ordering=), ordena por relevancia.
+    Debe ir después de OrderingFilter en filter_backends.
+    """
+    search_param = "search"
+    ordering_param = "ordering"
+
+    def filter_queryset(self, request, queryset, view):
+        texto = (request.query_params.get(self.search_param) or "").strip()
+        if not texto:
+            return queryset
+        qs = buscar_propiedades(queryset, texto)
+        if "relevancia" in qs.query.annotations and not request.query_params.get(self.ordering_param):
+            qs = qs.order_by("-relevancia", "-fecha_registro", "-id")
+        return qs
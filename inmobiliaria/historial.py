@@ -0,0 +1,90 @@
+from django.db import transaction
+from django.db.models import Case, CharField, Count, Value, When
+
+from .models import Historial, HistorialArchivado
+
+CAMPOS = ("id", "usuario", "fecha", "accion", "descripcion")
+CODIGO_ACCION = {nombre: codigo for codigo, nombre in HistorialArchivado.ACCIONES}
+
+
+def _rango(qs, desde=None, hasta=None):
+    # Límites sobre la columna indexada: [desde, hasta)
+    if desde is not None:
+        qs = qs.filter(fecha__gte=desde)
+    if hasta is not None:
+        qs = qs.filter(fecha__lt=hasta)
+    return qs
+
+
+def historial_propiedad(propiedad_id, desde=None, hasta=None):
+    """
+    Historial vigente y archivado de una propiedad como un solo queryset de
+    dicts (UNION ALL), del más reciente al más antiguo. Cada rama usa el índice
+    (propiedad, fecha, id) de su tabla.
+    """
+    vigente = _rango(Historial.objects.filter(propiedad_id=propiedad_id), desde, hasta)
+    archivado = _rango(HistorialArchivado.objects.filter(propiedad_id=propiedad_id), desde, hasta)
+    nombre_accion = Case(
+        *[When(accion=codigo, then=Value(nombre)) for codigo, nombre in HistorialArchivado.ACCIONES],
+        output_field=CharField(),
+    )
+    return (
+        vigente.order_by().values(*CAMPOS)
+        .union(
+            archivado.order_by()
+            .annotate(nombre_accion=nombre_accion)
+            .values("id", "usuario", "fecha", "nombre_accion", "descripcion"),
+            all=True,
+        )
+        .order_by("-fecha", "-id")
+    )
+
+
+def acciones_sin_codigo(antes_de):
+    """
+    {acción: filas} de Historial anteriores a 'antes_de' cuya acción no tiene
+    código en HistorialArchivado.ACCIONES: archivar_lote no las mueve.
+    """
+    return dict(
+        Historial.objects
+        .filter(fecha__lt=antes_de)
+        .exclude(accion__in=list(CODIGO_ACCION))
+        .values_list("accion")
+        .annotate(n=Count("id"))
+        .order_by()
+    )
+
+
+def archivar_lote(antes_de, limite):
+    """
+    Mueve hasta 'limite' filas de Historial anteriores a 'antes_de' a
+    HistorialArchivado en una transacción. Solo toma acciones con código; las
+    demás quedan en Historial (ver acciones_sin_codigo). Retorna la cantidad movida.
+    """
+    with transaction.atomic():
+        filas = list(
+            Historial.objects
+            .filter(fecha__lt=antes_de, accion__in=list(CODIGO_ACCION))
+            .select_for_update(skip_locked=True)
+            .order_by("id")
+            .values("id", "propiedad_id", "fecha", "accion", "descripcion", "usuario")[:limite]
+        )
+        if not filas:
+            return 0
+        # ignore_conflicts: un lote repetido tras una caída no duplica ni falla
+        HistorialArchivado.objects.bulk_create(
+            [
+                HistorialArchivado(
+                    id=f["id"],
+                    propiedad_id=f["propiedad_id"],
+                    fecha=f["fecha"],
+                    accion=CODIGO_ACCION[f["accion"]],
+                    descripcion=f["descripcion"],
+                    usuario=f["usuario"],
+                )
+                for f in filas
+            ],
+            ignore_conflicts=True,
+        )
+        Historial.objects.filter(id__in=[f["id"] for f in filas]).delete()
+    return len(filas)
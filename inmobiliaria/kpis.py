@@ -0,0 +1,207 @@
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .config import ADMIN_RESUMEN_TTL, KPIS_MARGEN_SEG
+from .models import (
+    Propietario, Propiedad, SolicitudCliente, Reserva, Pago, KpiDiario, MarcaKpi,
+)
+from .utils import upsert
+
+CLAVE_RESUMEN = "kpis:admin_resumen"
+CLAVE_REFRESCO = "kpis:admin_resumen:refrescando"
+
+
+def cache_kpis():
+    return caches[settings.KPIS_CACHE_ALIAS]
+
+
+def rango_mes(fecha):
+    # [primer día del mes, primer día del mes siguiente): filtro por rango que usa el índice de fecha
+    inicio = fecha.replace(day=1)
+    siguiente = (inicio + timedelta(days=32)).replace(day=1)
+    return inicio, siguiente
+
+
+def calcular_resumen():
+    """KPIs del panel admin: una consulta por tabla, con agregación condicional."""
+    hoy = timezone.localdate()
+    inicio_mes, siguiente_mes = rango_mes(hoy)
+
+    propiedades = Propiedad.objects.aggregate(
+        total=Count("id"),
+        por_aprobar=Count("id", filter=Q(estado_aprobacion__in=["pendiente", "en_revision"])),
+    )
+    reservas_activas = Reserva.objects.filter(activa=True, expires_at__gt=timezone.now()).count()
+    solicitudes_nuevas = SolicitudCliente.objects.filter(estado="nueva").count()
+    pagos_mes = Pago.objects.filter(
+        fecha__gte=inicio_mes, fecha__lt=siguiente_mes,
+    ).aggregate(total=Sum("monto"))["total"] or 0
+
+    return {
+        "total_propiedades": propiedades["total"],
+        "total_propietarios": Propietario.objects.count(),
+        "propiedades_por_aprobar": propiedades["por_aprobar"],
+        "reservas_activas": reservas_activas,
+        "solicitudes_nuevas": solicitudes_nuevas,
+        "pagos_mes": pagos_mes,
+    }
+
+
+def refrescar_resumen(cache=None):
+    cache = cache or cache_kpis()
+    snapshot = {"data": calcular_resumen(), "ts": time.time()}
+    # Se conserva más allá del TTL para servirlo mientras se recalcula
+    cache.set(CLAVE_RESUMEN, snapshot, ADMIN_RESUMEN_TTL * 10)
+    cache.delete(CLAVE_REFRESCO)
+    return snapshot
+
+
+def _refrescar_en_hilo():
+    try:
+        refrescar_resumen()
+    finally:
+        connection.close()
+
+
+def resumen_admin():
+    """
+    Snapshot de KPIs con TTL corto. Si está vencido se devuelve igual y un solo
+    proceso lo recalcula en segundo plano (cache.add hace de candado); solo el
+    primer pedido sin snapshot calcula en línea.
+    """
+    cache = cache_kpis()
+    snapshot = cache.get(CLAVE_RESUMEN)
+    if snapshot is None:
+        return refrescar_resumen(cache)
+    if time.time() - snapshot["ts"] > ADMIN_RESUMEN_TTL and cache.add(CLAVE_REFRESCO, 1, ADMIN_RESUMEN_TTL):
+        threading.Thread(target=_refrescar_en_hilo, daemon=True).start()
+    return snapshot
+
+
+def respuesta_resumen():
+    snapshot = resumen_admin()
+    return {
+        **snapshot["data"],
+        "calculado_en": datetime.fromtimestamp(snapshot["ts"], tz=timezone.get_current_timezone()).isoformat(),
+    }
+
+
+# --------- Acumulado diario ---------
+CAMPOS_KPI = [
+    "propiedades_nuevas", "propiedades_aprobadas", "reservas_nuevas",
+    "solicitudes_nuevas", "pagos_cantidad", "pagos_monto",
+]
+
+# fuente -> (modelo, campo de fecha del KPI, campo de creación, campo de KPI).
+# Se avanzan por id: solo se leen filas nuevas
+FUENTES_POR_ID = {
+    "propiedad": (Propiedad, "fecha_registro", "fecha_registro", "propiedades_nuevas"),
+    "reserva": (Reserva, "fecha", "fecha", "reservas_nuevas"),
+    "solicitud": (SolicitudCliente, "created_at", "created_at", "solicitudes_nuevas"),
+    "pago": (Pago, "fecha", "registrado_en", "pagos_cantidad"),
+}
+
+
+def _dia(valor):
+    # DateTimeField -> día local; DateField se usa tal cual
+    if isinstance(valor, datetime):
+        return timezone.localdate(valor)
+    return valor
+
+
+def acumular_kpis(ahora=None):
+    """
+    Suma a KpiDiario la actividad nueva desde la última marca de cada fuente y
+    avanza las marcas, todo en una transacción. Altas por id creciente; las
+    aprobaciones por fecha_aprobacion. Todas las fuentes se leen solo hasta
+    'ahora' menos KPIS_MARGEN_SEG: una fila con id menor que aún no confirma no
+    queda detrás de la marca. Retorna {fuente: filas}.
+    """
+    ahora = ahora or timezone.now()
+    tope = ahora - timedelta(seconds=KPIS_MARGEN_SEG)
+    deltas = defaultdict(lambda: defaultdict(int))
+    procesadas = {}
+
+    with transaction.atomic():
+        for fuente in [*FUENTES_POR_ID, "aprobacion"]:
+            MarcaKpi.objects.get_or_create(fuente=fuente)
+        # Bloquea las marcas: dos ejecuciones simultáneas no cuentan dos veces
+        marcas = {m.fuente: m for m in MarcaKpi.objects.select_for_update().order_by("fuente")}
+
+        for fuente, (modelo, campo_fecha, campo_creacion, campo_kpi) in FUENTES_POR_ID.items():
+            marca = marcas[fuente]
+            columnas = ["id", campo_creacion, campo_fecha] + (["monto"] if modelo is Pago else [])
+            n = 0
+            for fila in (
+                modelo.objects.filter(id__gt=marca.ultimo_id)
+                .order_by("id").values_list(*columnas).iterator(chunk_size=2000)
+            ):
+                # La marca no pasa de la primera fila reciente: las siguientes
+                # se leen en otra pasada, con las de id menor ya confirmadas
+                if fila[1] > tope:
+                    break
+                dia = deltas[_dia(fila[2])]
+                dia[campo_kpi] += 1
+                if modelo is Pago:
+                    dia["pagos_monto"] += fila[3]
+                marca.ultimo_id = fila[0]
+                n += 1
+            procesadas[fuente] = n
+
+        marca = marcas["aprobacion"]
+        aprobaciones = Propiedad.objects.filter(fecha_aprobacion__lte=tope)
+        if marca.ultima_fecha:
+            aprobaciones = aprobaciones.filter(fecha_aprobacion__gt=marca.ultima_fecha)
+        n = 0
+        for fecha in aprobaciones.values_list("fecha_aprobacion", flat=True).iterator(chunk_size=2000):
+            deltas[_dia(fecha)]["propiedades_aprobadas"] += 1
+            n += 1
+        marca.ultima_fecha = max(marca.ultima_fecha or tope, tope)
+        procesadas["aprobacion"] = n
+
+        if deltas:
+            existentes = {k.fecha: k for k in KpiDiario.objects.filter(fecha__in=list(deltas))}
+            filas = []
+            for fecha, campos in deltas.items():
+                kpi = existentes.get(fecha) or KpiDiario(fecha=fecha)
+                for campo, valor in campos.items():
+                    setattr(kpi, campo, getattr(kpi, campo) + valor)
+                kpi.actualizado_en = ahora
+                filas.append(kpi)
+            upsert(KpiDiario, filas, "fecha", CAMPOS_KPI + ["actualizado_en"])
+        MarcaKpi.objects.bulk_update(list(marcas.values()), ["ultimo_id", "ultima_fecha"])
+
+    return procesadas
+
+
+def reiniciar_kpis():
+    with transaction.atomic():
+        KpiDiario.objects.all().delete()
+        MarcaKpi.objects.all().delete()
+
+
+def _inicio_periodo(fecha, agrupar):
+    if agrupar == "semana":
+        return fecha - timedelta(days=fecha.weekday())
+    if agrupar == "mes":
+        return fecha.replace(day=1)
+    return fecha
+
+
+def serie_kpis(desde, hasta, agrupar="dia"):
+    """Serie de KPIs entre 'desde' y 'hasta' (inclusive) leída solo de KpiDiario."""
+    periodos = {}
+    for fila in KpiDiario.objects.filter(fecha__gte=desde, fecha__lte=hasta).order_by("fecha").values("fecha", *CAMPOS_KPI):
+        inicio = _inicio_periodo(fila["fecha"], agrupar)
+        periodo = periodos.setdefault(inicio, {"periodo": inicio, **{c: 0 for c in CAMPOS_KPI}})
+        for campo in CAMPOS_KPI:
+            periodo[campo] += fila[campo]
+    return list(periodos.values())
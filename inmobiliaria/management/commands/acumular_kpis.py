@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inmobiliaria.kpis import acumular_kpis, reiniciar_kpis
+
+
+class Command(BaseCommand):
+    help = (
+        "Acumula en KpiDiario la actividad nueva (propiedades, aprobaciones, reservas, "
+        "solicitudes y pagos) desde la última ejecución. Pensado para cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reconstruir",
+            action="store_true",
+            help="Borra el acumulado y las marcas y vuelve a procesar todo el historial",
+        )
+
+    def handle(self, *args, **opts):
+        if opts["reconstruir"]:
+            reiniciar_kpis()
+        inicio = time.perf_counter()
+        procesadas = acumular_kpis()
+        detalle = ", ".join(f"{fuente}: {n}" for fuente, n in procesadas.items())
+        self.stdout.write(self.style.SUCCESS(
+            f"KPIs acumulados en {time.perf_counter() - inicio:.2f}s ({detalle})."
+        ))
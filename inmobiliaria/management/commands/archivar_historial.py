@@ -0,0 +1,60 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inmobiliaria.cuotas import _sumar_meses
+from inmobiliaria.historial import acciones_sin_codigo, archivar_lote
+
+DEFAULT_MESES = 12
+DEFAULT_CHUNK = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve a HistorialArchivado las filas de Historial con más de N meses, en lotes. "
+        "Siguen visibles en /api/propiedades/<id>/historial/."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--meses",
+            type=int,
+            default=DEFAULT_MESES,
+            help=f"Antigüedad mínima en meses (default {DEFAULT_MESES})",
+        )
+        parser.add_argument(
+            "--chunk",
+            type=int,
+            default=DEFAULT_CHUNK,
+            help=f"Filas movidas por transacción (default {DEFAULT_CHUNK})",
+        )
+
+    def handle(self, *args, **opts):
+        if opts["meses"] < 1:
+            raise CommandError("--meses debe ser al menos 1")
+        chunk = max(1, opts["chunk"])
+        hoy = timezone.localdate()
+        corte = timezone.make_aware(
+            datetime.combine(_sumar_meses(hoy, -opts["meses"], hoy.day), datetime.min.time())
+        )
+
+        inicio = time.perf_counter()
+        total = 0
+        while True:
+            movidas = archivar_lote(corte, chunk)
+            total += movidas
+            if movidas < chunk:
+                break
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} filas de historial anteriores a {corte:%Y-%m-%d} archivadas "
+            f"en {time.perf_counter() - inicio:.2f}s."
+        ))
+        omitidas = acciones_sin_codigo(corte)
+        if omitidas:
+            detalle = ", ".join(f"{accion}: {n}" for accion, n in sorted(omitidas.items()))
+            self.stderr.write(self.style.WARNING(
+                f"Acciones sin código en HistorialArchivado.ACCIONES, no archivadas ({detalle})."
+            ))
@@ -0,0 +1,85 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from inmobiliaria.config import INTERVALO_PERMITIDOS
+from inmobiliaria.models import Propietario, Propiedad, Interesado, Visita
+from inmobiliaria.utils import disponibilidad_propiedades
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la búsqueda de disponibilidad multi-propiedad. Con --crear-datos genera "
+        "propiedades y visitas sintéticas dentro de una transacción que se revierte al final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ciudad", default="BenchCiudad")
+        parser.add_argument("--propiedades", type=int, default=1000)
+        parser.add_argument("--dias", type=int, default=30)
+        parser.add_argument("--ocupacion", type=float, default=0.3, help="Fracción de slots ya reservados")
+        parser.add_argument("--crear-datos", action="store_true")
+
+    def handle(self, *args, **opts):
+        try:
+            with transaction.atomic():
+                if opts["crear_datos"]:
+                    self._crear_datos(opts)
+                self._medir(opts)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _crear_datos(self, opts):
+        propietario = Propietario.objects.create(
+            primer_nombre="Bench", segundo_nombre="", primer_apellido="Bench", segundo_apellido="",
+            rut="99999999-9", telefono="+56900000000", email="bench@example.com",
+        )
+        interesado = Interesado.objects.create(
+            primer_nombre="Bench", segundo_nombre="", primer_apellido="Bench", segundo_apellido="",
+            rut="99999998-0", telefono="+56900000001", email="bench-i@example.com",
+        )
+        props = Propiedad.objects.bulk_create([
+            Propiedad(
+                propietario=propietario, titulo=f"Bench {i}", direccion="-", ciudad=opts["ciudad"],
+                precio=1, aprobada=True, estado_aprobacion="aprobada",
+            )
+            for i in range(opts["propiedades"])
+        ])
+        if not props[0].pk:
+            props = list(Propiedad.objects.filter(ciudad=opts["ciudad"]).order_by("id"))
+
+        hoy = timezone.localdate()
+        visitas = []
+        for p in props:
+            for d in range(1, opts["dias"] + 1):
+                fecha = hoy + timedelta(days=d)
+                for hora in INTERVALO_PERMITIDOS:
+                    if random.random() < opts["ocupacion"]:
+                        visitas.append(Visita(propiedad=p, interesado=interesado, fecha=fecha, hora=hora))
+        Visita.objects.bulk_create(visitas, batch_size=2000)
+        self.stdout.write(f"Datos sintéticos: {len(props)} propiedades, {len(visitas)} visitas")
+
+    def _medir(self, opts):
+        hoy = timezone.localdate()
+        fechas = [hoy + timedelta(days=d) for d in range(1, opts["dias"] + 1)]
+        qs = Propiedad.objects.filter(aprobada=True, ciudad__iexact=opts["ciudad"])
+
+        inicio = time.perf_counter()
+        with CaptureQueriesContext(connection) as ctx:
+            con_slots = sum(1 for _ in disponibilidad_propiedades(qs, fechas))
+        ms = (time.perf_counter() - inicio) * 1000
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{con_slots} propiedades con disponibilidad en {len(fechas)} días: "
+            f"{ms:.1f} ms, {len(ctx)} consultas"
+        ))
@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand
+from inmobiliaria.models import Propiedad, Pago, Notificacion
+from inmobiliaria.pagination import KeysetPagination
+
+MODELOS = {
+    "propiedad": (Propiedad, ("-fecha_registro", "-id")),
+    "pago": (Pago, ("-fecha", "-id")),
+    "notificacion": (Notificacion, ("-created_at", "-id")),
+}
+
+
+def _medir(fn, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        fn()
+    return (time.perf_counter() - inicio) * 1000 / repeticiones
+
+
+class Command(BaseCommand):
+    help = "Compara latencia de OFFSET+COUNT vs cursor (keyset) según la profundidad de página (solo lectura)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--modelo", choices=sorted(MODELOS), default="propiedad")
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument("--repeticiones", type=int, default=5)
+
+    def handle(self, *args, **opts):
+        modelo, orden = MODELOS[opts["modelo"]]
+        size = opts["page_size"]
+        reps = opts["repeticiones"]
+        qs = modelo.objects.order_by(*orden)
+        total = qs.count()
+        if total <= size:
+            self.stdout.write(self.style.WARNING(f"Solo hay {total} filas; nada que comparar."))
+            return
+
+        campos = [c.lstrip("-") for c in orden]
+        self.stdout.write(f"{modelo.__name__}: {total} filas, page_size={size}")
+        self.stdout.write(f"{'pagina':>10} {'offset_ms':>12} {'cursor_ms':>12}")
+
+        pagina = 1
+        while (pagina - 1) * size < total:
+            offset = (pagina - 1) * size
+
+            def por_offset():
+                qs.count()
+                list(qs[offset:offset + size])
+
+            filtro = None
+            if offset:
+                # Fila límite de la página anterior (no se mide, la trae el cliente en el cursor)
+                valores = qs.values_list(*campos)[offset - 1]
+                filtro = KeysetPagination._filtro_posterior(orden, valores)
+
+            def por_cursor():
+                base = qs.filter(filtro) if filtro is not None else qs
+                list(base[:size + 1])
+
+            self.stdout.write(
+                f"{pagina:>10} {_medir(por_offset, reps):>12.2f} {_medir(por_cursor, reps):>12.2f}"
+            )
+            pagina *= 10
@@ -0,0 +1,58 @@
+import csv
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from inmobiliaria.models import Feriado
+from inmobiliaria.feriados import invalidar_feriados
+from inmobiliaria.utils import upsert
+
+
+class Command(BaseCommand):
+    help = "Importa los feriados nacionales de un año desde un CSV (fecha,nombre) en una sola transacción"
+
+    def add_arguments(self, parser):
+        parser.add_argument("anio", type=int)
+        parser.add_argument("archivo", help="CSV con columnas fecha (YYYY-MM-DD) y nombre")
+        parser.add_argument(
+            "--reemplazar",
+            action="store_true",
+            help="Elimina los feriados del año que no vengan en el archivo",
+        )
+
+    def handle(self, *args, **opts):
+        anio = opts["anio"]
+        feriados = {}
+        try:
+            with open(opts["archivo"], newline="", encoding="utf-8-sig") as fh:
+                for n, fila in enumerate(csv.DictReader(fh), start=2):
+                    try:
+                        fecha = datetime.strptime((fila.get("fecha") or "").strip(), "%Y-%m-%d").date()
+                    except ValueError:
+                        raise CommandError(f"Línea {n}: fecha inválida '{fila.get('fecha')}'")
+                    if fecha.year != anio:
+                        raise CommandError(f"Línea {n}: {fecha} no pertenece a {anio}")
+                    feriados[fecha] = (fila.get("nombre") or "").strip()[:120] or "Feriado"
+        except OSError as e:
+            raise CommandError(f"No se pudo leer el archivo: {e}")
+
+        with transaction.atomic():
+            eliminados = 0
+            if opts["reemplazar"]:
+                eliminados, _ = (
+                    Feriado.objects.filter(fecha__year=anio)
+                    .exclude(fecha__in=list(feriados))
+                    .delete()
+                )
+            upsert(
+                Feriado,
+                [Feriado(fecha=f, nombre=nombre) for f, nombre in sorted(feriados.items())],
+                "fecha",
+                ["nombre"],
+            )
+            # bulk_create no emite señales: se invalida el año al confirmar
+            transaction.on_commit(lambda: invalidar_feriados(anio))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(feriados)} feriados cargados para {anio} ({eliminados} eliminados)."
+        ))
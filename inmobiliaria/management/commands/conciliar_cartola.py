@@ -0,0 +1,63 @@
+import csv
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inmobiliaria.conciliacion import (
+    VENTANA_DIAS, LOTE, ENCABEZADO_REPORTE, conciliar, fila_reporte,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Concilia una cartola bancaria CSV (fecha,monto,rut[,descripcion]) contra las cuotas "
+        "pendientes y registra los pagos en lote. Las líneas no conciliadas van al reporte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo")
+        parser.add_argument(
+            "--reporte",
+            help="CSV de salida con las líneas no conciliadas (por defecto, salida estándar)",
+        )
+        parser.add_argument(
+            "--ventana",
+            type=int,
+            default=VENTANA_DIAS,
+            help=f"Días de tolerancia entre la fecha del abono y el vencimiento (default {VENTANA_DIAS})",
+        )
+        parser.add_argument("--lote", type=int, default=LOTE, help=f"Pagos por transacción (default {LOTE})")
+        parser.add_argument("--simular", action="store_true", help="Concilia sin registrar pagos")
+
+    def handle(self, *args, **opts):
+        salida = None
+        try:
+            salida = open(opts["reporte"], "w", newline="", encoding="utf-8") if opts["reporte"] else self.stdout
+            escritor = csv.writer(salida)
+            escritor.writerow(ENCABEZADO_REPORTE)
+
+            inicio = time.perf_counter()
+            with open(opts["archivo"], newline="", encoding="utf-8-sig") as fh:
+                resumen = conciliar(
+                    fh,
+                    lambda linea, motivo: escritor.writerow(fila_reporte(linea, motivo)),
+                    ventana=max(0, opts["ventana"]),
+                    lote=max(1, opts["lote"]),
+                    simular=opts["simular"],
+                )
+        except OSError as e:
+            raise CommandError(f"No se pudo leer/escribir el archivo: {e}")
+        finally:
+            if salida is not None and salida is not self.stdout:
+                salida.close()
+
+        segundos = time.perf_counter() - inicio
+        verbo = "conciliables" if opts["simular"] else "conciliadas"
+        mensaje = (
+            f"{resumen['lineas']} líneas en {segundos:.2f}s: {resumen['conciliadas']} {verbo}, "
+            f"{resumen['no_conciliadas']} no conciliadas."
+        )
+        # Con el reporte en stdout, el resumen va a stderr para no mezclarlo con el CSV
+        destino = self.stdout if opts["reporte"] else self.stderr
+        destino.write(self.style.SUCCESS(mensaje))
@@ -1,35 +1,197 @@
+import heapq
+import signal
+import threading
+import time
+from datetime import timedelta
+
 from django.core.management.base import BaseCommand
+from django.db import DatabaseError, transaction, close_old_connections
+from django.db.models import Exists, OuterRef
 from django.utils import timezone
-from inmobiliaria.models import Reserva, Contrato, Notificacion
+from inmobiliaria.models import Reserva, Contrato, Propiedad, Historial
+from inmobiliaria.cache import invalidar_catalogo
+from inmobiliaria.notifications import despacho_notificaciones
+
+DEFAULT_CHUNK = 500
+DEFAULT_REFRESCO = 60
+ESPERA_ERROR_SEG = 1
+
+
+def liberar_lote(ahora, limite=DEFAULT_CHUNK):
+    """
+    Libera hasta 'limite' reservas vencidas con un número fijo de consultas:
+    bloqueo, lectura y UPDATE de reservas, una consulta para decidir qué propiedades
+    quedan libres, UPDATE de propiedades y bulk_create de Historial/Notificacion.
+    Retorna la cantidad de reservas liberadas.
+    """
+    with transaction.atomic():
+        # skip_locked: dos ejecuciones concurrentes no procesan las mismas reservas
+        ids = list(
+            Reserva.objects
+            .filter(activa=True, expires_at__lt=ahora)
+            .select_for_update(skip_locked=True)
+            .order_by("id")
+            .values_list("id", flat=True)[:limite]
+        )
+        if not ids:
+            return 0
+
+        filas = list(
+            Reserva.objects
+            .filter(id__in=ids)
+            .values_list(
+                "id",
+                "propiedad_id",
+                "propiedad__titulo",
+                "propiedad__propietario_user_id",
+                "interesado__usuario_id",
+            )
+        )
+
+        Reserva.objects.filter(id__in=ids).update(activa=False)
+
+        # Propiedades sin otra reserva activa ni contrato vigente
+        prop_ids = {f[1] for f in filas}
+        libres = list(
+            Propiedad.objects
+            .filter(id__in=prop_ids)
+            .exclude(Exists(Reserva.objects.filter(propiedad=OuterRef("pk"), activa=True)))
+            .exclude(Exists(Contrato.objects.filter(propiedad=OuterRef("pk"), vigente=True)))
+            .exclude(estado="disponible")
+            .values_list("id", "estado")
+        )
+        if libres:
+            Propiedad.objects.filter(id__in=[p for p, _ in libres]).update(estado="disponible")
+            Historial.objects.bulk_create([
+                Historial(
+                    propiedad_id=p,
+                    accion="cambio_estado",
+                    descripcion=f"Cambio de estado: {estado} → disponible",
+                )
+                for p, estado in libres
+            ])
+            invalidar_catalogo()
+
+        # Notificar propietario y cliente (un bulk_create al confirmar)
+        with despacho_notificaciones() as despacho:
+            for reserva_id, _, titulo, propietario_id, cliente_id in filas:
+                evento = ("reserva_vencida", reserva_id)
+                despacho.agregar(
+                    propietario_id, "Reserva vencida",
+                    f"La reserva de '{titulo}' venció y fue liberada.",
+                    tipo="RESERVA", evento=evento,
+                )
+                despacho.agregar(
+                    cliente_id, "Tu reserva venció",
+                    f"Venció la reserva de '{titulo}'.",
+                    tipo="RESERVA", evento=evento,
+                )
+
+    return len(ids)
+
+
+def proximos_vencimientos(hasta, limite=10000):
+    # Heap (expires_at, id) de reservas activas que vencen antes de 'hasta' (usa el índice de expires_at)
+    heap = list(
+        Reserva.objects
+        .filter(activa=True, expires_at__isnull=False, expires_at__lte=hasta)
+        .order_by("expires_at")
+        .values_list("expires_at", "id")[:limite]
+    )
+    heapq.heapify(heap)
+    return heap
 
-def _notificar(usuario, titulo, mensaje, tipo="SISTEMA"):
-    if usuario:
-        Notificacion.objects.create(usuario=usuario, titulo=titulo[:120], mensaje=mensaje, tipo=tipo)
 
 class Command(BaseCommand):
     help = "Libera propiedades con reservas vencidas"
 
-    def handle(self, *args, **kwargs):
-        ahora = timezone.now()
-        vencidas = Reserva.objects.filter(activa=True, expires_at__lt=ahora)
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk",
+            type=int,
+            default=DEFAULT_CHUNK,
+            help=f"Reservas procesadas por transacción (default {DEFAULT_CHUNK})",
+        )
+        parser.add_argument(
+            "--residente",
+            action="store_true",
+            help="Queda en ejecución y libera cada reserva cerca de su vencimiento exacto",
+        )
+        parser.add_argument(
+            "--refresco",
+            type=int,
+            default=DEFAULT_REFRESCO,
+            help=f"Segundos entre recargas del heap de vencimientos (default {DEFAULT_REFRESCO})",
+        )
+
+    def handle(self, *args, **opts):
+        chunk = max(1, opts["chunk"])
+        if opts["residente"]:
+            return self._residente(chunk, max(1, opts["refresco"]))
+
+        count, segundos = self._liberar(timezone.now(), chunk)
+        ritmo = count / segundos if segundos > 0 else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{count} reservas vencidas liberadas en {segundos:.2f}s ({ritmo:.0f} reservas/s)."
+        ))
 
+    def _liberar(self, ahora, chunk):
+        inicio = time.perf_counter()
         count = 0
-        for r in vencidas:
-            r.activa = False
-            r.save(update_fields=["activa"])
+        while True:
+            liberadas = liberar_lote(ahora, chunk)
+            count += liberadas
+            if liberadas < chunk:
+                break
+        return count, time.perf_counter() - inicio
+
+    def _residente(self, chunk, refresco, detener=None):
+        detener = detener or threading.Event()
+
+        def _senal(signum, frame):
+            self.stdout.write(f"Señal {signum} recibida, deteniendo...")
+            detener.set()
+
+        signal.signal(signal.SIGTERM, _senal)
+        signal.signal(signal.SIGINT, _senal)
+        self.stdout.write(f"Modo residente (refresco cada {refresco}s). Ctrl+C para salir.")
+
+        heap = []
+        proxima_recarga = 0.0
+        espera_error = ESPERA_ERROR_SEG
+        while not detener.is_set():
+            close_old_connections()
+            ahora = timezone.now()
 
-            tiene_otra = Reserva.objects.filter(propiedad=r.propiedad, activa=True).exists()
-            contrato_vigente = Contrato.objects.filter(propiedad=r.propiedad, vigente=True).exists()
-            if not tiene_otra and not contrato_vigente:
-                r.propiedad.estado = "disponible"
-                r.propiedad.save(update_fields=["estado"])
+            try:
+                if time.monotonic() >= proxima_recarga:
+                    # Cubre hasta la próxima recarga; lo creado después entra en la siguiente
+                    heap = proximos_vencimientos(ahora + timedelta(seconds=refresco))
+                    proxima_recarga = time.monotonic() + refresco
 
-            # Notificar propietario y cliente
-            propietario_user = getattr(r.propiedad, "propietario_user", None)
-            cliente_user = getattr(r.interesado, "usuario", None)
-            _notificar(propietario_user, "Reserva vencida", f"La reserva de '{r.propiedad.titulo}' venció y fue liberada.", tipo="RESERVA")
-            _notificar(cliente_user, "Tu reserva venció", f"Venció la reserva de '{r.propiedad.titulo}'.", tipo="RESERVA")
+                if heap and heap[0][0] < ahora:
+                    while heap and heap[0][0] < ahora:
+                        heapq.heappop(heap)
+                    count, segundos = self._liberar(ahora, chunk)
+                    if count:
+                        self.stdout.write(f"{ahora:%Y-%m-%d %H:%M:%S} {count} reservas liberadas en {segundos:.2f}s.")
+                    espera_error = ESPERA_ERROR_SEG
+                    continue
+            except DatabaseError as e:
+                # Conexión caída, deadlock...: no detiene el planificador. Se descarta
+                # la conexión, se espera (backoff hasta 'refresco') y se recarga el heap
+                self.stderr.write(f"{ahora:%Y-%m-%d %H:%M:%S} Error de base de datos: {e}. Reintento en {espera_error}s.")
+                close_old_connections()
+                proxima_recarga = 0.0
+                detener.wait(espera_error)
+                espera_error = min(espera_error * 2, refresco)
+                continue
+            espera_error = ESPERA_ERROR_SEG
 
-            count += 1
+            espera = proxima_recarga - time.monotonic()
+            if heap:
+                espera = min(espera, (heap[0][0] - ahora).total_seconds())
+            detener.wait(max(0.0, espera))
 
-        self.stdout.write(self.style.SUCCESS(f"{count} reservas vencidas liberadas."))
\ No newline at end of file
+        close_old_connections()
+        self.stdout.write(self.style.SUCCESS("Planificador detenido."))
@@ -0,0 +1,110 @@
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from inmobiliaria.config import OUTBOX_LOTE
+from inmobiliaria.outbox import drenar, procesar_lote, metricas, purgar_enviados
+
+DEFAULT_HILOS = 4
+DEFAULT_INTERVALO = 2
+DEFAULT_REPORTE = 60
+DEFAULT_RETENER_DIAS = 7
+
+
+class Command(BaseCommand):
+    help = "Convierte los eventos del outbox en notificaciones, en lotes y con un pool de hilos"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=OUTBOX_LOTE, help=f"Eventos por lote (default {OUTBOX_LOTE})")
+        parser.add_argument("--hilos", type=int, default=DEFAULT_HILOS, help=f"Hilos de entrega (default {DEFAULT_HILOS})")
+        parser.add_argument(
+            "--una-vez",
+            action="store_true",
+            help="Drena lo disponible y termina (para cron)",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=DEFAULT_INTERVALO,
+            help=f"Segundos de espera cuando la cola está vacía (default {DEFAULT_INTERVALO})",
+        )
+        parser.add_argument(
+            "--reporte",
+            type=int,
+            default=DEFAULT_REPORTE,
+            help=f"Segundos entre reportes de métricas (default {DEFAULT_REPORTE})",
+        )
+        parser.add_argument(
+            "--retener-dias",
+            type=int,
+            default=DEFAULT_RETENER_DIAS,
+            help=f"Días que se conservan los eventos enviados (default {DEFAULT_RETENER_DIAS})",
+        )
+        parser.add_argument("--metricas", action="store_true", help="Solo muestra las métricas de la cola")
+
+    def handle(self, *args, **opts):
+        lote = max(1, opts["lote"])
+        hilos = max(1, opts["hilos"])
+
+        if opts["metricas"]:
+            self._reportar(metricas())
+            return
+
+        if opts["una_vez"]:
+            enviados, fallidos, segundos = drenar(lote, hilos)
+            ritmo = enviados / segundos if segundos > 0 else 0
+            self.stdout.write(self.style.SUCCESS(
+                f"{enviados} eventos entregados, {fallidos} con error en {segundos:.2f}s ({ritmo:.0f} eventos/s)."
+            ))
+            return
+
+        self._residente(lote, hilos, opts)
+
+    def _reportar(self, m, enviados=None, segundos=None):
+        linea = (
+            f"Cola: {m['pendientes']} pendientes (más antiguo {m['antiguedad_seg']:.0f}s), "
+            f"{m['enviados']} enviados, {m['fallidos']} fallidos"
+        )
+        if enviados is not None and segundos:
+            linea += f" | ritmo {enviados / segundos:.1f} eventos/s"
+        self.stdout.write(linea)
+
+    def _residente(self, lote, hilos, opts):
+        detener = threading.Event()
+
+        def _senal(signum, frame):
+            self.stdout.write(f"Señal {signum} recibida, deteniendo...")
+            detener.set()
+
+        signal.signal(signal.SIGTERM, _senal)
+        signal.signal(signal.SIGINT, _senal)
+        self.stdout.write(f"Worker de outbox ({hilos} hilos, lotes de {lote}). Ctrl+C para salir.")
+
+        pool = ThreadPoolExecutor(max_workers=hilos) if hilos > 1 else None
+        enviados_ventana = 0
+        inicio_ventana = time.monotonic()
+        try:
+            while not detener.is_set():
+                close_old_connections()
+                enviados, _, reclamados = procesar_lote(lote, hilos, pool)
+                enviados_ventana += enviados
+
+                transcurrido = time.monotonic() - inicio_ventana
+                if transcurrido >= opts["reporte"]:
+                    purgar_enviados(opts["retener_dias"])
+                    self._reportar(metricas(), enviados_ventana, transcurrido)
+                    enviados_ventana = 0
+                    inicio_ventana = time.monotonic()
+
+                # Lote incompleto: la cola quedó vacía (o solo con reintentos a futuro)
+                if reclamados < lote:
+                    detener.wait(opts["intervalo"])
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            close_old_connections()
+        self.stdout.write(self.style.SUCCESS("Worker detenido."))
@@ -0,0 +1,72 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from inmobiliaria.models import Contrato, SaldoContrato
+from inmobiliaria.saldos import calcular_saldos, guardar_saldos
+
+DEFAULT_CHUNK = 1000
+CAMPOS_VERIFICADOS = ("total_pagado", "saldo", "cuotas_pendientes", "proximo_vencimiento")
+
+
+class Command(BaseCommand):
+    help = "Reconstruye y verifica el saldo materializado de todos los contratos, en lotes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk",
+            type=int,
+            default=DEFAULT_CHUNK,
+            help=f"Contratos por lote (default {DEFAULT_CHUNK})",
+        )
+        parser.add_argument(
+            "--solo-verificar",
+            action="store_true",
+            help="No escribe; informa las diferencias y termina con error si las hay",
+        )
+
+    def handle(self, *args, **opts):
+        chunk = max(1, opts["chunk"])
+        inicio = time.perf_counter()
+        total = diferencias = 0
+        ultimo_id = 0
+
+        while True:
+            ids = list(
+                Contrato.objects.filter(id__gt=ultimo_id)
+                .order_by("id")
+                .values_list("id", flat=True)[:chunk]
+            )
+            if not ids:
+                break
+            ultimo_id = ids[-1]
+
+            with transaction.atomic():
+                calculados = calcular_saldos(ids)
+                actuales = {
+                    s.contrato_id: s
+                    for s in SaldoContrato.objects.select_for_update().filter(contrato_id__in=ids)
+                }
+                malos = [s for s in calculados if self._distinto(s, actuales.get(s.contrato_id))]
+                for s in malos[:20]:
+                    self.stdout.write(f"Contrato {s.contrato_id}: saldo materializado desactualizado")
+                if malos and not opts["solo_verificar"]:
+                    guardar_saldos(malos)
+
+            total += len(ids)
+            diferencias += len(malos)
+
+        segundos = time.perf_counter() - inicio
+        resumen = f"{total} contratos revisados en {segundos:.2f}s, {diferencias} con diferencias"
+        if opts["solo_verificar"]:
+            if diferencias:
+                raise CommandError(resumen + ".")
+            self.stdout.write(self.style.SUCCESS(resumen + "."))
+        else:
+            self.stdout.write(self.style.SUCCESS(resumen + " (corregidos)."))
+
+    def _distinto(self, calculado, actual):
+        if actual is None:
+            return True
+        return any(getattr(calculado, c) != getattr(actual, c) for c in CAMPOS_VERIFICADOS)
@@ -0,0 +1,58 @@
+import signal
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from inmobiliaria.config import ADMIN_RESUMEN_TTL
+from inmobiliaria.kpis import refrescar_resumen
+
+
+class Command(BaseCommand):
+    help = "Recalcula el snapshot de KPIs del panel admin (una vez o en modo residente)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--residente",
+            action="store_true",
+            help="Queda en ejecución y recalcula el snapshot cada --intervalo segundos",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=int,
+            default=ADMIN_RESUMEN_TTL // 2,
+            help=f"Segundos entre recálculos (default {ADMIN_RESUMEN_TTL // 2}, la mitad del TTL)",
+        )
+
+    def handle(self, *args, **opts):
+        if not opts["residente"]:
+            self._refrescar()
+            return
+
+        detener = threading.Event()
+
+        def _senal(signum, frame):
+            self.stdout.write(f"Señal {signum} recibida, deteniendo...")
+            detener.set()
+
+        signal.signal(signal.SIGTERM, _senal)
+        signal.signal(signal.SIGINT, _senal)
+        intervalo = max(1, opts["intervalo"])
+        self.stdout.write(f"Refresco de KPIs cada {intervalo}s. Ctrl+C para salir.")
+
+        while not detener.is_set():
+            close_old_connections()
+            try:
+                self._refrescar()
+            except Exception as e:
+                # Un error puntual de BD no detiene el refresco; se reintenta en el siguiente ciclo
+                self.stderr.write(f"Error al recalcular KPIs: {e}")
+            detener.wait(intervalo)
+        close_old_connections()
+        self.stdout.write(self.style.SUCCESS("Refresco detenido."))
+
+    def _refrescar(self):
+        inicio = time.perf_counter()
+        refrescar_resumen()
+        self.stdout.write(f"Snapshot de KPIs recalculado en {(time.perf_counter() - inicio) * 1000:.0f} ms.")
@@ -0,0 +1,44 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from inmobiliaria.busqueda import reindexar_usuarios
+
+DEFAULT_CHUNK = 1000
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice de búsqueda de personas (usuarios y sus perfiles), en lotes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk",
+            type=int,
+            default=DEFAULT_CHUNK,
+            help=f"Usuarios por lote (default {DEFAULT_CHUNK})",
+        )
+
+    def handle(self, *args, **opts):
+        User = get_user_model()
+        chunk = max(1, opts["chunk"])
+        inicio = time.perf_counter()
+        usuarios = terminos = 0
+        ultimo_id = 0
+
+        while True:
+            ids = list(
+                User.objects.filter(id__gt=ultimo_id)
+                .order_by("id")
+                .values_list("id", flat=True)[:chunk]
+            )
+            if not ids:
+                break
+            ultimo_id = ids[-1]
+            terminos += reindexar_usuarios(ids)
+            usuarios += len(ids)
+
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"{usuarios} usuarios reindexados ({terminos} términos) en {segundos:.2f}s."
+        ))
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inmobiliaria.busqueda_propiedades import asegurar_indice, indexar_propiedades
+from inmobiliaria.models import Propiedad
+
+DEFAULT_CHUNK = 1000
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice de texto del catálogo de propiedades, en lotes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk",
+            type=int,
+            default=DEFAULT_CHUNK,
+            help=f"Propiedades por lote (default {DEFAULT_CHUNK})",
+        )
+
+    def handle(self, *args, **opts):
+        chunk = max(1, opts["chunk"])
+        asegurar_indice()
+        inicio = time.perf_counter()
+        total = 0
+        ultimo_id = 0
+
+        while True:
+            ids = list(
+                Propiedad.objects.filter(id__gt=ultimo_id)
+                .order_by("id")
+                .values_list("id", flat=True)[:chunk]
+            )
+            if not ids:
+                break
+            ultimo_id = ids[-1]
+            total += indexar_propiedades(ids)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} propiedades indexadas en {time.perf_counter() - inicio:.2f}s."
+        ))
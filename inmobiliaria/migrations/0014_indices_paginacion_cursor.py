@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inmobiliaria', '0013_alter_propietario_email'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pago',
+            index=models.Index(fields=['fecha', 'id'], name='inmobiliari_fecha_2e9e1f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propiedad',
+            index=models.Index(fields=['fecha_registro', 'id'], name='inmobiliari_fecha_r_3ebd14_idx'),
+        ),
+    ]
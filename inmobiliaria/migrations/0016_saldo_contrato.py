@@ -0,0 +1,67 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum, Count, Min
+
+
+def poblar_saldos(apps, schema_editor):
+    # Saldo inicial de los contratos existentes, en lotes de 1000
+    Contrato = apps.get_model("inmobiliaria", "Contrato")
+    Pago = apps.get_model("inmobiliaria", "Pago")
+    CuotaContrato = apps.get_model("inmobiliaria", "CuotaContrato")
+    SaldoContrato = apps.get_model("inmobiliaria", "SaldoContrato")
+
+    ultimo_id = 0
+    while True:
+        precios = list(
+            Contrato.objects.filter(id__gt=ultimo_id).order_by("id").values_list("id", "precio_pactado")[:1000]
+        )
+        if not precios:
+            break
+        ids = [cid for cid, _ in precios]
+        ultimo_id = ids[-1]
+        pagado = dict(
+            Pago.objects.filter(contrato_id__in=ids).values_list("contrato_id").annotate(t=Sum("monto")).order_by()
+        )
+        cuotas = {
+            cid: (n, proximo)
+            for cid, n, proximo in CuotaContrato.objects.filter(contrato_id__in=ids, pagada=False)
+            .values_list("contrato_id").annotate(n=Count("id"), p=Min("vencimiento")).order_by()
+        }
+        SaldoContrato.objects.bulk_create([
+            SaldoContrato(
+                contrato_id=cid,
+                total_pagado=pagado.get(cid) or 0,
+                saldo=(precio or 0) - (pagado.get(cid) or 0),
+                cuotas_pendientes=cuotas.get(cid, (0, None))[0],
+                proximo_vencimiento=cuotas.get(cid, (0, None))[1],
+            )
+            for cid, precio in precios
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inmobiliaria', '0015_notificacion_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoContrato',
+            fields=[
+                ('contrato', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='saldo_actual', serialize=False, to='inmobiliaria.contrato')),
+                ('total_pagado', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('saldo', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cuotas_pendientes', models.PositiveIntegerField(default=0)),
+                ('proximo_vencimiento', models.DateField(blank=True, null=True)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Saldo de contrato',
+                'verbose_name_plural': 'Saldos de contratos',
+            },
+        ),
+        migrations.RunPython(poblar_saldos, migrations.RunPython.noop),
+    ]
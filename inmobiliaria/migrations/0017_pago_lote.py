@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inmobiliaria', '0016_saldo_contrato'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pago',
+            name='lote',
+            field=models.UUIDField(blank=True, db_index=True, editable=False, null=True),
+        ),
+    ]
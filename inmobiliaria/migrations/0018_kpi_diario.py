@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inmobiliaria', '0017_pago_lote'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KpiDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True)),
+                ('propiedades_nuevas', models.PositiveIntegerField(default=0)),
+                ('propiedades_aprobadas', models.PositiveIntegerField(default=0)),
+                ('reservas_nuevas', models.PositiveIntegerField(default=0)),
+                ('solicitudes_nuevas', models.PositiveIntegerField(default=0)),
+                ('pagos_cantidad', models.PositiveIntegerField(default=0)),
+                ('pagos_monto', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'KPI diario',
+                'verbose_name_plural': 'KPIs diarios',
+                'ordering': ['fecha'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MarcaKpi',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fuente', models.CharField(max_length=30, unique=True)),
+                ('ultimo_id', models.BigIntegerField(default=0)),
+                ('ultima_fecha', models.DateTimeField(blank=True, null=True)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='propiedad',
+            name='fecha_aprobacion',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:04
+
+from django.db import migrations, models
+from django.db.models.functions import Lower, Trim
+
+
+def normalizar_emails(apps, schema_editor):
+    # Un UPDATE por tabla: el listado de usuarios compara emails en minúsculas
+    for modelo in ("Propietario", "Interesado"):
+        apps.get_model("inmobiliaria", modelo).objects.update(email=Lower(Trim("email")))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inmobiliaria', '0018_kpi_diario'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalizar_emails, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='interesado',
+            name='email',
+            field=models.EmailField(blank=True, db_index=True, max_length=254),
+        ),
+        migrations.AlterField(
+            model_name='propietario',
+            name='email',
+            field=models.EmailField(db_index=True, max_length=254),
+        ),
+    ]
@@ -0,0 +1,132 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:09
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Q
+
+
+# Copia de la normalización de busqueda.py a la fecha de esta migración: cambios
+# posteriores en ese módulo no deben alterar lo que hace
+PESO_DOCUMENTO = 5
+PESO_NOMBRE = 3
+PESO_CONTACTO = 2
+LARGO_TERMINO = 100
+
+
+def normalizar(texto):
+    t = unicodedata.normalize("NFKD", str(texto or ""))
+    return "".join(c for c in t if not unicodedata.combining(c)).lower().strip()
+
+
+def _sumar(terminos, termino, peso):
+    termino = termino[:LARGO_TERMINO]
+    if termino and peso > terminos.get(termino, 0):
+        terminos[termino] = peso
+
+
+def _terminos_texto(terminos, texto, peso):
+    for palabra in re.findall(r"[a-z0-9]+", normalizar(texto)):
+        _sumar(terminos, palabra, peso)
+
+
+def _terminos_email(terminos, email):
+    email = normalizar(email)
+    if not email:
+        return
+    _sumar(terminos, email, PESO_DOCUMENTO)
+    _terminos_texto(terminos, email.split("@")[0], PESO_CONTACTO)
+
+
+def _terminos_perfil(terminos, email, nombres, rut, telefono):
+    _terminos_email(terminos, email)
+    for nombre in nombres:
+        _terminos_texto(terminos, nombre, PESO_NOMBRE)
+    compacto = re.sub(r"[^0-9k]", "", normalizar(rut))
+    if compacto:
+        _sumar(terminos, compacto, PESO_DOCUMENTO)
+        _sumar(terminos, compacto[:-1], PESO_DOCUMENTO)
+    digitos = re.sub(r"\D", "", telefono or "")
+    for sufijo in {digitos, digitos[-9:], digitos[-8:]}:
+        _sumar(terminos, sufijo, PESO_CONTACTO)
+
+
+def _indexar(apps, ids):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Termino = apps.get_model("inmobiliaria", "TerminoBusquedaUsuario")
+
+    terminos, por_email = {}, {}
+    for uid, username, email, nombre, apellido in (
+        User.objects.filter(id__in=ids).values_list("id", "username", "email", "first_name", "last_name")
+    ):
+        t = terminos[uid] = {}
+        _terminos_texto(t, username, PESO_CONTACTO)
+        _terminos_email(t, email)
+        _terminos_texto(t, nombre, PESO_NOMBRE)
+        _terminos_texto(t, apellido, PESO_NOMBRE)
+        if email:
+            por_email.setdefault(email.strip().lower(), []).append(uid)
+
+    filtro = Q(usuario_id__in=list(terminos)) | Q(email__in=list(por_email))
+    campos = (
+        "usuario_id", "email", "primer_nombre", "segundo_nombre",
+        "primer_apellido", "segundo_apellido", "rut", "telefono",
+    )
+    for modelo in ("Propietario", "Interesado"):
+        qs = apps.get_model("inmobiliaria", modelo).objects.filter(filtro)
+        for usuario_id, email, n1, n2, a1, a2, rut, telefono in qs.values_list(*campos):
+            destinos = set(por_email.get((email or "").strip().lower(), ()))
+            if usuario_id in terminos:
+                destinos.add(usuario_id)
+            for uid in destinos:
+                _terminos_perfil(terminos[uid], email, (n1, n2, a1, a2), rut, telefono)
+
+    Termino.objects.bulk_create(
+        [
+            Termino(usuario_id=uid, termino=termino, peso=peso)
+            for uid, t in terminos.items()
+            for termino, peso in t.items()
+        ],
+        batch_size=1000,
+    )
+
+
+def poblar_terminos(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    # Mismo recorrido que el comando reindexar_busqueda; la tabla recién creada está vacía
+    ultimo_id = 0
+    while True:
+        ids = list(User.objects.filter(id__gt=ultimo_id).order_by("id").values_list("id", flat=True)[:1000])
+        if not ids:
+            break
+        ultimo_id = ids[-1]
+        _indexar(apps, ids)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inmobiliaria', '0019_email_perfiles_normalizado'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TerminoBusquedaUsuario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termino', models.CharField(max_length=100)),
+                ('peso', models.PositiveSmallIntegerField(default=1)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terminos_busqueda', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Término de búsqueda',
+                'verbose_name_plural': 'Términos de búsqueda',
+                'indexes': [models.Index(fields=['termino', 'usuario'], name='termino_busq_usuario_idx')],
+            },
+        ),
+        migrations.RunPython(poblar_terminos, migrations.RunPython.noop),
+    ]
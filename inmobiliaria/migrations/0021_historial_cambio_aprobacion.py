@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inmobiliaria', '0020_terminos_busqueda_usuario'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='historial',
+            name='accion',
+            field=models.CharField(choices=[('cambio_estado', 'Cambio de estado'), ('actualizacion_precio', 'Actualización de precio'), ('cambio_aprobacion', 'Cambio de aprobación')], default='cambio_estado', max_length=100),
+        ),
+    ]
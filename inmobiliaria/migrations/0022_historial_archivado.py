@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inmobiliaria', '0021_historial_cambio_aprobacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistorialArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('fecha', models.DateTimeField()),
+                ('accion', models.PositiveSmallIntegerField(choices=[(1, 'cambio_estado'), (2, 'actualizacion_precio'), (3, 'cambio_aprobacion')])),
+                ('descripcion', models.TextField(blank=True)),
+                ('usuario', models.CharField(blank=True, max_length=100)),
+            ],
+            options={
+                'verbose_name': 'Historial archivado',
+                'verbose_name_plural': 'Historial archivado',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='historial',
+            index=models.Index(fields=['propiedad', 'fecha', 'id'], name='historial_prop_fecha_idx'),
+        ),
+        migrations.AddField(
+            model_name='historialarchivado',
+            name='propiedad',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='historial_archivado', to='inmobiliaria.propiedad'),
+        ),
+        migrations.AddIndex(
+            model_name='historialarchivado',
+            index=models.Index(fields=['propiedad', 'fecha', 'id'], name='historial_arch_prop_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:18
+
+import re
+from decimal import Decimal, InvalidOperation
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+LOTE = 2000
+
+# Copia del parseo de precios.py a la fecha de esta migración: cambios
+# posteriores en ese módulo no deben alterar lo que hace
+_CAMBIO = re.compile(r"Cambio de precio:\s*([\d.,]+)\s*(?:→|->)\s*([\d.,]+)")
+_INICIAL = re.compile(r"Precio inicial:\s*([\d.,]+)")
+
+
+def _decimal(texto):
+    try:
+        return Decimal(texto.replace(",", ""))
+    except InvalidOperation:
+        return None
+
+
+def parsear_descripcion(descripcion):
+    m = _CAMBIO.search(descripcion or "")
+    if m:
+        antes, despues = _decimal(m.group(1)), _decimal(m.group(2))
+        return (antes, despues) if antes is not None and despues is not None else None
+    m = _INICIAL.search(descripcion or "")
+    if m:
+        despues = _decimal(m.group(1))
+        return (None, despues) if despues is not None else None
+    return None
+
+
+def poblar_cambios_precio(apps, schema_editor):
+    # Recorre el historial por lotes de id (keyset) y escribe cada lote con bulk_create:
+    # nunca carga la tabla completa en memoria
+    CambioPrecio = apps.get_model("inmobiliaria", "CambioPrecio")
+    fuentes = [
+        apps.get_model("inmobiliaria", "Historial").objects.filter(accion="actualizacion_precio"),
+        apps.get_model("inmobiliaria", "HistorialArchivado").objects.filter(accion=2),
+    ]
+    for qs in fuentes:
+        ultimo_id = 0
+        while True:
+            filas = list(
+                qs.filter(id__gt=ultimo_id)
+                .order_by("id")
+                .values_list("id", "propiedad_id", "fecha", "descripcion")[:LOTE]
+            )
+            if not filas:
+                break
+            ultimo_id = filas[-1][0]
+            lote = []
+            for _, propiedad_id, fecha, descripcion in filas:
+                precios = parsear_descripcion(descripcion)
+                if precios is not None:
+                    lote.append(CambioPrecio(
+                        propiedad_id=propiedad_id,
+                        fecha=fecha,
+                        mes=timezone.localtime(fecha).date().replace(day=1),
+                        precio_anterior=precios[0],
+                        precio_nuevo=precios[1],
+                    ))
+            CambioPrecio.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inmobiliaria', '0022_historial_archivado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CambioPrecio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('mes', models.DateField()),
+                ('precio_anterior', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('precio_nuevo', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('propiedad', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='cambios_precio', to='inmobiliaria.propiedad')),
+            ],
+            options={
+                'verbose_name': 'Cambio de precio',
+                'verbose_name_plural': 'Cambios de precio',
+                'indexes': [models.Index(fields=['propiedad', 'fecha'], name='cambio_precio_prop_fecha_idx'), models.Index(fields=['mes', 'propiedad'], name='cambio_precio_mes_idx')],
+            },
+        ),
+        migrations.RunPython(poblar_cambios_precio, migrations.RunPython.noop),
+    ]
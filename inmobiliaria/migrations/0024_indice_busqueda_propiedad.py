@@ -0,0 +1,125 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:23
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Copia del índice de busqueda_propiedades.py a la fecha de esta migración:
+# cambios posteriores en ese módulo no deben alterar lo que hace
+TABLA_FTS = "inmobiliaria_propiedad_fts"
+INDICE_FULLTEXT = "indice_busq_texto_ft"
+STOPWORDS = frozenset(
+    "a al con de del el en la las lo los o para por se sin su sus un una unos unas y".split()
+)
+VOCALES = "aeiou"
+
+
+def normalizar(texto):
+    t = unicodedata.normalize("NFKD", str(texto or ""))
+    return "".join(c for c in t if not unicodedata.combining(c)).lower().strip()
+
+
+def raiz(palabra):
+    if len(palabra) > 4 and palabra.endswith("es") and palabra[-3] not in VOCALES + "s":
+        return palabra[:-2]
+    if len(palabra) > 3 and palabra.endswith("s") and palabra[-2] in VOCALES:
+        return palabra[:-1]
+    return palabra
+
+
+def tokens(texto):
+    return [raiz(p) for p in re.findall(r"[a-z0-9]+", normalizar(texto)) if p not in STOPWORDS]
+
+
+def texto_indexado(titulo, descripcion, ciudad, tipo, nombres, rut):
+    partes = [titulo, titulo, ciudad, tipo, descripcion, *nombres]
+    texto = " ".join(" ".join(tokens(p)) for p in partes if p)
+    compacto = re.sub(r"[^0-9k]", "", normalizar(rut))
+    return f"{texto} {compacto}".strip()
+
+
+def crear_indice_texto(conexion, tabla):
+    with conexion.cursor() as cursor:
+        if conexion.vendor == "mysql":
+            cursor.execute(f"SHOW INDEX FROM `{tabla}` WHERE Key_name = %s", [INDICE_FULLTEXT])
+            if cursor.fetchone() is None:
+                cursor.execute(f"CREATE FULLTEXT INDEX {INDICE_FULLTEXT} ON `{tabla}` (texto)")
+            return
+        if conexion.vendor != "sqlite":
+            return
+
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [TABLA_FTS])
+        if cursor.fetchone() is not None:
+            return
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE {TABLA_FTS} USING fts5("
+            f"texto, content='{tabla}', content_rowid='propiedad_id', "
+            f"tokenize='unicode61 remove_diacritics 2')"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER {TABLA_FTS}_ai AFTER INSERT ON {tabla} BEGIN "
+            f"INSERT INTO {TABLA_FTS}(rowid, texto) VALUES (new.propiedad_id, new.texto); END"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER {TABLA_FTS}_ad AFTER DELETE ON {tabla} BEGIN "
+            f"INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, texto) VALUES ('delete', old.propiedad_id, old.texto); END"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER {TABLA_FTS}_au AFTER UPDATE ON {tabla} BEGIN "
+            f"INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, texto) VALUES ('delete', old.propiedad_id, old.texto); "
+            f"INSERT INTO {TABLA_FTS}(rowid, texto) VALUES (new.propiedad_id, new.texto); END"
+        )
+        cursor.execute(f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('rebuild')")
+
+
+def poblar_indice(apps, schema_editor):
+    Propiedad = apps.get_model("inmobiliaria", "Propiedad")
+    Indice = apps.get_model("inmobiliaria", "IndiceBusquedaPropiedad")
+    # FULLTEXT (MySQL) o FTS5 + triggers (SQLite) antes de cargar las filas
+    crear_indice_texto(schema_editor.connection, Indice._meta.db_table)
+
+    ultimo_id = 0
+    while True:
+        filas = list(
+            Propiedad.objects.filter(id__gt=ultimo_id).order_by("id").values_list(
+                "id", "titulo", "descripcion", "ciudad", "tipo",
+                "propietario__primer_nombre", "propietario__primer_apellido", "propietario__rut",
+            )[:1000]
+        )
+        if not filas:
+            break
+        ultimo_id = filas[-1][0]
+        Indice.objects.bulk_create([
+            Indice(propiedad_id=pid, texto=texto_indexado(titulo, descripcion, ciudad, tipo, (nombre, apellido), rut or ""))
+            for pid, titulo, descripcion, ciudad, tipo, nombre, apellido, rut in filas
+        ])
+
+
+def quitar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLA_FTS}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inmobiliaria', '0023_cambio_precio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndiceBusquedaPropiedad',
+            fields=[
+                ('propiedad', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='indice_busqueda', serialize=False, to='inmobiliaria.propiedad')),
+                ('texto', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'Índice de búsqueda de propiedad',
+                'verbose_name_plural': 'Índice de búsqueda de propiedades',
+            },
+        ),
+        migrations.RunPython(poblar_indice, quitar_indice),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:41
+
+from datetime import datetime, time
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+LOTE = 2000
+
+
+def poblar_registrado_en(apps, schema_editor):
+    # Pagos existentes: medianoche (hora local) de su fecha en vez de la hora de
+    # la migración. Por lotes de id (keyset) con bulk_update
+    Pago = apps.get_model("inmobiliaria", "Pago")
+    ultimo_id = 0
+    while True:
+        lote = list(Pago.objects.filter(id__gt=ultimo_id).order_by("id").only("id", "fecha")[:LOTE])
+        if not lote:
+            break
+        ultimo_id = lote[-1].id
+        for pago in lote:
+            pago.registrado_en = timezone.make_aware(datetime.combine(pago.fecha, time.min))
+        Pago.objects.bulk_update(lote, ["registrado_en"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inmobiliaria', '0024_indice_busqueda_propiedad'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pago',
+            name='registrado_en',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.RunPython(poblar_registrado_en, migrations.RunPython.noop),
+    ]
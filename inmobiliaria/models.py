@@ -6,6 +6,7 @@ from .validators import *
 from .config import *
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
+from .cache import invalidar_catalogo
 
 
 
@@ -37,7 +38,7 @@ class Propietario(models.Model):
     segundo_apellido = models.CharField(max_length=100)
     rut = models.CharField(max_length=20, unique=True)
     telefono = models.CharField(max_length=20, unique=True)
-    email = models.EmailField(blank=False)
+    email = models.EmailField(blank=False, db_index=True)
 
 
     def clean(self):
@@ -50,9 +51,10 @@ class Propietario(models.Model):
             validar_telefono_cl(self.telefono)
 
     def save(self, *args, **kwargs):
-        #Normaliza antes de guardar
+        #Normaliza antes de guardar (el email en minúsculas se usa como clave de perfil)
         if self.rut:
             self.rut = normalizar_rut(self.rut)
+        self.email = (self.email or "").strip().lower()
         super().save(*args, **kwargs)
 
     @property
@@ -159,6 +161,7 @@ class Propiedad(models.Model):
     propietario_user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="propiedades_subidas",null=True, blank=True)
     estado_aprobacion = models.CharField(max_length=20, choices=ESTADO_APROBACION, default='pendiente')
     observacion_admin = models.TextField(blank=True, null=True)
+    fecha_aprobacion = models.DateTimeField(null=True, blank=True, editable=False)
 
     class Meta:
         verbose_name = 'Propiedad'
@@ -168,65 +171,124 @@ class Propiedad(models.Model):
             models.Index(fields=['ciudad']),
             models.Index(fields=['precio']),      
             models.Index(fields=['aprobada']),    
+            models.Index(fields=['fecha_registro', 'id']),
         ]
 
+    # Campos cuyo valor al cargar se recuerda para detectar cambios sin releer la fila
+    CAMPOS_RASTREADOS = (
+        "estado", "precio", "aprobada", "estado_aprobacion",
+        "titulo", "descripcion", "ciudad", "tipo", "propietario_id",
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._recordar_valores()
+        return instancia
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._recordar_valores(fields)
+
+    def _recordar_valores(self, campos=None):
+        foto = self.__dict__.setdefault("_valores_cargados", {})
+        for campo in self.CAMPOS_RASTREADOS:
+            # Solo lo efectivamente cargado: leer un campo diferido haría otra consulta
+            if (campos is None or campo in campos) and campo in self.__dict__:
+                foto[campo] = self.__dict__[campo]
+
+    def valores_previos(self):
+        """
+        Valores de CAMPOS_RASTREADOS en la base antes de este save (vacío al crear).
+        Sale de lo recordado al cargar; solo consulta si la instancia no vino de la
+        base o se cargó con esos campos diferidos.
+        """
+        if self.pk is None:
+            return {}
+        foto = self.__dict__.setdefault("_valores_cargados", {})
+        faltantes = [c for c in self.CAMPOS_RASTREADOS if c not in foto]
+        if faltantes:
+            fila = Propiedad.objects.filter(pk=self.pk).values(*faltantes).first()
+            if fila is None:
+                return {}
+            foto.update(fila)
+        return dict(foto)
+
+    def cambios(self, update_fields=None):
+        # {campo: (antes, después)} de los campos rastreados que este save escribe
+        previos = self.valores_previos()
+        return {
+            campo: (antes, getattr(self, campo))
+            for campo, antes in previos.items()
+            if (update_fields is None or campo.removesuffix("_id") in update_fields) and antes != getattr(self, campo)
+        }
+
     def save(self, *args, **kwargs):
         self.aprobada = (self.estado_aprobacion == "aprobada")
         from .models import Historial
 
         creando = self.pk is None
-        old = None
-        if not creando:
-            try:
-                old = Propiedad.objects.only('estado', 'precio').get(pk=self.pk)
-            except Propiedad.DoesNotExist:
-                pass
+        update_fields = kwargs.get("update_fields")
+        cambios = {} if creando else self.cambios(update_fields)
+
+        # Momento de la aprobación (lo usa el acumulado diario de KPIs)
+        if self.aprobada and (creando or "aprobada" in cambios):
+            self.fecha_aprobacion = timezone.now()
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "fecha_aprobacion"}
 
         super().save(*args, **kwargs)
+        invalidar_catalogo()
 
-        # Registrar historial al crear
         if creando:
+            historial = [
+                Historial(propiedad=self, accion='cambio_estado', descripcion=f"Estado inicial: {self.estado}"),
+                Historial(propiedad=self, accion='actualizacion_precio', descripcion=f"Precio inicial: {self.precio}"),
+            ]
+        else:
+            historial = []
+            if "estado" in cambios:
+                antes, despues = cambios["estado"]
+                historial.append(Historial(
+                    propiedad=self, accion='cambio_estado', descripcion=f"Cambio de estado: {antes} → {despues}",
+                ))
+            if "precio" in cambios:
+                antes, despues = cambios["precio"]
+                historial.append(Historial(
+                    propiedad=self, accion='actualizacion_precio', descripcion=f"Cambio de precio: {antes} → {despues}",
+                ))
+            if "estado_aprobacion" in cambios:
+                from .aprobaciones import descripcion_aprobacion
+                historial.append(Historial(
+                    propiedad=self, accion='cambio_aprobacion', descripcion=descripcion_aprobacion(*cambios["estado_aprobacion"]),
+                ))
+
+        # Serie numérica de precios (ver CambioPrecio)
+        if creando:
+            CambioPrecio.objects.create(propiedad=self, precio_nuevo=self.precio)
+        elif "precio" in cambios:
+            antes, despues = cambios["precio"]
+            CambioPrecio.objects.create(propiedad=self, precio_anterior=antes, precio_nuevo=despues)
+
+        # Lo recién escrito pasa a ser el estado conocido para el próximo save
+        self._recordar_valores(update_fields)
+        if historial:
             try:
-                Historial.objects.create(
-                    propiedad=self,
-                    accion='cambio_estado',
-                    descripcion=f"Estado inicial: {self.estado}",
-                )
-                
-                Historial.objects.create(
-                    propiedad=self,
-                    accion='actualizacion_precio',
-                    descripcion=f"Precio inicial: {self.precio}",
-                )
-            except Exception:
-                pass
-            return
-
-        # Registrar cambio de estado
-        if old and old.estado != self.estado:
-            try:
-                Historial.objects.create(
-                    propiedad=self,
-                    accion='cambio_estado',
-                    descripcion=f"Cambio de estado: {old.estado} → {self.estado}",
-                )
+                Historial.objects.bulk_create(historial)
             except Exception:
                 pass
 
-        # Registrar cambio de precio
-        if old and old.precio != self.precio:
-            try:
-                Historial.objects.create(
-                    propiedad=self,
-                    accion='actualizacion_precio',
-                    descripcion=f"Cambio de precio: {old.precio} → {self.precio}",
-                )
-            except Exception:
-                pass
+    def delete(self, *args, **kwargs):
+        invalidar_catalogo()
+        return super().delete(*args, **kwargs)
     
     @property
     def foto_principal(self):
-        fp = self.fotos.filter(principal=True).first()
+        # Si las fotos vienen precargadas (con_fotos) no se hace otra consulta
+        if "fotos" in getattr(self, "_prefetched_objects_cache", {}):
+            fp = next((f for f in self.fotos.all() if f.principal), None)
+        else:
+            fp = self.fotos.filter(principal=True).first()
         return fp.foto.url if fp and fp.foto else None
     
     def __str__(self):
@@ -242,7 +304,7 @@ class Interesado(models.Model):
     segundo_apellido = models.CharField(max_length=100)
     rut = models.CharField(max_length=20, unique=True, validators=[validar_rut]) 
     telefono = models.CharField(max_length=20)
-    email = models.EmailField(blank=True)
+    email = models.EmailField(blank=True, db_index=True)
     fecha_registro = models.DateTimeField(default=timezone.now, editable=False)
     usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,related_name="perfil_interesado")
 
@@ -254,6 +316,11 @@ class Interesado(models.Model):
         if self.telefono:
             validar_telefono_cl(self.telefono)
 
+    def save(self, *args, **kwargs):
+        # El email en minúsculas se usa como clave de perfil
+        self.email = (self.email or "").strip().lower()
+        super().save(*args, **kwargs)
+
     # Junta nombres y apellidos
     @property
     def nombre_completo(self):
@@ -497,6 +564,10 @@ class Pago(models.Model):
     medio = models.CharField(max_length=30, choices=MEDIOS_PAGO, default="transferencia")
     comprobante = models.FileField(upload_to="pagos/", blank=True, null=True)
     notas = models.TextField(blank=True)
+    # Lote de pago masivo que creó el registro (ver cuotas.pagar_cuotas)
+    lote = models.UUIDField(null=True, blank=True, db_index=True, editable=False)
+    # Momento de registro ('fecha' es la del pago y puede ser anterior); lo usa kpis.acumular_kpis
+    registrado_en = models.DateTimeField(default=timezone.now, editable=False)
 
     comprobante = models.FileField(
         upload_to='pagos/',
@@ -504,7 +575,28 @@ class Pago(models.Model):
         null=True,
         verbose_name='Comprobante / boleta'
     )    
-    
+
+    class Meta:
+        indexes = [models.Index(fields=["fecha", "id"])]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Contrato al cargar: una edición que lo cambia debe recalcular ambos saldos
+        if "contrato_id" in instancia.__dict__:
+            instancia._contrato_cargado = instancia.contrato_id
+        return instancia
+
+    def contrato_previo(self):
+        """Contrato en la base antes de este save (None al crear); consulta solo si no se recordó al cargar."""
+        if self._state.adding or self.pk is None:
+            return None
+        if "_contrato_cargado" not in self.__dict__:
+            self._contrato_cargado = (
+                Pago.objects.filter(pk=self.pk).values_list("contrato_id", flat=True).first()
+            )
+        return self._contrato_cargado
+
     def __str__(self):
         return f"Pago {self.monto} - {self.contrato}"
     
@@ -530,6 +622,11 @@ class PropiedadFoto(models.Model):
                  .filter(propiedad=self.propiedad)
                  .exclude(pk=self.pk)
                  .update(principal=False))
+            invalidar_catalogo()
+
+    def delete(self, *args, **kwargs):
+        invalidar_catalogo()
+        return super().delete(*args, **kwargs)
 
 
 
@@ -551,6 +648,7 @@ class Historial(models.Model):
     ACCION = [
         ('cambio_estado', 'Cambio de estado'),
         ('actualizacion_precio', 'Actualización de precio'),
+        ('cambio_aprobacion', 'Cambio de aprobación'),
     ]
 
     propiedad = models.ForeignKey(Propiedad, on_delete=models.CASCADE, related_name="historial")
@@ -561,12 +659,88 @@ class Historial(models.Model):
 
     class Meta:
         ordering = ['-fecha']
-        indexes = [models.Index(fields=["accion", "fecha"])]
+        indexes = [
+            models.Index(fields=["accion", "fecha"]),
+            models.Index(fields=["propiedad", "fecha", "id"], name="historial_prop_fecha_idx"),
+        ]
         verbose_name = "Historial"
         verbose_name_plural = "Historial"
 
     def __str__(self):
         return f"{self.propiedad.titulo} - {self.accion} ({self.fecha.date()})"
+
+
+class HistorialArchivado(models.Model):
+    """
+    Filas antiguas de Historial movidas por archivar_historial. Conserva el id
+    original y guarda la acción como código corto; el endpoint de historial
+    lee ambas tablas (ver historial.py).
+    """
+    ACCIONES = [
+        (1, 'cambio_estado'),
+        (2, 'actualizacion_precio'),
+        (3, 'cambio_aprobacion'),
+    ]
+
+    id = models.BigIntegerField(primary_key=True)
+    propiedad = models.ForeignKey(Propiedad, on_delete=models.CASCADE, related_name="historial_archivado", db_index=False)
+    fecha = models.DateTimeField()
+    accion = models.PositiveSmallIntegerField(choices=ACCIONES)
+    descripcion = models.TextField(blank=True)
+    usuario = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["propiedad", "fecha", "id"], name="historial_arch_prop_fecha_idx")]
+        verbose_name = "Historial archivado"
+        verbose_name_plural = "Historial archivado"
+
+    def __str__(self):
+        return f"{self.propiedad_id} - {self.get_accion_display()} ({self.fecha.date()})"
+
+
+class IndiceBusquedaPropiedad(models.Model):
+    """
+    Texto normalizado de cada propiedad para la búsqueda del catálogo
+    (FULLTEXT en MySQL, FTS5 en SQLite). Lo mantienen las señales; ver
+    busqueda_propiedades.py.
+    """
+    propiedad = models.OneToOneField(Propiedad, primary_key=True, on_delete=models.CASCADE, related_name="indice_busqueda")
+    texto = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = "Índice de búsqueda de propiedad"
+        verbose_name_plural = "Índice de búsqueda de propiedades"
+
+    def __str__(self):
+        return f"Índice propiedad {self.propiedad_id}"
+
+
+class CambioPrecio(models.Model):
+    """
+    Serie de precios de una propiedad en forma numérica (el precio inicial tiene
+    precio_anterior nulo). La escribe Propiedad.save; ver precios.py.
+    """
+    propiedad = models.ForeignKey(Propiedad, on_delete=models.CASCADE, related_name="cambios_precio", db_index=False)
+    fecha = models.DateTimeField(default=timezone.now)
+    # Primer día del mes en hora local: agrupa por mes sin funciones de fecha propias del motor
+    mes = models.DateField()
+    precio_anterior = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    precio_nuevo = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["propiedad", "fecha"], name="cambio_precio_prop_fecha_idx"),
+            models.Index(fields=["mes", "propiedad"], name="cambio_precio_mes_idx"),
+        ]
+        verbose_name = "Cambio de precio"
+        verbose_name_plural = "Cambios de precio"
+
+    def save(self, *args, **kwargs):
+        self.mes = timezone.localtime(self.fecha).date().replace(day=1)
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.propiedad_id}: {self.precio_anterior} → {self.precio_nuevo} ({self.fecha.date()})"
     
 
 
@@ -619,6 +793,10 @@ class CuotaContrato(models.Model):
             fecha = timezone.localdate()
 
         with transaction.atomic():
+            # Bloquea la fila siempre: dos pagos concurrentes de la misma cuota se
+            # serializan aquí y el segundo ve la cuota ya pagada
+            if CuotaContrato.objects.select_for_update().only("pagada").get(pk=self.pk).pagada:
+                raise ValidationError("Esta cuota ya está pagada.")
             pago = Pago.objects.create(
                 contrato=self.contrato,
                 fecha=fecha,
@@ -636,6 +814,76 @@ class CuotaContrato(models.Model):
         estado = "Pagada" if self.pagada else "Pendiente"
         return f"Cuota {self.contrato} - {self.vencimiento} ({estado})"
     
+class SaldoContrato(models.Model):
+    """
+    Saldo materializado de un contrato. Lo mantienen las señales de Pago y
+    CuotaContrato (ver saldos.py); recalcular_saldos lo reconstruye y verifica.
+    """
+    contrato = models.OneToOneField(Contrato, primary_key=True, on_delete=models.CASCADE, related_name="saldo_actual")
+    total_pagado = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    saldo = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cuotas_pendientes = models.PositiveIntegerField(default=0)
+    proximo_vencimiento = models.DateField(null=True, blank=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Saldo de contrato"
+        verbose_name_plural = "Saldos de contratos"
+
+    def __str__(self):
+        return f"Saldo contrato {self.contrato_id}: {self.saldo}"
+
+
+class KpiDiario(models.Model):
+    """Acumulado diario de actividad para los gráficos del panel admin (ver kpis.acumular_kpis)."""
+    fecha = models.DateField(unique=True)
+    propiedades_nuevas = models.PositiveIntegerField(default=0)
+    propiedades_aprobadas = models.PositiveIntegerField(default=0)
+    reservas_nuevas = models.PositiveIntegerField(default=0)
+    solicitudes_nuevas = models.PositiveIntegerField(default=0)
+    pagos_cantidad = models.PositiveIntegerField(default=0)
+    pagos_monto = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["fecha"]
+        verbose_name = "KPI diario"
+        verbose_name_plural = "KPIs diarios"
+
+    def __str__(self):
+        return f"KPIs {self.fecha}"
+
+
+class MarcaKpi(models.Model):
+    # Hasta dónde se acumuló cada fuente: último id procesado o última fecha (aprobaciones)
+    fuente = models.CharField(max_length=30, unique=True)
+    ultimo_id = models.BigIntegerField(default=0)
+    ultima_fecha = models.DateTimeField(null=True, blank=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.fuente}: {self.ultimo_id or self.ultima_fecha}"
+
+
+class TerminoBusquedaUsuario(models.Model):
+    """
+    Índice de búsqueda de personas: un término normalizado (sin tildes, en
+    minúsculas) por fila, tomado del usuario y de sus perfiles de propietario e
+    interesado. Lo mantienen las señales (ver busqueda.py).
+    """
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="terminos_busqueda")
+    termino = models.CharField(max_length=100)
+    peso = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        indexes = [models.Index(fields=["termino", "usuario"], name="termino_busq_usuario_idx")]
+        verbose_name = "Término de búsqueda"
+        verbose_name_plural = "Términos de búsqueda"
+
+    def __str__(self):
+        return f"{self.usuario_id}: {self.termino}"
+
+
 # Tabla notificaciones
 class Notificacion(models.Model):
     TIPOS = [
@@ -659,3 +907,29 @@ class Notificacion(models.Model):
 
     def __str__(self):
         return f"[{self.tipo}] {self.titulo}"
+
+
+class NotificacionOutbox(models.Model):
+    """Evento de dominio pendiente de convertirse en notificaciones (lo drena procesar_outbox)."""
+    ESTADOS = [
+        ("pendiente", "Pendiente"),
+        ("enviado", "Enviado"),
+        ("fallido", "Fallido"),
+    ]
+    evento = models.CharField(max_length=120, blank=True)
+    # Lista de {"usuario_id", "titulo", "mensaje", "tipo"}
+    payload = models.JSONField(default=list)
+    estado = models.CharField(max_length=10, choices=ESTADOS, default="pendiente")
+    intentos = models.PositiveSmallIntegerField(default=0)
+    disponible_en = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    procesado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["estado", "disponible_en", "id"])]
+        verbose_name = "Evento de notificación"
+        verbose_name_plural = "Outbox de notificaciones"
+
+    def __str__(self):
+        return f"[{self.estado}] {self.evento or self.pk}"
@@ -1,24 +1,92 @@
+import threading
+from contextlib import contextmanager
+
 from django.contrib.auth import get_user_model
-from .models import Notificacion
+from .models import NotificacionOutbox
 
 User = get_user_model()
 
-def notificar_usuario(usuario, titulo, mensaje, tipo="SISTEMA"):
-    if not usuario:
-        return None
-    return Notificacion.objects.create(
-        usuario=usuario,
-        titulo=titulo,
-        mensaje=mensaje,
-        tipo=tipo,
-    )
-
-def notificar_admins(titulo, mensaje, tipo="SISTEMA"):
-    admins = User.objects.filter(rol="ADMIN", is_active=True)
-    for u in admins:
-        Notificacion.objects.create(
-            usuario=u,
-            titulo=titulo,
-            mensaje=mensaje,
-            tipo=tipo,
-        )
+_local = threading.local()
+
+
+class DespachoNotificaciones:
+    """
+    Junta las notificaciones de un evento de dominio y al cerrar agrega una fila
+    de NotificacionOutbox por evento, dentro de la misma transacción; el worker
+    procesar_outbox las convierte en Notificacion. Una notificación repetida para
+    el mismo usuario y evento (o mismo contenido si no hay evento) se descarta.
+    """
+
+    def __init__(self):
+        self.pendientes = {}
+
+    def agregar(self, usuario, titulo, mensaje, tipo="SISTEMA", evento=None):
+        usuario_id = getattr(usuario, "pk", usuario)
+        if not usuario_id:
+            return
+        clave = (usuario_id, evento) if evento is not None else (usuario_id, tipo, titulo, mensaje)
+        if clave in self.pendientes:
+            return
+        self.pendientes[clave] = (evento, {
+            "usuario_id": usuario_id,
+            "titulo": titulo[:120],
+            "mensaje": mensaje,
+            "tipo": tipo,
+        })
+
+    def escribir(self):
+        if not self.pendientes:
+            return
+        por_evento = {}
+        for evento, notificacion in self.pendientes.values():
+            por_evento.setdefault(evento, []).append(notificacion)
+        NotificacionOutbox.objects.bulk_create([
+            NotificacionOutbox(evento=_nombre_evento(evento), payload=payload)
+            for evento, payload in por_evento.items()
+        ])
+        self.pendientes = {}
+
+
+def _nombre_evento(evento):
+    if evento is None:
+        return ""
+    if isinstance(evento, (tuple, list)):
+        return ":".join(str(p) for p in evento)[:120]
+    return str(evento)[:120]
+
+
+@contextmanager
+def despacho_notificaciones():
+    # Reutiliza el despacho abierto más externo del hilo; el externo es quien escribe
+    actual = getattr(_local, "despacho", None)
+    if actual is not None:
+        yield actual
+        return
+
+    despacho = DespachoNotificaciones()
+    _local.despacho = despacho
+    ok = False
+    try:
+        yield despacho
+        ok = True
+    finally:
+        _local.despacho = None
+    if ok:
+        # Se escribe en la transacción en curso: si se revierte, el evento también
+        despacho.escribir()
+
+
+def notificar(usuario, titulo, mensaje, tipo="SISTEMA", evento=None):
+    with despacho_notificaciones() as despacho:
+        despacho.agregar(usuario, titulo, mensaje, tipo=tipo, evento=evento)
+
+
+def notificar_usuario(usuario, titulo, mensaje, tipo="SISTEMA", evento=None):
+    notificar(usuario, titulo, mensaje, tipo=tipo, evento=evento)
+
+
+def notificar_admins(titulo, mensaje, tipo="SISTEMA", evento=None):
+    admin_ids = User.objects.filter(rol="ADMIN", is_active=True).values_list("id", flat=True)
+    with despacho_notificaciones() as despacho:
+        for admin_id in admin_ids:
+            despacho.agregar(admin_id, titulo, mensaje, tipo=tipo, evento=evento)
@@ -0,0 +1,138 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import transaction, connection
+from django.db.models import Count, Min, F
+from django.utils import timezone
+
+from .config import OUTBOX_LOTE, OUTBOX_MAX_INTENTOS, OUTBOX_BACKOFF_SEG, OUTBOX_LEASE_SEG
+from .models import NotificacionOutbox, Notificacion
+
+
+def reclamar_lote(limite=OUTBOX_LOTE):
+    """
+    Toma hasta 'limite' eventos pendientes y los aparta durante OUTBOX_LEASE_SEG.
+    skip_locked permite varios workers en paralelo; si un worker muere, el
+    evento vuelve a estar disponible al vencer el lease.
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            NotificacionOutbox.objects
+            .filter(estado="pendiente", disponible_en__lte=ahora)
+            .select_for_update(skip_locked=True)
+            .order_by("disponible_en", "id")
+            .values_list("id", flat=True)[:limite]
+        )
+        if ids:
+            NotificacionOutbox.objects.filter(id__in=ids).update(
+                intentos=F("intentos") + 1,
+                disponible_en=ahora + timedelta(seconds=OUTBOX_LEASE_SEG),
+            )
+    return list(NotificacionOutbox.objects.filter(id__in=ids).order_by("id"))
+
+
+def entregar(evento):
+    # Notificaciones y cambio de estado en la misma transacción: cada evento se entrega una vez.
+    # Retorna False si el evento ya no pertenece a este worker
+    with transaction.atomic():
+        # Si el lease venció y otro worker lo reclamó, 'intentos' ya no coincide
+        tomado = NotificacionOutbox.objects.filter(
+            pk=evento.pk, estado="pendiente", intentos=evento.intentos,
+        ).update(estado="enviado", procesado_en=timezone.now(), ultimo_error="")
+        if not tomado:
+            return False
+        Notificacion.objects.bulk_create([
+            Notificacion(
+                usuario_id=n["usuario_id"],
+                titulo=n["titulo"][:120],
+                mensaje=n["mensaje"],
+                tipo=n.get("tipo", "SISTEMA"),
+            )
+            for n in evento.payload
+        ])
+    return True
+
+
+def _registrar_fallo(evento, error):
+    # Condicionado al lease como en entregar; retorna si se registró
+    if evento.intentos >= OUTBOX_MAX_INTENTOS:
+        cambios = {"estado": "fallido", "procesado_en": timezone.now()}
+    else:
+        # Backoff exponencial: 30s, 60s, 120s...
+        espera = OUTBOX_BACKOFF_SEG * 2 ** (evento.intentos - 1)
+        cambios = {"disponible_en": timezone.now() + timedelta(seconds=espera)}
+    return bool(NotificacionOutbox.objects.filter(
+        pk=evento.pk, estado="pendiente", intentos=evento.intentos,
+    ).update(ultimo_error=str(error)[:2000], **cambios))
+
+
+def _procesar(evento):
+    # "enviado", "fallido" o None si otro worker tomó el evento (lease vencido)
+    try:
+        return "enviado" if entregar(evento) else None
+    except Exception as e:
+        return "fallido" if _registrar_fallo(evento, e) else None
+
+
+def _procesar_en_hilo(evento):
+    try:
+        return _procesar(evento)
+    finally:
+        # Cada hilo del pool abre su propia conexión
+        connection.close()
+
+
+def procesar_lote(limite=OUTBOX_LOTE, hilos=1, pool=None):
+    """
+    Reclama y entrega un lote. Retorna (enviados, fallidos, reclamados): solo
+    cuentan los eventos cuyo estado cambió este worker; los que perdieron el
+    lease quedan en 'reclamados' pero no en los totales.
+    """
+    eventos = reclamar_lote(limite)
+    if not eventos:
+        return 0, 0, 0
+    if pool is None or hilos <= 1:
+        resultados = [_procesar(e) for e in eventos]
+    else:
+        resultados = list(pool.map(_procesar_en_hilo, eventos))
+    return resultados.count("enviado"), resultados.count("fallido"), len(eventos)
+
+
+def drenar(limite=OUTBOX_LOTE, hilos=1):
+    """Procesa lotes hasta que no queden eventos disponibles. Retorna (enviados, fallidos, segundos)."""
+    inicio = time.perf_counter()
+    enviados = fallidos = 0
+    pool = ThreadPoolExecutor(max_workers=hilos) if hilos > 1 else None
+    try:
+        while True:
+            ok, error, reclamados = procesar_lote(limite, hilos, pool)
+            enviados += ok
+            fallidos += error
+            if reclamados < limite:
+                break
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return enviados, fallidos, time.perf_counter() - inicio
+
+
+def metricas():
+    # Profundidad de la cola por estado y antigüedad del evento pendiente más viejo
+    por_estado = dict(
+        NotificacionOutbox.objects.values_list("estado").annotate(n=Count("id")).order_by()
+    )
+    mas_antiguo = NotificacionOutbox.objects.filter(estado="pendiente").aggregate(m=Min("created_at"))["m"]
+    return {
+        "pendientes": por_estado.get("pendiente", 0),
+        "enviados": por_estado.get("enviado", 0),
+        "fallidos": por_estado.get("fallido", 0),
+        "antiguedad_seg": (timezone.now() - mas_antiguo).total_seconds() if mas_antiguo else 0,
+    }
+
+
+def purgar_enviados(dias):
+    limite = timezone.now() - timedelta(days=dias)
+    borrados, _ = NotificacionOutbox.objects.filter(estado="enviado", procesado_en__lt=limite).delete()
+    return borrados
@@ -0,0 +1,161 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por cursor (keyset) sobre columnas indexadas.
+
+    El orden se toma de `view.cursor_ordering`, p.ej. ("-fecha", "-id"); el último
+    campo debe ser único para que el desempate sea estable. No usa OFFSET ni COUNT,
+    por lo que el costo de una página no depende de su profundidad.
+    """
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = ("-id",)
+
+    def __init__(self, page_size=None):
+        self.page_size = page_size or PageNumberPagination.page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = tuple(getattr(view, "cursor_ordering", None) or self.ordering)
+        self.model = queryset.model
+        self.page_size = self.get_page_size(request)
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        valores, self.reverso = self.decode_cursor(encoded) if encoded else (None, False)
+
+        orden = self._invertir(self.ordering) if self.reverso else self.ordering
+        queryset = queryset.order_by(*orden)
+        if valores is not None:
+            queryset = queryset.filter(self._filtro_posterior(orden, valores))
+
+        filas = list(queryset[: self.page_size + 1])
+        hay_mas = len(filas) > self.page_size
+        filas = filas[: self.page_size]
+        if self.reverso:
+            filas.reverse()
+
+        # Con cursor hacia atrás, "hay_mas" indica que existen páginas anteriores
+        self.tiene_siguiente = (not self.reverso and hay_mas) or (self.reverso and valores is not None)
+        self.tiene_anterior = (self.reverso and hay_mas) or (not self.reverso and valores is not None)
+        self.page = filas
+        return filas
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.tiene_siguiente or not self.page:
+            return None
+        return self._link(self.page[-1], reverso=False)
+
+    def get_previous_link(self):
+        if not self.tiene_anterior or not self.page:
+            return None
+        return self._link(self.page[0], reverso=True)
+
+    # --- cursor ---
+
+    def _campos(self):
+        return [c.lstrip("-") for c in self.ordering]
+
+    def _link(self, fila, reverso):
+        valores = [getattr(fila, campo) for campo in self._campos()]
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, "page")
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(valores, reverso))
+
+    def encode_cursor(self, valores, reverso):
+        payload = {
+            "v": [v.isoformat() if hasattr(v, "isoformat") else v for v in valores],
+            "r": int(reverso),
+        }
+        raw = json.dumps(payload, default=str, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii")
+
+    def decode_cursor(self, encoded):
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            crudos = payload["v"]
+            campos = self._campos()
+            if len(crudos) != len(campos):
+                raise ValueError
+            valores = [
+                self.model._meta.get_field(campo).to_python(v)
+                for campo, v in zip(campos, crudos)
+            ]
+            return valores, bool(payload.get("r"))
+        except Exception:
+            raise NotFound("Cursor inválido.")
+
+    @staticmethod
+    def _invertir(orden):
+        return tuple(c[1:] if c.startswith("-") else f"-{c}" for c in orden)
+
+    @staticmethod
+    def _filtro_posterior(orden, valores):
+        # Comparación lexicográfica (a, b, c) > (x, y, z) respetando el sentido de cada campo
+        filtro = Q()
+        for i, campo in enumerate(orden):
+            nombre = campo.lstrip("-")
+            lookup = "lt" if campo.startswith("-") else "gt"
+            paso = Q(**{f"{nombre}__{lookup}": valores[i]})
+            for previo, valor in zip(orden[:i], valores[:i]):
+                paso &= Q(**{previo.lstrip("-"): valor})
+            filtro |= paso
+        return filtro
+
+
+class PaginacionMixta(PageNumberPagination):
+    """
+    PageNumberPagination por defecto; el cliente activa el modo cursor enviando
+    `?paginacion=cursor` (o directamente un `?cursor=` de una respuesta previa).
+    """
+    modo_query_param = "paginacion"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if (
+            request.query_params.get(self.modo_query_param) == "cursor"
+            or KeysetPagination.cursor_query_param in request.query_params
+        ):
+            self.keyset = KeysetPagination(page_size=self.page_size)
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,132 @@
+import re
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection
+from django.db.models import Min
+from django.utils import timezone
+
+# "Cambio de precio: 100000.00 → 120000" / "Precio inicial: 100000"
+_CAMBIO = re.compile(r"Cambio de precio:\s*([\d.,]+)\s*(?:→|->)\s*([\d.,]+)")
+_INICIAL = re.compile(r"Precio inicial:\s*([\d.,]+)")
+
+
+def _decimal(texto):
+    try:
+        return Decimal(texto.replace(",", ""))
+    except InvalidOperation:
+        return None
+
+
+def parsear_descripcion(descripcion):
+    """(precio_anterior, precio_nuevo) de una descripción de Historial, o None si no se reconoce."""
+    m = _CAMBIO.search(descripcion or "")
+    if m:
+        antes, despues = _decimal(m.group(1)), _decimal(m.group(2))
+        return (antes, despues) if antes is not None and despues is not None else None
+    m = _INICIAL.search(descripcion or "")
+    if m:
+        despues = _decimal(m.group(1))
+        return (None, despues) if despues is not None else None
+    return None
+
+
+def serie_precios(propiedad_id):
+    from .models import CambioPrecio
+
+    return (
+        CambioPrecio.objects
+        .filter(propiedad_id=propiedad_id)
+        .order_by("fecha", "id")
+        .only("fecha", "precio_anterior", "precio_nuevo")
+    )
+
+
+_SQL_MEDIANAS = """
+WITH meses AS (
+    {meses}
+),
+ultimos AS (
+    SELECT c.propiedad_id, c.mes, p.ciudad, p.tipo, c.precio_nuevo AS precio,
+           ROW_NUMBER() OVER (PARTITION BY c.propiedad_id, c.mes ORDER BY c.fecha DESC, c.id DESC) AS rn
+    FROM {cambios} c
+    JOIN {propiedades} p ON p.id = c.propiedad_id
+    WHERE p.aprobada = %s AND c.mes <= %s{filtros}
+),
+tramos AS (
+    SELECT ciudad, tipo, precio, mes AS inicio,
+           LEAD(mes) OVER (PARTITION BY propiedad_id ORDER BY mes) AS fin
+    FROM ultimos
+    WHERE rn = 1
+),
+vigentes AS (
+    SELECT m.mes, t.ciudad, t.tipo, t.precio
+    FROM meses m
+    JOIN tramos t ON t.inicio <= m.mes AND (t.fin IS NULL OR m.mes < t.fin)
+),
+ordenados AS (
+    SELECT mes, ciudad, tipo, precio,
+           ROW_NUMBER() OVER (PARTITION BY mes, ciudad, tipo ORDER BY precio) AS pos,
+           COUNT(*) OVER (PARTITION BY mes, ciudad, tipo) AS n
+    FROM vigentes
+)
+SELECT mes, ciudad, tipo, AVG(precio) AS mediana, MIN(n) AS propiedades
+FROM ordenados
+WHERE 2 * pos BETWEEN n AND n + 2
+GROUP BY mes, ciudad, tipo
+ORDER BY ciudad, tipo, mes
+"""
+
+
+def _meses(desde, hasta):
+    meses = []
+    while desde <= hasta:
+        meses.append(desde)
+        desde = (desde + timedelta(days=32)).replace(day=1)
+    return meses
+
+
+def medianas_precio(ciudad=None, tipo=None, desde=None, hasta=None):
+    """
+    Mediana mensual del precio por ciudad y tipo entre propiedades aprobadas.
+    Cada propiedad cuenta en cada mes con su último precio conocido al cierre
+    de ese mes (aunque no haya cambiado en él); la mediana sale de funciones
+    de ventana (ROW_NUMBER/COUNT) en la base. 'desde'/'hasta' son fechas (se
+    usa su mes, ambos inclusive); por defecto, del primer cambio al mes actual.
+    """
+    from .models import CambioPrecio, Propiedad
+
+    filtros, params = [], []
+    if ciudad:
+        filtros.append("LOWER(p.ciudad) = LOWER(%s)")
+        params.append(ciudad)
+    if tipo:
+        filtros.append("p.tipo = %s")
+        params.append(tipo)
+
+    hasta = (hasta or timezone.localdate()).replace(day=1)
+    if desde is None:
+        desde = CambioPrecio.objects.aggregate(primero=Min("mes"))["primero"]
+        if desde is None:
+            return []
+    meses = _meses(desde.replace(day=1), hasta)
+    if not meses:
+        return []
+
+    sql = _SQL_MEDIANAS.format(
+        meses=" UNION ALL ".join(["SELECT %s AS mes"] * len(meses)),
+        cambios=connection.ops.quote_name(CambioPrecio._meta.db_table),
+        propiedades=connection.ops.quote_name(Propiedad._meta.db_table),
+        filtros="".join(f" AND {f}" for f in filtros),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*meses, True, hasta, *params])
+        columnas = [c[0] for c in cursor.description]
+        filas = [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+
+    campo_mes = CambioPrecio._meta.get_field("mes")
+    for fila in filas:
+        # SQLite devuelve la fecha como texto y AVG como float
+        fila["mes"] = campo_mes.to_python(fila["mes"])
+        fila["mediana"] = Decimal(str(fila["mediana"])).quantize(Decimal("0.01"))
+    return filas
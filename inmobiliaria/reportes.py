@@ -0,0 +1,128 @@
+import csv
+from datetime import timedelta
+
+from django.db.models import Count, Q, Sum
+
+from .config import TRAMOS_MOROSIDAD
+
+
+def cuotas_vencidas(qs, corte):
+    # Rango sobre vencimiento + pagada: lo resuelve el índice (vencimiento, pagada)
+    return qs.filter(vencimiento__lt=corte, pagada=False)
+
+
+def _condicion_tramo(corte, desde, hasta):
+    # días de atraso = corte - vencimiento
+    cond = Q(vencimiento__lte=corte - timedelta(days=desde))
+    if hasta is not None:
+        cond &= Q(vencimiento__gte=corte - timedelta(days=hasta))
+    return cond
+
+
+def nombre_tramo(dias):
+    for nombre, desde, hasta in TRAMOS_MOROSIDAD:
+        if dias >= desde and (hasta is None or dias <= hasta):
+            return nombre
+    return TRAMOS_MOROSIDAD[0][0]
+
+
+def resumen_morosidad(qs, corte):
+    """
+    Deuda vencida al 'corte' por propietario y contrato, separada en tramos de
+    atraso. Una sola consulta agrupada por contrato con sumas condicionales.
+    """
+    tramos = {
+        f"t{i}": Sum("monto", filter=_condicion_tramo(corte, desde, hasta))
+        for i, (_, desde, hasta) in enumerate(TRAMOS_MOROSIDAD)
+    }
+    filas = (
+        cuotas_vencidas(qs, corte)
+        .values(
+            "contrato_id",
+            "contrato__propiedad__titulo",
+            "contrato__comprador_arrendatario__rut",
+            "contrato__propiedad__propietario_id",
+            "contrato__propiedad__propietario__rut",
+            "contrato__propiedad__propietario__primer_nombre",
+            "contrato__propiedad__propietario__primer_apellido",
+        )
+        .annotate(cuotas=Count("id"), total=Sum("monto"), **tramos)
+        .order_by("contrato__propiedad__propietario_id", "contrato_id")
+    )
+
+    def _tramos(fila):
+        return {nombre: fila[f"t{i}"] or 0 for i, (nombre, _, _) in enumerate(TRAMOS_MOROSIDAD)}
+
+    propietarios = []
+    totales = {nombre: 0 for nombre, _, _ in TRAMOS_MOROSIDAD}
+    for fila in filas:
+        pid = fila["contrato__propiedad__propietario_id"]
+        if not propietarios or propietarios[-1]["propietario_id"] != pid:
+            propietarios.append({
+                "propietario_id": pid,
+                "rut": fila["contrato__propiedad__propietario__rut"],
+                "nombre": " ".join(filter(None, [
+                    fila["contrato__propiedad__propietario__primer_nombre"],
+                    fila["contrato__propiedad__propietario__primer_apellido"],
+                ])),
+                "total": 0,
+                "tramos": {nombre: 0 for nombre, _, _ in TRAMOS_MOROSIDAD},
+                "contratos": [],
+            })
+        grupo = propietarios[-1]
+        por_tramo = _tramos(fila)
+        grupo["contratos"].append({
+            "contrato_id": fila["contrato_id"],
+            "propiedad": fila["contrato__propiedad__titulo"],
+            "arrendatario_rut": fila["contrato__comprador_arrendatario__rut"],
+            "cuotas": fila["cuotas"],
+            "total": fila["total"],
+            "tramos": por_tramo,
+        })
+        grupo["total"] += fila["total"]
+        for nombre, monto in por_tramo.items():
+            grupo["tramos"][nombre] += monto
+            totales[nombre] += monto
+
+    return {
+        "fecha_corte": corte.isoformat(),
+        "tramos": [nombre for nombre, _, _ in TRAMOS_MOROSIDAD],
+        "totales": totales,
+        "propietarios": propietarios,
+    }
+
+
+ENCABEZADO_MOROSIDAD = [
+    "propietario_id", "propietario_rut", "contrato_id", "propiedad", "arrendatario_rut",
+    "cuota_id", "vencimiento", "monto", "dias_atraso", "tramo",
+]
+
+
+class _Eco:
+    # "Archivo" para csv.writer que devuelve la línea en vez de guardarla
+    def write(self, valor):
+        return valor
+
+
+def csv_morosidad(qs, corte):
+    """Genera el detalle de cuotas vencidas como líneas CSV, en el orden del índice."""
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(ENCABEZADO_MOROSIDAD)
+    filas = (
+        cuotas_vencidas(qs, corte)
+        .order_by("vencimiento", "id")
+        .values_list(
+            "contrato__propiedad__propietario_id",
+            "contrato__propiedad__propietario__rut",
+            "contrato_id",
+            "contrato__propiedad__titulo",
+            "contrato__comprador_arrendatario__rut",
+            "id",
+            "vencimiento",
+            "monto",
+        )
+        .iterator(chunk_size=2000)
+    )
+    for *datos, vencimiento, monto in filas:
+        dias = (corte - vencimiento).days
+        yield escritor.writerow([*datos, vencimiento.isoformat(), monto, dias, nombre_tramo(dias)])
@@ -0,0 +1,82 @@
+from django.db.models import Sum, Count, Min, F
+from django.utils import timezone
+
+from .models import Contrato, Pago, CuotaContrato, SaldoContrato
+from .utils import upsert
+
+CAMPOS_SALDO = ["total_pagado", "saldo", "cuotas_pendientes", "proximo_vencimiento", "actualizado_en"]
+
+
+def _resumen_cuotas(contrato_ids):
+    # {contrato_id: (pendientes, proximo_vencimiento)} en una consulta agrupada
+    return {
+        cid: (n, proximo)
+        for cid, n, proximo in (
+            CuotaContrato.objects
+            .filter(contrato_id__in=contrato_ids, pagada=False)
+            .values_list("contrato_id")
+            .annotate(n=Count("id"), proximo=Min("vencimiento"))
+            .order_by()
+        )
+    }
+
+
+def calcular_saldos(contrato_ids):
+    """Calcula desde cero los saldos de 'contrato_ids' con tres consultas, sin escribir."""
+    precios = dict(Contrato.objects.filter(id__in=contrato_ids).values_list("id", "precio_pactado"))
+    pagado = dict(
+        Pago.objects
+        .filter(contrato_id__in=contrato_ids)
+        .values_list("contrato_id")
+        .annotate(total=Sum("monto"))
+        .order_by()
+    )
+    cuotas = _resumen_cuotas(contrato_ids)
+    saldos = []
+    for cid, precio in precios.items():
+        total = pagado.get(cid) or 0
+        pendientes, proximo = cuotas.get(cid, (0, None))
+        saldos.append(SaldoContrato(
+            contrato_id=cid,
+            total_pagado=total,
+            saldo=(precio or 0) - total,
+            cuotas_pendientes=pendientes,
+            proximo_vencimiento=proximo,
+            actualizado_en=timezone.now(),
+        ))
+    return saldos
+
+
+def guardar_saldos(saldos):
+    # Upsert en una sentencia (ON DUPLICATE KEY / ON CONFLICT)
+    upsert(SaldoContrato, saldos, "contrato", CAMPOS_SALDO)
+
+
+def actualizar_saldo(contrato_id):
+    guardar_saldos(calcular_saldos([contrato_id]))
+
+
+def sumar_pago(contrato_id, monto, crear=True):
+    """
+    Aplica 'monto' (negativo al eliminar) al saldo con un UPDATE atómico.
+    Si el contrato aún no tiene saldo y 'crear' es True, lo calcula completo.
+    """
+    actualizados = SaldoContrato.objects.filter(contrato_id=contrato_id).update(
+        total_pagado=F("total_pagado") + monto,
+        saldo=F("saldo") - monto,
+        actualizado_en=timezone.now(),
+    )
+    if not actualizados and crear:
+        actualizar_saldo(contrato_id)
+
+
+def refrescar_cuotas(contrato_id, crear=True):
+    # Recalcula solo los campos de cuotas (índice contrato/pagada), sin tocar los pagos
+    pendientes, proximo = _resumen_cuotas([contrato_id]).get(contrato_id, (0, None))
+    actualizados = SaldoContrato.objects.filter(contrato_id=contrato_id).update(
+        cuotas_pendientes=pendientes,
+        proximo_vencimiento=proximo,
+        actualizado_en=timezone.now(),
+    )
+    if not actualizados and crear:
+        actualizar_saldo(contrato_id)
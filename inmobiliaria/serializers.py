@@ -6,6 +6,7 @@ from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.db import models
 from datetime import timedelta
+from .aprobaciones import TRANSICIONES
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 class RegionSerializer(serializers.ModelSerializer):
     class Meta:
@@ -92,6 +93,7 @@ class VisitaSerializer(serializers.ModelSerializer):
 
     def validate(self, attrs):
         from .utils import slots_futuro
+        from .feriados import es_feriado
         
         fecha = attrs.get("fecha", getattr(self.instance, "fecha", None))
         hora = attrs.get("hora", getattr(self.instance, "hora", None))
@@ -104,7 +106,7 @@ class VisitaSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(f"La fecha debe estar entre hoy y {VENTANA_FUTURA_MAX_DIAS} días en el futuro.")
         if fecha.weekday() > 4:
             raise serializers.ValidationError("Las visitas solo se pueden agendar de lunes a viernes.")
-        if Feriado.objects.filter(fecha=fecha).exists():
+        if es_feriado(fecha):
             raise serializers.ValidationError("No se puede agendar en días feriados.")
         if hora not in INTERVALO_PERMITIDOS:
             raise serializers.ValidationError("La hora debe ser un slot válido: 09–13 o 16–18 (en punto).")
@@ -173,6 +175,37 @@ class PagarCuotaSerializer(serializers.Serializer):
     notas = serializers.CharField(required=False, allow_blank=True)
 
 
+class PagoCuotaLoteSerializer(PagarCuotaSerializer):
+    cuota = serializers.IntegerField(min_value=1)
+
+
+class PagarCuotasLoteSerializer(serializers.Serializer):
+    pagos = PagoCuotaLoteSerializer(many=True, allow_empty=False, max_length=MAX_PAGOS_LOTE)
+
+
+class GenerarCuotasSerializer(serializers.Serializer):
+    contratos = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_CONTRATOS_CRONOGRAMA,
+    )
+    cuotas = serializers.IntegerField(min_value=1, max_value=MAX_CUOTAS_CRONOGRAMA)
+    dia = serializers.IntegerField(min_value=1, max_value=31, required=False)
+    monto = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0, required=False)
+    redondeo = serializers.ChoiceField(choices=[1, 10, 100, 1000], default=1)
+    reemplazar = serializers.BooleanField(default=False)
+
+
+class TransicionPropiedadesSerializer(serializers.Serializer):
+    propiedades = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_PROPIEDADES_LOTE,
+    )
+    accion = serializers.ChoiceField(choices=list(TRANSICIONES))
+    observacion = serializers.CharField(required=False, allow_blank=True, default="")
+
+
 class PropiedadConFotosSerializer(serializers.ModelSerializer):
     fotos = serializers.SerializerMethodField()
 
@@ -181,6 +214,7 @@ class PropiedadConFotosSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
     def get_fotos(self, obj):
+        # Lee del caché de prefetch (ver utils.con_fotos); sin prefetch usa el orden del Meta
         return [
             {
                 "id": f.id,
@@ -188,7 +222,7 @@ class PropiedadConFotosSerializer(serializers.ModelSerializer):
                 "orden": f.orden,
                 "principal": f.principal,
             }
-            for f in obj.fotos.all().order_by("orden")
+            for f in obj.fotos.all()
         ]
 
 
@@ -268,6 +302,8 @@ class ContratoSerializer(serializers.ModelSerializer):
     tipo_display = serializers.CharField(source="get_tipo_display", read_only=True)
     total_pagos = serializers.SerializerMethodField()
     saldo = serializers.SerializerMethodField()
+    cuotas_pendientes = serializers.SerializerMethodField()
+    proximo_vencimiento = serializers.SerializerMethodField()
     archivo_pdf_url = serializers.SerializerMethodField()
 
     class Meta:
@@ -283,16 +319,40 @@ class ContratoSerializer(serializers.ModelSerializer):
             "archivo_pdf",
             "total_pagos",
             "saldo",
+            "cuotas_pendientes",
+            "proximo_vencimiento",
             'archivo_pdf_url'
         )
 
     def get_total_pagos(self, obj):
-        total = obj.pagos.aggregate(total=models.Sum("monto"))["total"]
+        # Los listados anotan total_pagos (ver utils.con_totales_pago); si no, se agrega aquí
+        total = getattr(obj, "total_pagos", None)
+        if total is None:
+            total = obj.pagos.aggregate(total=models.Sum("monto"))["total"]
         return total or 0
 
     def get_saldo(self, obj):
-        total = self.get_total_pagos(obj)
-        return (obj.precio_pactado or 0) - total
+        saldo = getattr(obj, "saldo", None)
+        if saldo is not None:
+            return saldo
+        return (obj.precio_pactado or 0) - self.get_total_pagos(obj)
+
+    def _saldo_actual(self, obj):
+        try:
+            return obj.saldo_actual
+        except SaldoContrato.DoesNotExist:
+            return None
+
+    def get_cuotas_pendientes(self, obj):
+        if hasattr(obj, "cuotas_pendientes"):
+            return obj.cuotas_pendientes
+        return getattr(self._saldo_actual(obj), "cuotas_pendientes", None)
+
+    def get_proximo_vencimiento(self, obj):
+        if hasattr(obj, "proximo_vencimiento"):
+            return obj.proximo_vencimiento
+        return getattr(self._saldo_actual(obj), "proximo_vencimiento", None)
+
     def get_archivo_pdf_url(self, obj):
         request = self.context.get('request')
         if obj.archivo_pdf:
@@ -394,6 +454,20 @@ class HistorialSerializer(serializers.ModelSerializer):
         model = Historial
         fields = ["id", "usuario", "fecha", "accion", "descripcion"]
 
+class CambioPrecioSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CambioPrecio
+        fields = ["fecha", "precio_anterior", "precio_nuevo"]
+
+
+class MedianaPrecioSerializer(serializers.Serializer):
+    mes = serializers.DateField()
+    ciudad = serializers.CharField()
+    tipo = serializers.CharField()
+    mediana = serializers.DecimalField(max_digits=14, decimal_places=2)
+    propiedades = serializers.IntegerField()
+
+
 class CambiarPasswordSerializer(serializers.Serializer):
     password_actual = serializers.CharField(required=True)
     password_nueva = serializers.CharField(required=True, min_length=8)
\ No newline at end of file
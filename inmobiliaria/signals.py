@@ -1,26 +1,29 @@
-from django.db.models.signals import post_save, pre_save
+from django.db import transaction
+from django.db import connections
+from django.db.models.signals import post_save, pre_save, post_delete, post_migrate
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
 from .models import (
-    Propiedad, Reserva, Contrato, Pago, Notificacion, Interesado
+    Propiedad, Reserva, Contrato, Pago, Notificacion, Propietario, Interesado, Feriado, CuotaContrato
 )
+from .aprobaciones import aviso_transicion
+from .busqueda_propiedades import asegurar_indice, indexar_propiedad, indexar_propiedades
+from .busqueda import reindexar_usuarios, usuarios_vinculados, CAMPOS_USUARIO, CAMPOS_PERFIL
+from .feriados import invalidar_feriados
+from .saldos import actualizar_saldo, calcular_saldos, guardar_saldos, sumar_pago, refrescar_cuotas
+from .notifications import notificar, despacho_notificaciones
 
 User = get_user_model()
 
 # --------- Helper ---------
-def _notificar(usuario, titulo, mensaje, tipo="SISTEMA"):
+def _notificar(usuario, titulo, mensaje, tipo="SISTEMA", evento=None):
     """
-    Crea una Notificacion si 'usuario' existe.
+    Encola una Notificacion si 'usuario' (instancia o id) existe; se escribe en
+    lote al confirmar la transacción (ver notifications.despacho_notificaciones).
     """
-    if usuario:
-        Notificacion.objects.create(
-            usuario=usuario,
-            titulo=titulo[:120],
-            mensaje=mensaje,
-            tipo=tipo,
-        )
+    notificar(usuario, titulo, mensaje, tipo=tipo, evento=evento)
 
 # --------- PROPIEDAD ---------
 @receiver(pre_save, sender=Propiedad)
@@ -28,17 +31,11 @@ def notificar_aprobacion_propiedad(sender, instance: Propiedad, **kwargs):
     """
     Si una propiedad pasa de no aprobada a aprobada => notificar al propietario_user.
     """
-    if not instance.pk:
-        return
-    try:
-        antes = Propiedad.objects.get(pk=instance.pk)
-    except Propiedad.DoesNotExist:
-        return
-
-    if not antes.aprobada and instance.aprobada:
-        titulo = "Tu propiedad fue aprobada"
-        mensaje = f"La propiedad '{instance.titulo}' en {instance.ciudad} ha sido aprobada y ahora es pública."
-        _notificar(getattr(instance, "propietario_user", None), titulo, mensaje, tipo="SISTEMA")
+    # Valores al cargar la instancia (Propiedad.valores_previos): sin releer la fila
+    antes = instance.valores_previos()
+    if "aprobada" in antes and not antes["aprobada"] and instance.aprobada:
+        titulo, mensaje = aviso_transicion("aprobada", instance.titulo, instance.ciudad, "")
+        _notificar(instance.propietario_user_id, titulo, mensaje, tipo="SISTEMA", evento=("propiedad_aprobada", instance.pk))
 
 @receiver(post_save, sender=Propiedad)
 def notificar_propiedad_creada(sender, instance: Propiedad, created, **kwargs):
@@ -47,22 +44,24 @@ def notificar_propiedad_creada(sender, instance: Propiedad, created, **kwargs):
     """
     if not created:
         return
-    # Aviso al propietario: recibida
-    if instance.propietario_user:
+    evento = ("propiedad_creada", instance.pk)
+    with despacho_notificaciones():
+        # Aviso al propietario: recibida
         _notificar(
-            instance.propietario_user,
+            instance.propietario_user_id,
             "Propiedad enviada a revisión",
             f"Tu propiedad '{instance.titulo}' fue recibida y está pendiente de aprobación.",
             tipo="SISTEMA",
+            evento=evento,
         )
 
-    admin = User.objects.filter(is_superuser=True).order_by("id").first()
-    if admin:
+        admin_id = User.objects.filter(is_superuser=True).order_by("id").values_list("id", flat=True).first()
         _notificar(
-            admin,
+            admin_id,
             "Nueva propiedad pendiente de aprobación",
             f"Se creó '{instance.titulo}' ({instance.ciudad}). Revisa y aprueba si corresponde.",
             tipo="SISTEMA",
+            evento=evento,
         )
 
 # --------- RESERVA ---------
@@ -76,16 +75,16 @@ def notificar_reserva_creada(sender, instance: Reserva, created, **kwargs):
 
     prop = instance.propiedad
     interesado = instance.interesado
-    propietario_user = getattr(prop, "propietario_user", None)
-    cliente_user = getattr(interesado, "usuario", None)
+    evento = ("reserva_creada", instance.pk)
 
     titulo_p = "Nueva reserva de tu propiedad"
     msg_p = f"La propiedad '{prop.titulo}' fue reservada por {interesado.nombre_completo}. Vence: {instance.expires_at}."
-    _notificar(propietario_user, titulo_p, msg_p, tipo="RESERVA")
-
     titulo_c = "Reserva creada"
     msg_c = f"Reservaste '{prop.titulo}'. Recuerda que vence el {instance.expires_at}."
-    _notificar(cliente_user, titulo_c, msg_c, tipo="RESERVA")
+
+    with despacho_notificaciones():
+        _notificar(prop.propietario_user_id, titulo_p, msg_p, tipo="RESERVA", evento=evento)
+        _notificar(interesado.usuario_id, titulo_c, msg_c, tipo="RESERVA", evento=evento)
 
 # --------- CONTRATO ---------
 @receiver(post_save, sender=Contrato)
@@ -97,23 +96,25 @@ def notificar_contrato_creado(sender, instance: Contrato, created, **kwargs):
         return
 
     prop = instance.propiedad
-    propietario_user = getattr(prop, "propietario_user", None)
-    cliente_user = getattr(instance.comprador_arrendatario, "usuario", None)
+    evento = ("contrato_creado", instance.pk)
 
     t = instance.get_tipo_display()
 
-    _notificar(
-        propietario_user,
-        f"Contrato de {t} creado",
-        f"Se creó un contrato de {t} para '{prop.titulo}' por ${instance.precio_pactado:.0f}.",
-        tipo="SISTEMA",
-    )
-    _notificar(
-        cliente_user,
-        f"Tu contrato de {t}",
-        f"Se registró tu contrato de {t} para '{prop.titulo}'.",
-        tipo="SISTEMA",
-    )
+    with despacho_notificaciones():
+        _notificar(
+            prop.propietario_user_id,
+            f"Contrato de {t} creado",
+            f"Se creó un contrato de {t} para '{prop.titulo}' por ${instance.precio_pactado:.0f}.",
+            tipo="SISTEMA",
+            evento=evento,
+        )
+        _notificar(
+            instance.comprador_arrendatario.usuario_id,
+            f"Tu contrato de {t}",
+            f"Se registró tu contrato de {t} para '{prop.titulo}'.",
+            tipo="SISTEMA",
+            evento=evento,
+        )
 
 # --------- PAGO ---------
 @receiver(post_save, sender=Pago)
@@ -126,12 +127,115 @@ def notificar_pago_creado(sender, instance: Pago, created, **kwargs):
 
     c = instance.contrato
     prop = c.propiedad
-    propietario_user = getattr(prop, "propietario_user", None)
-    cliente_user = getattr(c.comprador_arrendatario, "usuario", None)
+    evento = ("pago_creado", instance.pk)
 
     titulo = "Pago registrado"
     msg_c = f"Se registró un pago de ${instance.monto:.0f} para tu contrato de '{prop.titulo}'."
     msg_p = f"Se registró un pago de ${instance.monto:.0f} en el contrato de '{prop.titulo}'."
 
-    _notificar(cliente_user, titulo, msg_c, tipo="PAGO")
-    _notificar(propietario_user, titulo, msg_p, tipo="PAGO")
\ No newline at end of file
+    with despacho_notificaciones():
+        _notificar(c.comprador_arrendatario.usuario_id, titulo, msg_c, tipo="PAGO", evento=evento)
+        _notificar(prop.propietario_user_id, titulo, msg_p, tipo="PAGO", evento=evento)
+
+# --------- SALDO MATERIALIZADO ---------
+# Corren en la transacción del cambio. En los borrados no se crea el saldo:
+# puede ser parte del borrado en cascada del contrato.
+@receiver(post_save, sender=Contrato)
+def saldo_contrato_guardado(sender, instance: Contrato, **kwargs):
+    actualizar_saldo(instance.pk)
+
+@receiver(pre_save, sender=Pago)
+def recordar_contrato_pago(sender, instance: Pago, **kwargs):
+    instance._contrato_previo = instance.contrato_previo()
+
+@receiver(post_save, sender=Pago)
+def saldo_pago_guardado(sender, instance: Pago, created, **kwargs):
+    if created:
+        sumar_pago(instance.contrato_id, instance.monto)
+    else:
+        # Una edición puede cambiar el monto o el contrato: se recalculan completos
+        # el contrato actual y el anterior
+        ids = {instance.contrato_id, instance.__dict__.pop("_contrato_previo", None)} - {None}
+        guardar_saldos(calcular_saldos(list(ids)))
+    instance._contrato_cargado = instance.contrato_id
+
+@receiver(post_delete, sender=Pago)
+def saldo_pago_eliminado(sender, instance: Pago, **kwargs):
+    sumar_pago(instance.contrato_id, -instance.monto, crear=False)
+
+@receiver(post_save, sender=CuotaContrato)
+def saldo_cuota_guardada(sender, instance: CuotaContrato, **kwargs):
+    refrescar_cuotas(instance.contrato_id)
+
+@receiver(post_delete, sender=CuotaContrato)
+def saldo_cuota_eliminada(sender, instance: CuotaContrato, **kwargs):
+    refrescar_cuotas(instance.contrato_id, crear=False)
+
+# --------- FERIADO ---------
+@receiver(post_save, sender=Feriado)
+@receiver(post_delete, sender=Feriado)
+def invalidar_calendario_feriados(sender, instance: Feriado, **kwargs):
+    """
+    Descarta el calendario de feriados en memoria al confirmar el cambio.
+    """
+    transaction.on_commit(invalidar_feriados)
+
+
+# --------- BÚSQUEDA DE PERSONAS ---------
+# Mantiene TerminoBusquedaUsuario; los guardados que no tocan campos indexados
+# (p.ej. last_login) no reindexan.
+def _toca(campos_indexados, update_fields):
+    return update_fields is None or bool(campos_indexados & set(update_fields))
+
+@receiver(post_save, sender=User)
+def busqueda_usuario_guardado(sender, instance, update_fields=None, **kwargs):
+    if _toca(CAMPOS_USUARIO, update_fields):
+        reindexar_usuarios([instance.pk])
+
+@receiver(pre_save, sender=Propietario)
+@receiver(pre_save, sender=Interesado)
+def busqueda_perfil_previo(sender, instance, update_fields=None, **kwargs):
+    # Recuerda a quién estaba enlazado el perfil: si cambia el email o el usuario, el anterior también se reindexa
+    instance._vinculo_previo = None
+    if instance.pk and _toca(CAMPOS_PERFIL, update_fields):
+        instance._vinculo_previo = sender.objects.filter(pk=instance.pk).values_list("usuario_id", "email").first()
+
+@receiver(post_save, sender=Propietario)
+@receiver(post_save, sender=Interesado)
+def busqueda_perfil_guardado(sender, instance, update_fields=None, **kwargs):
+    if not _toca(CAMPOS_PERFIL, update_fields):
+        return
+    pares = [(instance.usuario_id, instance.email)]
+    if getattr(instance, "_vinculo_previo", None):
+        pares.append(instance._vinculo_previo)
+    reindexar_usuarios(usuarios_vinculados(pares))
+
+@receiver(post_delete, sender=Propietario)
+@receiver(post_delete, sender=Interesado)
+def busqueda_perfil_eliminado(sender, instance, **kwargs):
+    reindexar_usuarios(usuarios_vinculados([(instance.usuario_id, instance.email)]))
+
+
+# --------- BÚSQUEDA DEL CATÁLOGO ---------
+CAMPOS_TEXTO_PROPIEDAD = {"titulo", "descripcion", "ciudad", "tipo", "propietario_id"}
+CAMPOS_TEXTO_PROPIETARIO = {"primer_nombre", "primer_apellido", "rut"}
+
+@receiver(post_save, sender=Propiedad)
+def indexar_propiedad_guardada(sender, instance: Propiedad, created, update_fields=None, **kwargs):
+    # Solo si cambió algo del texto indexado (Propiedad.cambios no consulta la base)
+    if created or CAMPOS_TEXTO_PROPIEDAD & set(instance.cambios(update_fields)):
+        indexar_propiedad(instance)
+
+@receiver(post_save, sender=Propietario)
+def indexar_propiedades_de_propietario(sender, instance: Propietario, created, update_fields=None, **kwargs):
+    if created or not _toca(CAMPOS_TEXTO_PROPIETARIO, update_fields):
+        return
+    ids = list(instance.propiedades.values_list("id", flat=True))
+    for i in range(0, len(ids), 1000):
+        indexar_propiedades(ids[i:i + 1000])
+
+@receiver(post_migrate)
+def crear_indice_texto(sender, using="default", **kwargs):
+    # Las bases de test se crean sin migraciones: el índice FTS/FULLTEXT se asegura aquí
+    if sender.name == "inmobiliaria":
+        asegurar_indice(connections[using])
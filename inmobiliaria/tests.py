@@ -1,3 +1,1317 @@
+import csv
+import json
+import os
+import tempfile
+import threading
+from io import StringIO
+from datetime import date, time, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.db.models import F
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .cache import cache_catalogo
+from .kpis import cache_kpis, acumular_kpis
+from .feriados import invalidar_feriados
+from .config import OUTBOX_MAX_INTENTOS
+from .cuotas import calcular_vencimientos, generar_cronogramas
+from .notifications import despacho_notificaciones, notificar_usuario
+from .outbox import drenar, metricas
+from .models import (
+    Region, Comuna, Direccion_propietario, Propietario, Propiedad, PropiedadFoto, Interesado, Visita, Feriado,
+    Reserva, Contrato, Pago, CuotaContrato, SaldoContrato, KpiDiario, Historial, Notificacion, NotificacionOutbox, Usuario,
+    CambioPrecio, HistorialArchivado, IndiceBusquedaPropiedad,
+)
+from .serializers import ContratoSerializer
+from .utils import (
+    con_totales_pago,
+    es_habil,
+    slots_disponibles_para_propiedad,
+    generar_agenda_disponible,
+    generar_agendas_disponibles,
+)
+
+
+def crear_propietario(n=1):
+    return Propietario.objects.create(
+        primer_nombre="Ana",
+        segundo_nombre="María",
+        primer_apellido="Pérez",
+        segundo_apellido="Soto",
+        rut=f"1000000{n}-{n}",
+        telefono=f"+5691234567{n}",
+        email=f"ana{n}@example.com",
+    )
+
+
+def crear_propiedades(propietario, cantidad, fotos=2, **extra):
+    props = []
+    for i in range(cantidad):
+        p = Propiedad.objects.create(
+            propietario=propietario,
+            titulo=f"Casa {i}",
+            direccion=f"Calle {i}",
+            ciudad="Talca",
+            precio=100000 + i,
+            estado_aprobacion="aprobada",
+            **extra,
+        )
+        for orden in reversed(range(fotos)):
+            PropiedadFoto.objects.create(
+                propiedad=p,
+                foto=f"propiedades/fotos/{p.pk}_{orden}.jpg",
+                orden=orden,
+                principal=(orden == 0),
+            )
+        props.append(p)
+    return props
+
+
+def crear_interesado(n=1):
+    return Interesado.objects.create(
+        primer_nombre="Luis",
+        segundo_nombre="",
+        primer_apellido="Rojas",
+        segundo_apellido="",
+        rut=f"2000000{n}-{n}",
+        telefono=f"+5699876543{n}",
+        email=f"luis{n}@example.com",
+    )
+
+
+def sin_conflicto_con_columna():
+    # Como MySQL: ON DUPLICATE KEY UPDATE, sin ON CONFLICT (columna)
+    return mock.patch.object(
+        type(connection.features), "supports_update_conflicts_with_target", False
+    )
+
+
+class CatalogoFotosTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.propietario = crear_propietario()
+
+    def _queries_catalogo(self):
+        cache_catalogo().clear()
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get("/api/catalogo/propiedades/")
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx), resp.json()
+
+    def test_consultas_constantes_con_fotos(self):
+        crear_propiedades(self.propietario, 2)
+        pocas, _ = self._queries_catalogo()
+
+        crear_propiedades(self.propietario, 10)
+        muchas, data = self._queries_catalogo()
+
+        self.assertEqual(pocas, muchas)
+        self.assertEqual(len(data["results"]), 12)
+
+    def test_fotos_ordenadas_y_principal_sin_consultas(self):
+        prop = crear_propiedades(self.propietario, 1, fotos=3)[0]
+        _, data = self._queries_catalogo()
+        ordenes = [f["orden"] for f in data["results"][0]["fotos"]]
+        self.assertEqual(ordenes, [0, 1, 2])
+
+        from .utils import con_fotos
+        prop = con_fotos(Propiedad.objects.filter(pk=prop.pk)).get()
+        with self.assertNumQueries(0):
+            self.assertTrue(prop.foto_principal.endswith(f"{prop.pk}_0.jpg"))
+
+
+class CatalogoCacheTests(TestCase):
+    url = "/api/catalogo/propiedades/"
+
+    def setUp(self):
+        cache_catalogo().clear()
+        self.client = APIClient()
+        self.propietario = crear_propietario()
+        crear_propiedades(self.propietario, 3)
+
+    def test_query_normalizada_reutiliza_respuesta(self):
+        primera = self.client.get(self.url + "?tipo=casa&ordering=precio&search=")
+        with self.assertNumQueries(0):
+            segunda = self.client.get(self.url + "?ordering=precio&tipo=casa")
+        self.assertEqual(primera.json(), segunda.json())
+        self.assertEqual(primera["ETag"], segunda["ETag"])
+
+    def test_etag_responde_304(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.assertNumQueries(0):
+            resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+
+    def test_guardar_propiedad_invalida(self):
+        antes = self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            prop = Propiedad.objects.first()
+            prop.titulo = "Nuevo título"
+            prop.save()
+        despues = self.client.get(self.url, HTTP_IF_NONE_MATCH=antes["ETag"])
+        self.assertEqual(despues.status_code, 200)
+        self.assertNotEqual(antes["ETag"], despues["ETag"])
+        self.assertIn("Nuevo título", [p["titulo"] for p in despues.json()["results"]])
+
+
+class PaginacionCursorTests(TestCase):
+    url = "/api/propiedades/"
+
+    def setUp(self):
+        self.client = APIClient()
+        self.propietario = crear_propietario()
+        crear_propiedades(self.propietario, 7, fotos=0)
+        # Empates en la columna de orden: el desempate por id debe ser estable
+        Propiedad.objects.update(fecha_registro=Propiedad.objects.first().fecha_registro)
+
+    def test_recorre_todas_las_paginas_sin_offset_ni_count(self):
+        vistos = []
+        url = self.url + "?paginacion=cursor&page_size=3"
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                resp = self.client.get(url)
+            self.assertEqual(resp.status_code, 200)
+            sql = " ".join(q["sql"].upper() for q in ctx.captured_queries)
+            self.assertNotIn("OFFSET", sql)
+            self.assertNotIn("COUNT(", sql)
+            vistos += [p["id"] for p in resp.json()["results"]]
+            url = resp.json()["next"]
+
+        esperados = list(Propiedad.objects.order_by("-id").values_list("id", flat=True))
+        self.assertEqual(vistos, esperados)
+
+    def test_link_anterior_devuelve_pagina_previa(self):
+        primera = self.client.get(self.url + "?paginacion=cursor&page_size=3").json()
+        segunda = self.client.get(primera["next"]).json()
+        previa = self.client.get(segunda["previous"]).json()
+        self.assertEqual(
+            [p["id"] for p in previa["results"]],
+            [p["id"] for p in primera["results"]],
+        )
+
+    def test_sin_opt_in_mantiene_page_number(self):
+        data = self.client.get(self.url).json()
+        self.assertEqual(data["count"], 7)
+
+
+class AgendaDisponibleTests(TestCase):
+    def setUp(self):
+        invalidar_feriados()
+        self.props = crear_propiedades(crear_propietario(), 3, fotos=0)
+        interesado = crear_interesado()
+        hoy = timezone.localdate()
+        # Un feriado hábil y visitas repartidas en la ventana
+        dia = hoy + timedelta(days=1)
+        while dia.weekday() > 4:
+            dia += timedelta(days=1)
+        Feriado.objects.create(fecha=dia, nombre="Feriado de prueba")
+        for i in range(2, 12):
+            fecha = hoy + timedelta(days=i)
+            Visita.objects.create(propiedad=self.props[i % 3], interesado=interesado, fecha=fecha, hora=time(9))
+            Visita.objects.create(propiedad=self.props[0], interesado=interesado, fecha=fecha, hora=time(17))
+
+    def _agenda_por_dia(self, propiedad_id, days):
+        # Implementación de referencia: una consulta por día
+        hoy = timezone.localdate()
+        salida = []
+        fecha = hoy
+        while fecha <= hoy + timedelta(days=30) and len(salida) < days:
+            if es_habil(fecha):
+                libres = slots_disponibles_para_propiedad(propiedad_id, fecha)
+                if libres:
+                    salida.append({
+                        "fecha": fecha.isoformat(),
+                        "weekday": fecha.weekday(),
+                        "is_holiday": False,
+                        "slots": [t.strftime("%H:%M") for t in libres],
+                    })
+            fecha += timedelta(days=1)
+        return salida
+
+    def test_misma_salida_con_una_consulta_de_visitas(self):
+        # Con el calendario de feriados ya cargado solo queda la consulta de Visita
+        for prop in self.props:
+            esperado = self._agenda_por_dia(prop.pk, 31)
+            with self.assertNumQueries(1):
+                obtenido = generar_agenda_disponible(prop.pk, days=31)
+            self.assertEqual(obtenido, esperado)
+
+    def test_lote_en_dos_consultas(self):
+        ids = [p.pk for p in self.props]
+        hoy = timezone.localdate()
+        with self.assertNumQueries(1 + len({hoy.year, (hoy + timedelta(days=30)).year})):
+            agendas = generar_agendas_disponibles(ids, days=14)
+        for pk in ids:
+            self.assertEqual(agendas[pk], self._agenda_por_dia(pk, 14))
+
+
+class DisponibilidadMultiPropiedadTests(TestCase):
+    def setUp(self):
+        invalidar_feriados()
+        self.client = APIClient()
+        self.props = crear_propiedades(crear_propietario(), 4, fotos=0)
+        interesado = crear_interesado()
+        self.fecha = timezone.localdate() + timedelta(days=3)
+        while self.fecha.weekday() > 4:
+            self.fecha += timedelta(days=1)
+        # La primera propiedad queda sin slots libres ese día
+        for hora in (time(9), time(10), time(11), time(12), time(13), time(16), time(17), time(18)):
+            Visita.objects.create(propiedad=self.props[0], interesado=interesado, fecha=self.fecha, hora=hora)
+        Visita.objects.create(propiedad=self.props[1], interesado=interesado, fecha=self.fecha, hora=time(9))
+
+    def test_stream_excluye_propiedades_sin_slots(self):
+        with self.assertNumQueries(3):
+            resp = self.client.get(
+                "/api/visitas/disponibilidad/",
+                {"ciudad": "talca", "fechas": self.fecha.isoformat()},
+            )
+            data = json.loads(b"".join(resp.streaming_content))
+        self.assertEqual([d["propiedad"] for d in data], [p.pk for p in self.props[1:]])
+        self.assertNotIn("09:00", data[0]["fechas"][0]["slots"])
+        self.assertEqual(len(data[1]["fechas"][0]["slots"]), 8)
+
+
+class CalendarioFeriadosTests(TestCase):
+    def setUp(self):
+        invalidar_feriados()
+
+    def test_una_consulta_por_anio(self):
+        hoy = timezone.localdate()
+        with self.assertNumQueries(1):
+            for i in range(60):
+                es_habil(hoy.replace(month=1, day=1) + timedelta(days=i))
+
+    def test_signals_invalidan_calendario(self):
+        fecha = timezone.localdate().replace(month=3, day=2)
+        while fecha.weekday() > 4:
+            fecha += timedelta(days=1)
+        self.assertTrue(es_habil(fecha))
+        with self.captureOnCommitCallbacks(execute=True):
+            feriado = Feriado.objects.create(fecha=fecha, nombre="Prueba")
+        self.assertFalse(es_habil(fecha))
+        with self.captureOnCommitCallbacks(execute=True):
+            feriado.delete()
+        self.assertTrue(es_habil(fecha))
+
+    def test_hilo_en_espera_no_recarga(self):
+        from . import feriados
+        anio = timezone.localdate().year
+        cargado = frozenset({date(anio, 9, 18)})
+        resultado = []
+        hilo = threading.Thread(target=lambda: resultado.append(feriados.feriados_del_anio(anio)))
+        with feriados._lock:
+            hilo.start()
+            hilo.join(0.2)
+            # Otro hilo lo cargó mientras este esperaba el lock
+            feriados._por_anio[anio] = (cargado, feriados.time.monotonic())
+        hilo.join()
+        self.assertEqual(resultado, [cargado])
+
+    def test_cargar_feriados_sin_columna_de_conflicto(self):
+        # MySQL no admite ON CONFLICT (columna): el upsert no debe depender de ello
+        anio = timezone.localdate().year
+        with tempfile.TemporaryDirectory() as tmp:
+            ruta = os.path.join(tmp, "feriados.csv")
+            for nombre in ("Año Nuevo", "Año nuevo"):
+                with open(ruta, "w", newline="", encoding="utf-8") as f:
+                    csv.writer(f).writerows([("fecha", "nombre"), (f"{anio}-01-01", nombre)])
+                with sin_conflicto_con_columna():
+                    call_command("cargar_feriados", str(anio), ruta, stdout=StringIO())
+        self.assertEqual(
+            list(Feriado.objects.values_list("nombre", flat=True)), ["Año nuevo"]
+        )
+
+
+class LiberarReservasVencidasTests(TestCase):
+    def setUp(self):
+        self.dueno = Usuario.objects.create_user("dueno", "dueno@example.com", "x", rol="PROPIETARIO")
+        self.cliente = Usuario.objects.create_user("cli", "cli@example.com", "x", rol="CLIENTE")
+        interesado = crear_interesado()
+        interesado.usuario = self.cliente
+        interesado.save()
+        self.props = crear_propiedades(crear_propietario(), 6, fotos=0, propietario_user=self.dueno)
+        for p in self.props:
+            Reserva.objects.create(
+                propiedad=p, interesado=interesado,
+                expires_at=timezone.now() + timedelta(hours=1),
+            )
+        Reserva.objects.update(expires_at=timezone.now() - timedelta(minutes=5))
+        # Con contrato vigente la propiedad no se libera
+        Contrato.objects.create(
+            propiedad=self.props[0], comprador_arrendatario=interesado, tipo="arriendo",
+            fecha_firma=timezone.localdate(), precio_pactado=1000,
+        )
+        NotificacionOutbox.objects.all().delete()
+
+    def test_libera_en_lote(self):
+        call_command("liberar_reservas_vencidas", chunk=4, stdout=StringIO())
+        call_command("procesar_outbox", una_vez=True, hilos=1, stdout=StringIO())
+
+        self.assertFalse(Reserva.objects.filter(activa=True).exists())
+        estados = dict(Propiedad.objects.values_list("id", "estado"))
+        self.assertEqual(estados[self.props[0].pk], "reservada")
+        self.assertTrue(all(estados[p.pk] == "disponible" for p in self.props[1:]))
+        self.assertEqual(
+            Historial.objects.filter(descripcion="Cambio de estado: reservada → disponible").count(), 5
+        )
+        self.assertEqual(Notificacion.objects.filter(usuario=self.dueno).count(), 6)
+        self.assertEqual(Notificacion.objects.filter(usuario=self.cliente).count(), 6)
+
+    def test_consultas_no_dependen_del_tamano(self):
+        from .management.commands.liberar_reservas_vencidas import liberar_lote
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(liberar_lote(timezone.now(), limite=100), 6)
+        self.assertLessEqual(len(ctx), 10)
+
+    def test_proximos_vencimientos(self):
+        from .management.commands.liberar_reservas_vencidas import proximos_vencimientos
+        ahora = timezone.now()
+        reservas = list(Reserva.objects.order_by("id"))
+        for i, r in enumerate(reservas):
+            r.expires_at = ahora + timedelta(minutes=10 - i)
+        Reserva.objects.bulk_update(reservas, ["expires_at"])
+        Reserva.objects.filter(pk=reservas[-1].pk).update(activa=False)
+
+        heap = proximos_vencimientos(ahora + timedelta(minutes=8), limite=3)
+        self.assertEqual(heap[0], (reservas[4].expires_at, reservas[4].pk))
+        self.assertEqual(sorted(heap), [(r.expires_at, r.pk) for r in reversed(reservas[2:5])])
+
+    def test_residente_sobrevive_a_errores_de_base(self):
+        from django.db import OperationalError
+        from .management.commands import liberar_reservas_vencidas as modulo
+
+        class DetenerTras(threading.Event):
+            # Se detiene al llegar a la n-ésima espera
+            def __init__(self, n):
+                super().__init__()
+                self.n = n
+
+            def wait(self, timeout=None):
+                self.n -= 1
+                if self.n <= 0:
+                    self.set()
+                return self.is_set()
+
+        salida, errores = StringIO(), StringIO()
+        real = modulo.proximos_vencimientos
+        with mock.patch.object(modulo, "proximos_vencimientos", side_effect=[OperationalError("caída"), real(timezone.now())]), \
+                mock.patch.object(modulo, "close_old_connections") as cerrar, \
+                mock.patch.object(modulo.signal, "signal"):
+            # error + espera, recarga y libera, heap vacío + espera
+            modulo.Command(stdout=salida, stderr=errores)._residente(chunk=4, refresco=60, detener=DetenerTras(2))
+
+        self.assertIn("caída", errores.getvalue())
+        self.assertIn("6 reservas liberadas", salida.getvalue())
+        self.assertFalse(Reserva.objects.filter(activa=True).exists())
+        self.assertGreaterEqual(cerrar.call_count, 3)
+
+
+class ContratoTotalesPagoTests(TestCase):
+    def setUp(self):
+        self.admin = Usuario.objects.create_user("adm", "adm@example.com", "x", rol="ADMIN")
+        interesado = crear_interesado()
+        props = crear_propiedades(crear_propietario(), 100, fotos=0)
+        hoy = timezone.localdate()
+        contratos = Contrato.objects.bulk_create([
+            Contrato(propiedad=p, comprador_arrendatario=interesado, tipo="arriendo",
+                     fecha_firma=hoy, precio_pactado=1000)
+            for p in props
+        ])
+        # i pagos de 100 para el contrato i (0..4)
+        Pago.objects.bulk_create([
+            Pago(contrato=c, fecha=hoy, monto=100)
+            for i, c in enumerate(contratos) for _ in range(i % 5)
+        ])
+
+    def test_pagina_de_100_en_una_consulta(self):
+        qs = con_totales_pago(Contrato.objects.select_related("comprador_arrendatario", "propiedad")).order_by("id")
+        with CaptureQueriesContext(connection) as ctx:
+            data = ContratoSerializer(qs, many=True).data
+        self.assertEqual(len(ctx), 1)
+        self.assertEqual(len(data), 100)
+        for i, fila in enumerate(data):
+            self.assertEqual(fila["total_pagos"], 100 * (i % 5))
+            self.assertEqual(fila["saldo"], 1000 - 100 * (i % 5))
+
+    def test_api_no_agrega_por_contrato(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        with CaptureQueriesContext(connection) as ctx:
+            resp = client.get("/api/contratos/")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.json()["results"]), 20)
+        # COUNT de la paginación + la consulta anotada
+        self.assertEqual(len(ctx), 2)
+
+
+class SaldoContratoTests(TestCase):
+    def setUp(self):
+        prop = crear_propiedades(crear_propietario(), 1, fotos=0)[0]
+        self.contrato = Contrato.objects.create(
+            propiedad=prop, comprador_arrendatario=crear_interesado(), tipo="arriendo",
+            fecha_firma=timezone.localdate(), precio_pactado=3000,
+        )
+        hoy = timezone.localdate()
+        self.cuotas = [
+            CuotaContrato.objects.create(contrato=self.contrato, vencimiento=hoy + timedelta(days=30 * i), monto=1000)
+            for i in range(1, 4)
+        ]
+
+    def saldo(self):
+        s = SaldoContrato.objects.get(contrato=self.contrato)
+        return s.total_pagado, s.saldo, s.cuotas_pendientes, s.proximo_vencimiento
+
+    def test_se_mantiene_con_pagos_y_cuotas(self):
+        self.assertEqual(self.saldo(), (0, 3000, 3, self.cuotas[0].vencimiento))
+
+        self.cuotas[0].registrar_pago(monto=self.cuotas[0].monto)
+        self.assertEqual(self.saldo(), (1000, 2000, 2, self.cuotas[1].vencimiento))
+
+        extra = Pago.objects.create(contrato=self.contrato, fecha=timezone.localdate(), monto=250)
+        self.assertEqual(self.saldo()[:2], (1250, 1750))
+        extra.delete()
+        self.assertEqual(self.saldo()[:2], (1000, 2000))
+
+    def test_recalcular_verifica_y_corrige(self):
+        SaldoContrato.objects.update(saldo=1, cuotas_pendientes=9)
+        with self.assertRaises(CommandError):
+            call_command("recalcular_saldos", solo_verificar=True, stdout=StringIO())
+
+        call_command("recalcular_saldos", chunk=1, stdout=StringIO())
+        self.assertEqual(self.saldo(), (0, 3000, 3, self.cuotas[0].vencimiento))
+        call_command("recalcular_saldos", solo_verificar=True, stdout=StringIO())
+
+    def test_pago_movido_a_otro_contrato(self):
+        otro = Contrato.objects.create(
+            propiedad=self.contrato.propiedad, comprador_arrendatario=self.contrato.comprador_arrendatario,
+            tipo="arriendo", fecha_firma=timezone.localdate(), precio_pactado=500,
+        )
+        pago = Pago.objects.create(contrato=self.contrato, fecha=timezone.localdate(), monto=200)
+        self.assertEqual(self.saldo()[:2], (200, 2800))
+
+        pago = Pago.objects.get(pk=pago.pk)
+        pago.contrato = otro
+        pago.save()
+        self.assertEqual(self.saldo()[:2], (0, 3000))
+        s = SaldoContrato.objects.get(contrato=otro)
+        self.assertEqual((s.total_pagado, s.saldo), (200, 300))
+
+    def test_sin_columna_de_conflicto(self):
+        # En MySQL crear un contrato y pagar no deben depender de ON CONFLICT (columna)
+        with sin_conflicto_con_columna():
+            contrato = Contrato.objects.create(
+                propiedad=self.contrato.propiedad, comprador_arrendatario=self.contrato.comprador_arrendatario,
+                tipo="arriendo", fecha_firma=timezone.localdate(), precio_pactado=500,
+            )
+            SaldoContrato.objects.filter(contrato=contrato).delete()
+            Pago.objects.create(contrato=contrato, fecha=timezone.localdate(), monto=200)
+            call_command("recalcular_saldos", stdout=StringIO())
+        s = SaldoContrato.objects.get(contrato=contrato)
+        self.assertEqual((s.total_pagado, s.saldo), (200, 300))
+        self.assertEqual(self.saldo(), (0, 3000, 3, self.cuotas[0].vencimiento))
+
+
+class GenerarCuotasTests(TestCase):
+    def setUp(self):
+        invalidar_feriados()
+        self.admin = Usuario.objects.create_user("adm", "adm@example.com", "x", rol="ADMIN")
+        interesado = crear_interesado()
+        props = crear_propiedades(crear_propietario(), 30, fotos=0)
+        self.contratos = Contrato.objects.bulk_create([
+            Contrato(propiedad=p, comprador_arrendatario=interesado, tipo="arriendo",
+                     fecha_firma=date(2030, 1, 15), precio_pactado=Decimal("450123.40"))
+            for p in props
+        ])
+        self.ids = [c.id for c in self.contratos]
+        Feriado.objects.create(fecha=date(2030, 3, 5), nombre="Feriado de prueba")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_vencimientos_saltan_feriados_y_fin_de_mes(self):
+        fechas = [v for _, v in calcular_vencimientos(date(2030, 1, 31), 3, feriados={date(2030, 3, 31)})]
+        self.assertEqual(fechas, [date(2030, 2, 28), date(2030, 4, 1), date(2030, 4, 30)])
+
+    def test_genera_en_lote_con_consultas_fijas(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.post(
+                "/api/cuotas/generar/",
+                {"contratos": self.ids, "cuotas": 12, "dia": 5, "redondeo": 1000},
+                format="json",
+            )
+        self.assertEqual(resp.status_code, 201, resp.content)
+        self.assertEqual(resp.json(), {"contratos": 30, "cuotas_creadas": 360})
+        self.assertLessEqual(len(ctx), 12)
+
+        cuotas = CuotaContrato.objects.filter(contrato=self.contratos[0]).order_by("vencimiento")
+        self.assertEqual(cuotas[0].vencimiento, date(2030, 2, 5))
+        self.assertEqual(cuotas[1].vencimiento, date(2030, 3, 6))
+        self.assertTrue(all(c.monto == Decimal("450000.00") for c in cuotas))
+        self.assertEqual(SaldoContrato.objects.get(contrato=self.contratos[0]).cuotas_pendientes, 12)
+
+    def test_regenerar_conserva_cuotas_pagadas(self):
+        generar_cronogramas(self.ids[:1], 3, dia=5)
+        primera = CuotaContrato.objects.filter(contrato_id=self.ids[0]).order_by("vencimiento").first()
+        primera.registrar_pago(monto=primera.monto)
+
+        with sin_conflicto_con_columna():
+            generar_cronogramas(self.ids[:1], 3, dia=5, monto=500000, reemplazar=True)
+        montos = list(
+            CuotaContrato.objects.filter(contrato_id=self.ids[0]).order_by("vencimiento").values_list("monto", "pagada")
+        )
+        self.assertEqual(montos, [(Decimal("450123.00"), True), (Decimal("500000.00"), False), (Decimal("500000.00"), False)])
+        self.assertEqual(SaldoContrato.objects.get(contrato_id=self.ids[0]).cuotas_pendientes, 2)
+
+    def test_reemplazar_con_consultas_fijas(self):
+        generar_cronogramas(self.ids, 12, dia=5)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(generar_cronogramas(self.ids, 12, dia=10, reemplazar=True), (30, 360))
+        # Igual que al generar: no depende de la cantidad de contratos ni de cuotas
+        self.assertLessEqual(len(ctx), 12)
+        self.assertEqual(CuotaContrato.objects.count(), 360)
+        self.assertEqual(SaldoContrato.objects.get(contrato_id=self.ids[-1]).cuotas_pendientes, 12)
+
+    def test_solo_admin(self):
+        cliente = APIClient()
+        cliente.force_authenticate(Usuario.objects.create_user("c", "c@example.com", "x", rol="CLIENTE"))
+        resp = cliente.post("/api/cuotas/generar/", {"contratos": self.ids, "cuotas": 1}, format="json")
+        self.assertEqual(resp.status_code, 403)
+
+
+class PagarCuotasLoteTests(TestCase):
+    url = "/api/cuotas/pagar-lote/"
+
+    def setUp(self):
+        self.admin = Usuario.objects.create_user("adm", "adm@example.com", "x", rol="ADMIN")
+        interesado = crear_interesado()
+        interesado.usuario = Usuario.objects.create_user("cli", "cli@example.com", "x", rol="CLIENTE")
+        interesado.save()
+        props = crear_propiedades(crear_propietario(), 20, fotos=0)
+        contratos = Contrato.objects.bulk_create([
+            Contrato(propiedad=p, comprador_arrendatario=interesado, tipo="arriendo",
+                     fecha_firma=date(2030, 1, 15), precio_pactado=1000)
+            for p in props
+        ])
+        generar_cronogramas([c.id for c in contratos], 3, dia=5)
+        self.cuotas = list(CuotaContrato.objects.order_by("contrato_id", "vencimiento"))
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def pagar(self, pagos):
+        resp = self.client.post(self.url, {"pagos": pagos}, format="json")
+        self.assertEqual(resp.status_code, 200, resp.content)
+        return resp.json()
+
+    def test_paga_en_lote_con_consultas_fijas(self):
+        pagos = [{"cuota": c.id, "monto": "1000.00"} for c in self.cuotas]
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.pagar(pagos)
+        self.assertEqual(data["resumen"], {"pagada": 60})
+        self.assertLessEqual(len(ctx), 15)
+
+        pago_por_cuota = dict(CuotaContrato.objects.values_list("id", "pago_id"))
+        for r in data["resultados"]:
+            self.assertEqual(pago_por_cuota[r["cuota"]], r["pago_id"])
+        self.assertEqual(Pago.objects.count(), 60)
+        self.assertEqual(set(SaldoContrato.objects.values_list("saldo", "cuotas_pendientes")), {(-2000, 0)})
+        self.assertEqual(NotificacionOutbox.objects.filter(evento__startswith="pago_creado:").count(), 60)
+
+    def test_resultados_por_linea(self):
+        self.cuotas[0].registrar_pago(monto=self.cuotas[0].monto)
+        data = self.pagar([
+            {"cuota": self.cuotas[0].id, "monto": "1000"},
+            {"cuota": self.cuotas[1].id, "monto": "999"},
+            {"cuota": self.cuotas[2].id, "monto": "1000"},
+            {"cuota": self.cuotas[2].id, "monto": "1000"},
+            {"cuota": 999999, "monto": "1000"},
+        ])
+        self.assertEqual(
+            [r["estado"] for r in data["resultados"]],
+            ["ya_pagada", "monto_distinto", "pagada", "duplicada", "no_existe"],
+        )
+        self.assertEqual(Pago.objects.count(), 2)
+
+    def test_sin_ids_devueltos_por_el_insert(self):
+        # Como en MySQL: bulk_create no asigna pk y los ids se leen por lote
+        cuotas = self.cuotas[:3]
+        with mock.patch.object(
+            type(connection.features), "can_return_rows_from_bulk_insert",
+            new_callable=mock.PropertyMock, return_value=False,
+        ), sin_conflicto_con_columna():
+            data = self.pagar([{"cuota": c.id, "monto": "1000"} for c in cuotas])
+        ids = [r["pago_id"] for r in data["resultados"]]
+        self.assertEqual(len(set(ids)), 3)
+        self.assertEqual(
+            list(CuotaContrato.objects.filter(id__in=[c.id for c in cuotas]).order_by("id").values_list("pago_id", flat=True)),
+            ids,
+        )
+
+    def test_registrar_pago_relee_la_cuota_bloqueada(self):
+        # Otra transacción la pagó después de que esta instancia se cargó
+        cuota = self.cuotas[0]
+        CuotaContrato.objects.get(pk=cuota.pk).registrar_pago(monto=cuota.monto)
+        with self.assertRaises(ValidationError):
+            cuota.registrar_pago(monto=cuota.monto)
+        self.assertEqual(Pago.objects.count(), 1)
+
+
+class ConciliacionCartolaTests(TestCase):
+    def setUp(self):
+        self.rut = crear_interesado().rut
+        otro = Interesado.objects.create(
+            primer_nombre="Eva", segundo_nombre="", primer_apellido="Díaz", segundo_apellido="",
+            rut="11111111-1", telefono="+56911111111", email="eva@example.com",
+        )
+        props = crear_propiedades(crear_propietario(), 2, fotos=0)
+        for prop, interesado in zip(props, [Interesado.objects.get(rut=self.rut), otro]):
+            c = Contrato.objects.create(
+                propiedad=prop, comprador_arrendatario=interesado, tipo="arriendo",
+                fecha_firma=date(2030, 1, 15), precio_pactado=350000,
+            )
+            generar_cronogramas([c.id], 3, dia=5)
+        self.cuotas = CuotaContrato.objects.filter(contrato__comprador_arrendatario__rut=self.rut).order_by("vencimiento")
+
+    def cartola(self, texto):
+        f = tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, encoding="utf-8")
+        f.write(texto)
+        f.close()
+        self.addCleanup(os.remove, f.name)
+        return f.name
+
+    def test_concilia_y_reporta_no_conciliadas(self):
+        rut_con_puntos = "{}.{}.{}".format(self.rut[:-8], self.rut[-8:-5], self.rut[-5:])
+        archivo = self.cartola(
+            "Fecha,Monto,RUT,Descripcion\n"
+            f"06/02/2030,\"350.000\",{rut_con_puntos},Transf arriendo feb\n"
+            f"2030-03-04,350000,{self.rut},Transf arriendo mar\n"
+            f"2030-03-04,350000,{self.rut},Repetida\n"
+            f"2030-06-20,350000,{self.rut},Muy tarde\n"
+            "2030-02-05,100,99999999-9,Desconocido\n"
+            "ayer,100,11111111-1,Mala fecha\n"
+        )
+        salida = StringIO()
+        call_command("conciliar_cartola", archivo, lote=1, stdout=salida, stderr=StringIO())
+
+        pagadas = list(self.cuotas.values_list("pagada", flat=True))
+        self.assertEqual(pagadas, [True, True, False])
+        self.assertEqual(Pago.objects.filter(notas__startswith="Cartola línea").count(), 2)
+        self.assertFalse(CuotaContrato.objects.exclude(contrato__comprador_arrendatario__rut=self.rut).filter(pagada=True).exists())
+
+        reporte = list(csv.reader(StringIO(salida.getvalue())))
+        self.assertEqual(reporte[0], ["linea", "fecha", "monto", "rut", "descripcion", "motivo"])
+        motivos = {int(f[0]): f[5] for f in reporte[1:]}
+        self.assertEqual(motivos[4], "fuera_de_ventana")
+        self.assertEqual(motivos[5], "fuera_de_ventana")
+        self.assertEqual(motivos[6], "sin_cuota")
+        self.assertTrue(motivos[7].startswith("formato"))
+
+    def test_simular_no_registra(self):
+        archivo = self.cartola(f"fecha,monto,rut\n2030-02-05,350000,{self.rut}\n")
+        call_command("conciliar_cartola", archivo, simular=True, stdout=StringIO(), stderr=StringIO())
+        self.assertFalse(Pago.objects.exists())
+
+    def test_carga_desde_admin(self):
+        admin = Usuario.objects.create_superuser("root", "root@example.com", "x")
+        self.client.force_login(admin)
+        archivo = SimpleUploadedFile("cartola.csv", f"fecha,monto,rut\n2030-02-05,350000,{self.rut}\n".encode())
+        resp = self.client.post("/admin/inmobiliaria/pago/conciliar/", {"archivo": archivo, "ventana": 5})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context["resumen"]["conciliadas"], 1)
+        self.assertTrue(self.cuotas.first().pagada)
+
+
+class MorosidadTests(TestCase):
+    url = "/api/cuotas/morosidad/"
+
+    def setUp(self):
+        self.admin = Usuario.objects.create_user("adm", "adm@example.com", "x", rol="ADMIN")
+        self.dueno = Usuario.objects.create_user("dueno", "dueno@example.com", "x", rol="PROPIETARIO")
+        interesado = crear_interesado()
+        self.corte = date(2030, 6, 30)
+        contratos = []
+        for n, user in ((1, self.dueno), (2, None)):
+            prop = crear_propiedades(crear_propietario(n), 1, fotos=0, propietario_user=user)[0]
+            contratos.append(Contrato.objects.create(
+                propiedad=prop, comprador_arrendatario=interesado, tipo="arriendo",
+                fecha_firma=date(2030, 1, 1), precio_pactado=100,
+            ))
+        # Atrasos de 10, 45, 75 y 120 días en el primer contrato; 5 días en el segundo
+        for dias in (10, 45, 75, 120):
+            CuotaContrato.objects.create(contrato=contratos[0], vencimiento=self.corte - timedelta(days=dias), monto=100)
+        CuotaContrato.objects.create(contrato=contratos[1], vencimiento=self.corte - timedelta(days=5), monto=50)
+        # No cuentan: pagada y por vencer
+        CuotaContrato.objects.create(contrato=contratos[1], vencimiento=self.corte - timedelta(days=40), monto=50, pagada=True)
+        CuotaContrato.objects.create(contrato=contratos[1], vencimiento=self.corte + timedelta(days=1), monto=50)
+        self.client = APIClient()
+
+    def test_tramos_por_propietario_y_contrato(self):
+        self.client.force_authenticate(self.admin)
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(self.url, {"fecha": self.corte.isoformat()})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(ctx), 1)
+        data = resp.json()
+        self.assertEqual(data["totales"], {"0-30": 150, "31-60": 100, "61-90": 100, "90+": 100})
+        primero = data["propietarios"][0]
+        self.assertEqual(primero["tramos"], {"0-30": 100, "31-60": 100, "61-90": 100, "90+": 100})
+        self.assertEqual(primero["contratos"][0]["cuotas"], 4)
+        self.assertEqual(len(data["propietarios"]), 2)
+
+    def test_propietario_ve_solo_lo_suyo(self):
+        self.client.force_authenticate(self.dueno)
+        data = self.client.get(self.url, {"fecha": self.corte.isoformat()}).json()
+        self.assertEqual(len(data["propietarios"]), 1)
+        self.assertEqual(data["totales"]["0-30"], 100)
+
+    def test_csv_en_streaming(self):
+        self.client.force_authenticate(self.admin)
+        resp = self.client.get(self.url, {"fecha": self.corte.isoformat(), "formato": "csv"})
+        self.assertTrue(resp.streaming)
+        filas = list(csv.reader(StringIO(b"".join(resp.streaming_content).decode())))
+        self.assertEqual(filas[0][-2:], ["dias_atraso", "tramo"])
+        self.assertEqual([(f[8], f[9]) for f in filas[1:]], [
+            ("120", "90+"), ("75", "61-90"), ("45", "31-60"), ("10", "0-30"), ("5", "0-30"),
+        ])
+
+
+class ResumenAdminTests(TestCase):
+    url = "/api/admin/resumen/"
+
+    def setUp(self):
+        cache_kpis().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(Usuario.objects.create_user("adm", "adm@example.com", "x", rol="ADMIN"))
+        prop = crear_propiedades(crear_propietario(), 3, fotos=0)[0]
+        Propiedad.objects.filter(pk=prop.pk).update(estado_aprobacion="pendiente")
+        contrato = Contrato.objects.create(
+            propiedad=prop, comprador_arrendatario=crear_interesado(), tipo="arriendo",
+            fecha_firma=timezone.localdate(), precio_pactado=1000,
+        )
+        hoy = timezone.localdate()
+        Pago.objects.create(contrato=contrato, fecha=hoy.replace(day=1), monto=300)
+        Pago.objects.create(contrato=contrato, fecha=hoy.replace(day=1) - timedelta(days=1), monto=999)
+
+    def test_kpis_y_snapshot(self):
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(self.url).json()
+        self.assertLessEqual(len(ctx), 5)
+        self.assertEqual(data["total_propiedades"], 3)
+        self.assertEqual(data["propiedades_por_aprobar"], 1)
+        self.assertEqual(float(data["pagos_mes"]), 300)
+        self.assertIn("calculado_en", data)
+
+        # Dentro del TTL se sirve el snapshot sin tocar la BD
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(self.url).json(), data)
+        self.assertEqual(len(ctx), 0)
+
+    def test_snapshot_vencido_se_sirve_y_refresca_en_segundo_plano(self):
+        self.client.get(self.url)
+        snapshot = cache_kpis().get("kpis:admin_resumen")
+        snapshot["ts"] -= 3600
+        cache_kpis().set("kpis:admin_resumen", snapshot)
+        with mock.patch("inmobiliaria.kpis.threading.Thread") as hilo:
+            self.client.get(self.url)
+            self.client.get(self.url)
+        # Solo un refresco a la vez
+        self.assertEqual(hilo.return_value.start.call_count, 1)
+
+        call_command("refrescar_resumen_admin", stdout=StringIO())
+        self.assertGreater(cache_kpis().get("kpis:admin_resumen")["ts"], snapshot["ts"])
+
+
+class KpiDiarioTests(TestCase):
+    def setUp(self):
+        self.hoy = timezone.localdate()
+        self.props = crear_propiedades(crear_propietario(), 3, fotos=0)
+        self.contrato = Contrato.objects.create(
+            propiedad=self.props[0], comprador_arrendatario=crear_interesado(), tipo="arriendo",
+            fecha_firma=self.hoy, precio_pactado=1000,
+        )
+        Pago.objects.create(contrato=self.contrato, fecha=self.hoy, monto=300)
+        Pago.objects.create(contrato=self.contrato, fecha=self.hoy - timedelta(days=40), monto=200)
+        # Vuelve a pendiente y se aprueba de nuevo: la fecha de aprobación se renueva
+        Propiedad.objects.filter(pk=self.props[1].pk).update(
+            estado_aprobacion="pendiente", aprobada=False, fecha_aprobacion=None,
+        )
+        p = Propiedad.objects.get(pk=self.props[1].pk)
+        p.estado_aprobacion = "aprobada"
+        p.save(update_fields=["aprobada", "estado_aprobacion"])
+        # Aprobada antes de existir fecha_aprobacion: no entra en la serie
+        Propiedad.objects.filter(pk=self.props[2].pk).update(fecha_aprobacion=None)
+
+    def kpi(self, fecha):
+        return KpiDiario.objects.get(fecha=fecha)
+
+    def test_acumula_solo_lo_nuevo(self):
+        despues = timezone.now() + timedelta(minutes=5)
+        acumular_kpis(despues)
+        hoy = self.kpi(self.hoy)
+        self.assertEqual((hoy.propiedades_nuevas, hoy.propiedades_aprobadas, hoy.pagos_cantidad), (3, 2, 1))
+        self.assertEqual(hoy.pagos_monto, 300)
+        self.assertEqual(self.kpi(self.hoy - timedelta(days=40)).pagos_monto, 200)
+
+        # Segunda pasada sin actividad: no cambia nada y no relee las tablas completas
+        self.assertEqual(set(acumular_kpis(despues).values()), {0})
+        Pago.objects.create(contrato=self.contrato, fecha=self.hoy, monto=50)
+        self.assertEqual(acumular_kpis(despues)["pago"], 1)
+        hoy = self.kpi(self.hoy)
+        self.assertEqual((hoy.pagos_cantidad, hoy.pagos_monto, hoy.propiedades_nuevas), (2, 350, 3))
+
+        # El comando lee hasta ahora menos el margen
+        Pago.objects.update(registrado_en=timezone.now() - timedelta(hours=1))
+        call_command("acumular_kpis", reconstruir=True, stdout=StringIO())
+        self.assertEqual(self.kpi(self.hoy).pagos_cantidad, 2)
+
+    def test_margen_en_fuentes_por_id(self):
+        despues = timezone.now() + timedelta(minutes=5)
+        acumular_kpis(despues)
+        # Un pago confirmado con id mayor antes que otro aún abierto: la marca no lo pasa
+        Pago.objects.create(contrato=self.contrato, fecha=self.hoy, monto=70)
+        with sin_conflicto_con_columna():
+            self.assertEqual(acumular_kpis()["pago"], 0)
+            Pago.objects.filter(monto=70).update(registrado_en=despues)
+            Pago.objects.create(contrato=self.contrato, fecha=self.hoy, monto=30)
+            self.assertEqual(acumular_kpis(despues)["pago"], 0)
+            self.assertEqual(acumular_kpis(despues + timedelta(minutes=2))["pago"], 2)
+        hoy = self.kpi(self.hoy)
+        self.assertEqual((hoy.pagos_cantidad, hoy.pagos_monto), (3, 400))
+
+    def test_api_agrupa_por_mes(self):
+        acumular_kpis(timezone.now() + timedelta(minutes=5))
+        client = APIClient()
+        client.force_authenticate(Usuario.objects.create_user("adm", "adm@example.com", "x", rol="ADMIN"))
+        desde = self.hoy - timedelta(days=60)
+        with CaptureQueriesContext(connection) as ctx:
+            resp = client.get("/api/admin/kpis/", {"desde": desde.isoformat(), "hasta": self.hoy.isoformat(), "agrupar": "mes"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(ctx), 1)
+        series = resp.json()["series"]
+        self.assertEqual(sum(float(p["pagos_monto"]) for p in series), 500)
+        self.assertEqual(series[-1]["periodo"], self.hoy.replace(day=1).isoformat())
+        self.assertEqual(client.get("/api/admin/kpis/", {"agrupar": "anio"}).status_code, 400)
+
+
+class AdminUsuariosListTests(TestCase):
+    url = "/api/admin/usuarios/"
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(
+            Usuario.objects.create_user("adm", "adm@example.com", "x", rol="ADMIN", is_staff=True)
+        )
+        region = Region.objects.create(nombre_region="Maule")
+        self.comuna = Comuna.objects.create(nombre_comuna="Talca", region=region)
+
+    def poblar(self, desde, hasta):
+        for n in range(desde, hasta):
+            # Email del usuario con otra capitalización: se empareja normalizado
+            u = Usuario.objects.create_user(f"prop{n}", f"Prop{n}@Example.com", "x", rol="PROPIETARIO")
+            p = Propietario.objects.create(
+                primer_nombre="Ana", segundo_nombre="", primer_apellido="Pérez", segundo_apellido="",
+                rut=f"{3000000 + n}-{n % 10}", telefono=f"+569{1000000 + n}", email=f"prop{n}@example.com",
+            )
+            Direccion_propietario.objects.create(
+                propietario=p, calle_o_pasaje=f"Calle {n}", numero="1",
+                comuna=self.comuna, region=self.comuna.region,
+            )
+            c = Usuario.objects.create_user(f"cli{n}", f"otro{n}@example.com", "x", rol="CLIENTE")
+            Interesado.objects.create(
+                usuario=c, primer_nombre="Luis", segundo_nombre="", primer_apellido="Rojas",
+                segundo_apellido="", rut=f"{4000000 + n}-{n % 10}", telefono=f"+569{2000000 + n}",
+                email=f"cli{n}@example.com",
+            )
+
+    def test_pagina_con_consultas_constantes(self):
+        self.poblar(0, 5)
+        with CaptureQueriesContext(connection) as pocos:
+            data = self.client.get(self.url).json()
+        self.assertEqual(data["count"], 11)
+
+        por_username = {u["username"]: u["perfil"] for u in data["results"]}
+        self.assertEqual(por_username["prop3"]["tipo"], "PROPIETARIO")
+        self.assertEqual(por_username["prop3"]["direccion_principal"]["comuna_nombre"], "Talca")
+        # Cliente enlazado por FK aunque el email no coincida
+        self.assertEqual(por_username["cli3"]["tipo"], "CLIENTE")
+        self.assertIsNone(por_username["adm"])
+
+        self.poblar(5, 30)
+        with CaptureQueriesContext(connection) as muchos:
+            data = self.client.get(self.url, {"page": 2}).json()
+        self.assertEqual(len(data["results"]), 20)
+        self.assertEqual(len(muchos), len(pocos))
+
+        # Detalle usa el mismo resolvedor
+        user = Usuario.objects.get(username="prop7")
+        perfil = self.client.get(f"{self.url}{user.pk}/").json()["perfil"]
+        self.assertEqual(perfil["direccion_principal"]["calle_o_pasaje"], "Calle 7")
+
+    def test_busqueda_por_prefijo_y_relevancia(self):
+        self.poblar(0, 3)
+        p = Propietario.objects.get(email="prop1@example.com")
+        p.primer_nombre, p.primer_apellido = "José", "Núñez"
+        p.save()
+
+        def buscar(texto):
+            data = self.client.get(self.url, {"search": texto}).json()
+            return [u["username"] for u in data["results"]]
+
+        # Sin tildes, por prefijo y todas las palabras deben coincidir
+        self.assertEqual(buscar("jose nu"), ["prop1"])
+        self.assertEqual(buscar("Rojas"), ["cli2", "cli1", "cli0"])
+        self.assertEqual(buscar("3.000.002-2"), ["prop2"])
+        self.assertEqual(buscar("zzz"), [])
+
+        # Cambio de email: el perfil deja de pertenecer al usuario anterior
+        p.email = "otro@example.com"
+        p.save()
+        self.assertEqual(buscar("jose"), [])
+        Usuario.objects.filter(username="prop0").update(email="otro@example.com")
+        call_command("reindexar_busqueda", stdout=StringIO())
+        self.assertEqual(buscar("nunez"), ["prop0"])
+
+
+class PropiedadCambiosTests(TestCase):
+    def setUp(self):
+        self.prop = crear_propiedades(crear_propietario(), 1, fotos=0)[0]
+
+    def test_save_sin_relectura_y_historial_en_lote(self):
+        self.assertEqual(Historial.objects.filter(propiedad=self.prop).count(), 2)
+        p = Propiedad.objects.get(pk=self.prop.pk)
+        p.estado, p.precio = "reservada", 5
+        # UPDATE + INSERT de Historial + INSERT de CambioPrecio; ni save ni la señal releen la fila
+        with CaptureQueriesContext(connection) as ctx:
+            p.save()
+        self.assertEqual(len(ctx), 3)
+        self.assertEqual(
+            set(Historial.objects.filter(propiedad=p, descripcion__startswith="Cambio").values_list("descripcion", flat=True)),
+            {"Cambio de estado: disponible → reservada", "Cambio de precio: 100000.00 → 5"},
+        )
+
+        # Guardar de nuevo sin cambios no agrega historial
+        p.save()
+        p.estado = "vendida"
+        p.save(update_fields=["precio"])
+        self.assertEqual(Historial.objects.filter(propiedad=p).count(), 4)
+
+        # Campos diferidos: una sola lectura de lo que falta
+        p = Propiedad.objects.only("id", "titulo", "estado_aprobacion").get(pk=p.pk)
+        p.estado = "arrendada"
+        with CaptureQueriesContext(connection) as ctx:
+            p.save(update_fields=["estado"])
+        self.assertEqual(len(ctx), 3)
+        self.assertTrue(Historial.objects.filter(descripcion="Cambio de estado: reservada → arrendada").exists())
+
+    def test_aprobacion_notifica_una_vez(self):
+        Propiedad.objects.filter(pk=self.prop.pk).update(estado_aprobacion="pendiente", aprobada=False)
+        usuario = Usuario.objects.create_user("dueno", "d@example.com", "x", rol="PROPIETARIO")
+        Propiedad.objects.filter(pk=self.prop.pk).update(propietario_user=usuario)
+        p = Propiedad.objects.get(pk=self.prop.pk)
+        p.estado_aprobacion = "aprobada"
+        p.save()
+        p.save()
+        self.assertIsNotNone(p.fecha_aprobacion)
+        self.assertEqual(
+            NotificacionOutbox.objects.filter(evento=f"propiedad_aprobada:{p.pk}").count(), 1
+        )
+
+
+class TransicionPropiedadesTests(TestCase):
+    url = "/api/propiedades/transicion/"
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(Usuario.objects.create_user("adm", "adm@example.com", "x", rol="ADMIN"))
+        self.dueno = Usuario.objects.create_user("dueno", "d@example.com", "x", rol="PROPIETARIO")
+
+    def crear(self, cantidad):
+        n = Propietario.objects.count() + 1
+        props = crear_propiedades(crear_propietario(n), cantidad, fotos=0, propietario_user=self.dueno)
+        Propiedad.objects.filter(pk__in=[p.pk for p in props]).update(estado_aprobacion="pendiente", aprobada=False)
+        return [p.pk for p in props]
+
+    def transicion(self, ids, accion, **extra):
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.post(self.url, {"propiedades": ids, "accion": accion, **extra}, format="json")
+        self.assertEqual(r.status_code, 200, r.content)
+        return r.json(), len(ctx)
+
+    def test_lote_con_consultas_fijas(self):
+        pocos, consultas_pocos = self.transicion(self.crear(3), "aprobar")
+        ids = self.crear(40)
+        data, consultas = self.transicion(ids + [pocos["actualizadas"][0], 999999], "rechazar", observacion="Faltan fotos")
+        self.assertEqual(consultas, consultas_pocos)
+        self.assertEqual(len(data["actualizadas"]), 41)
+        self.assertEqual(data["no_existe"], [999999])
+
+        p = Propiedad.objects.get(pk=ids[0])
+        self.assertEqual((p.estado_aprobacion, p.aprobada, p.observacion_admin), ("rechazada", False, "Faltan fotos"))
+        self.assertEqual(
+            Historial.objects.get(propiedad_id=ids[0], accion="cambio_aprobacion").descripcion,
+            "Cambio de aprobación: pendiente → rechazada",
+        )
+        self.assertEqual(NotificacionOutbox.objects.filter(evento__startswith="propiedad_rechazada:").count(), 41)
+
+        # Repetir no cambia nada ni vuelve a notificar
+        data, _ = self.transicion(ids, "rechazar")
+        self.assertEqual((len(data["actualizadas"]), len(data["sin_cambio"])), (0, 40))
+        self.assertEqual(Historial.objects.filter(accion="cambio_aprobacion").count(), 44)
+
+    def test_aprobar_individual_usa_el_mismo_camino(self):
+        pid = self.crear(1)[0]
+        self.client.post(f"/api/propiedades/{pid}/aprobar/")
+        p = Propiedad.objects.get(pk=pid)
+        self.assertTrue(p.aprobada and p.fecha_aprobacion)
+        self.assertTrue(NotificacionOutbox.objects.filter(evento=f"propiedad_aprobada:{pid}").exists())
+
+
+class HistorialPropiedadTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(Usuario.objects.create_user("adm", "adm@example.com", "x", rol="ADMIN"))
+        self.prop = crear_propiedades(crear_propietario(), 1, fotos=0)[0]
+        self.url = f"/api/propiedades/{self.prop.pk}/historial/"
+        ahora = timezone.now()
+        Historial.objects.bulk_create([
+            Historial(propiedad=self.prop, accion="actualizacion_precio", descripcion=f"Cambio {i}")
+            for i in range(30)
+        ])
+        # auto_now_add ignora la fecha en bulk_create: se fija después, un día por fila
+        for i, h in enumerate(Historial.objects.filter(descripcion__startswith="Cambio ").order_by("id")):
+            Historial.objects.filter(pk=h.pk).update(fecha=ahora - timedelta(days=30 * 30 - 30 * i))
+
+    def test_paginado_y_archivado(self):
+        antes = self.client.get(self.url).json()
+        self.assertEqual(antes["count"], 32)
+        self.assertEqual(len(antes["results"]), 20)
+
+        out = StringIO()
+        call_command("archivar_historial", meses=6, chunk=7, stdout=out)
+        self.assertIn("24 filas", out.getvalue())
+        self.assertEqual(Historial.objects.filter(propiedad=self.prop).count(), 8)
+
+        # Mismo resultado leyendo de ambas tablas, con el orden y la acción originales
+        despues = self.client.get(self.url).json()
+        self.assertEqual(despues["results"], antes["results"])
+        self.assertEqual(despues["results"][-1]["accion"], "actualizacion_precio")
+
+        desde = (timezone.localdate() - timedelta(days=30 * 28)).isoformat()
+        hasta = (timezone.localdate() - timedelta(days=30 * 25)).isoformat()
+        rango = self.client.get(self.url, {"desde": desde, "hasta": hasta}).json()
+        self.assertEqual([h["descripcion"] for h in rango["results"]], ["Cambio 5", "Cambio 4", "Cambio 3", "Cambio 2"])
+        self.assertEqual(self.client.get(self.url, {"desde": "ayer"}).status_code, 400)
+
+    def test_accion_sin_codigo_no_se_archiva(self):
+        h = Historial.objects.create(propiedad=self.prop, accion="nueva_accion", descripcion="x")
+        Historial.objects.filter(pk=h.pk).update(fecha=timezone.now() - timedelta(days=400))
+
+        out, err = StringIO(), StringIO()
+        call_command("archivar_historial", meses=6, stdout=out, stderr=err)
+        self.assertIn("24 filas", out.getvalue())
+        self.assertIn("nueva_accion: 1", err.getvalue())
+        self.assertTrue(Historial.objects.filter(pk=h.pk).exists())
+        self.assertFalse(HistorialArchivado.objects.filter(pk=h.pk).exists())
+
+
+class PreciosPropiedadTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.props = crear_propiedades(crear_propietario(), 4, fotos=0)
+        for p, precio in zip(self.props, (300, 100, 200, 900)):
+            p.precio = precio
+            p.save()
+        # Segundo cambio en el mes: cuenta el último
+        self.props[3].precio = 400
+        self.props[3].save()
+
+    def test_serie_y_medianas(self):
+        serie = self.client.get(f"/api/propiedades/{self.props[3].pk}/precios/").json()["serie"]
+        self.assertEqual(
+            [(s["precio_anterior"], s["precio_nuevo"]) for s in serie],
+            [(None, "100003.00"), ("100003.00", "900.00"), ("900.00", "400.00")],
+        )
+
+        mes = timezone.localdate().replace(day=1)
+        filas = self.client.get("/api/propiedades/precios-mercado/", {"ciudad": "talca"}).json()
+        self.assertEqual(filas, [{
+            "mes": mes.isoformat(), "ciudad": "Talca", "tipo": "casa", "mediana": "250.00", "propiedades": 4,
+        }])
+        self.assertEqual(self.client.get("/api/propiedades/precios-mercado/", {"tipo": "oficina"}).json(), [])
+
+    def test_mediana_arrastra_el_ultimo_precio(self):
+        from .precios import medianas_precio
+        mes = timezone.localdate().replace(day=1)
+        hace_dos = (mes - timedelta(days=40)).replace(day=1)
+        CambioPrecio.objects.update(fecha=timezone.now() - timedelta(days=70), mes=hace_dos)
+        # Un solo cambio este mes: las demás propiedades siguen con su último precio
+        self.props[0].precio = 1000
+        self.props[0].save()
+
+        filas = medianas_precio(ciudad="talca", desde=hace_dos)
+        self.assertEqual(
+            [(f["mes"], f["mediana"], f["propiedades"]) for f in filas],
+            [
+                (hace_dos, Decimal("250.00"), 4),
+                ((hace_dos + timedelta(days=32)).replace(day=1), Decimal("250.00"), 4),
+                (mes, Decimal("300.00"), 4),
+            ],
+        )
+        self.assertEqual(len(medianas_precio(desde=mes, hasta=mes)), 1)
+
+    def test_parseo_del_historial(self):
+        from .precios import parsear_descripcion
+        self.assertEqual(parsear_descripcion("Cambio de precio: 100.00 → 120"), (Decimal("100.00"), Decimal("120")))
+        self.assertEqual(parsear_descripcion("Precio inicial: 5000"), (None, Decimal("5000")))
+        self.assertIsNone(parsear_descripcion("Cambio de estado: disponible → vendida"))
+
+
+class BusquedaCatalogoTests(TestCase):
+    url = "/api/catalogo/propiedades/"
+
+    def setUp(self):
+        cache_catalogo().clear()
+        self.client = APIClient()
+        prop = crear_propietario()
+        self.props = crear_propiedades(prop, 4, fotos=0)
+        textos = [
+            ("Casa en Linares", "Amplia, con patio", "Linares", "casa"),
+            ("Departamento céntrico", "Cerca de la plaza de Talca", "Talca", "departamento"),
+            ("Departamentos nuevos", "Edificio con piscina", "Curicó", "departamento"),
+            ("Parcela", "Casa de campo junto al río, casas vecinas lejanas", "Talca", "parcela"),
+        ]
+        for p, (titulo, descripcion, ciudad, tipo) in zip(self.props, textos):
+            p.titulo, p.descripcion, p.ciudad, p.tipo = titulo, descripcion, ciudad, tipo
+            p.save()
+
+    def buscar(self, texto, url=None, **extra):
+        data = self.client.get(url or self.url, {"search": texto, **extra}).json()
+        return [p["id"] for p in data["results"]]
+
+    def test_sin_tildes_prefijo_y_ranking(self):
+        p = self.props
+        self.assertEqual(self.buscar("curico"), [p[2].pk])
+        self.assertEqual(set(self.buscar("departamentos")), {p[1].pk, p[2].pk})
+        self.assertEqual(self.buscar("depa centr"), [p[1].pk])
+        # "casa" en el título pesa más que en la descripción
+        self.assertEqual(self.buscar("casas"), [p[0].pk, p[3].pk])
+        self.assertEqual(self.buscar("casa", ordering="-precio"), [p[3].pk, p[0].pk])
+        self.assertEqual(self.buscar("de la"), [x.pk for x in sorted(p, key=lambda x: x.pk, reverse=True)])
+
+    def test_indice_incremental(self):
+        p = Propiedad.objects.get(pk=self.props[0].pk)
+        p.titulo = "Oficina en Linares"
+        p.save()
+        self.assertEqual(self.buscar("oficina"), [p.pk])
+
+        # Un cambio de precio no reescribe el índice
+        p.precio = 1
+        with CaptureQueriesContext(connection) as ctx:
+            p.save(update_fields=["precio"])
+        self.assertFalse(any("indicebusqueda" in q["sql"].lower() for q in ctx.captured_queries))
+
+        # Propietario y no aprobadas: visibles en la búsqueda del admin, no en el catálogo
+        propietario = p.propietario
+        propietario.primer_apellido = "Zúñiga"
+        propietario.save()
+        Propiedad.objects.filter(pk=p.pk).update(aprobada=False)
+        self.client.force_authenticate(Usuario.objects.create_user("adm", "adm@example.com", "x", rol="ADMIN"))
+        self.assertEqual(len(self.buscar("zuniga", url="/api/propiedades/")), 4)
+        cache_catalogo().clear()
+        self.assertEqual(len(self.buscar("zuniga")), 3)
+
+    def test_sin_columna_de_conflicto(self):
+        # Altas, renombres del propietario y reindexado también deben funcionar en MySQL
+        with sin_conflicto_con_columna():
+            nueva = crear_propiedades(self.props[0].propietario, 1, fotos=0)[0]
+            nueva.titulo = "Bodega industrial"
+            nueva.save()
+            propietario = nueva.propietario
+            propietario.primer_apellido = "Zúñiga"
+            propietario.save()
+            call_command("reindexar_propiedades", stdout=StringIO())
+        self.assertEqual(self.buscar("bodega zuniga"), [nueva.pk])
+        self.assertEqual(IndiceBusquedaPropiedad.objects.count(), 5)
+
+
+class DespachoNotificacionesTests(TestCase):
+    def setUp(self):
+        self.dueno = Usuario.objects.create_user("dueno", "dueno@example.com", "x", rol="PROPIETARIO")
+        self.cliente = Usuario.objects.create_user("cli", "cli@example.com", "x", rol="CLIENTE")
+        self.interesado = crear_interesado()
+        self.interesado.usuario = self.cliente
+        self.interesado.save()
+        self.prop = crear_propiedades(crear_propietario(), 1, fotos=0, propietario_user=self.dueno)[0]
+        NotificacionOutbox.objects.all().delete()
+
+    def test_un_evento_una_fila_de_outbox(self):
+        with CaptureQueriesContext(connection) as ctx:
+            with transaction.atomic(), despacho_notificaciones():
+                reserva = Reserva.objects.create(
+                    propiedad=self.prop, interesado=self.interesado,
+                    expires_at=timezone.now() + timedelta(hours=1),
+                )
+                # Mismo evento que la señal post_save: se descarta
+                notificar_usuario(self.dueno, "Otra", "Duplicada", tipo="RESERVA",
+                                  evento=("reserva_creada", reserva.id))
+        inserts = [q for q in ctx.captured_queries if q["sql"].startswith("INSERT")]
+        self.assertFalse(any("inmobiliaria_notificacion\"" in q["sql"] for q in inserts))
+        evento = NotificacionOutbox.objects.get()
+        self.assertEqual(evento.evento, f"reserva_creada:{reserva.id}")
+        self.assertEqual(len(evento.payload), 2)
+
+        self.assertEqual(drenar()[:2], (1, 0))
+        self.assertEqual(Notificacion.objects.filter(usuario=self.dueno).count(), 1)
+        self.assertEqual(Notificacion.objects.filter(usuario=self.cliente).count(), 1)
+        self.assertFalse(Notificacion.objects.filter(titulo="Otra").exists())
+        self.assertEqual(NotificacionOutbox.objects.get().estado, "enviado")
+        self.assertEqual(metricas()["pendientes"], 0)
+
+    def test_rollback_descarta_evento(self):
+        try:
+            with transaction.atomic(), despacho_notificaciones():
+                notificar_usuario(self.dueno, "T", "M")
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        notificar_usuario(self.cliente, "T", "M")
+        drenar()
+        self.assertEqual(list(Notificacion.objects.values_list("usuario_id", flat=True)), [self.cliente.id])
+
+    def test_reintento_y_fallido(self):
+        notificar_usuario(self.dueno, "T", "M")
+        with mock.patch.object(Notificacion.objects, "bulk_create", side_effect=RuntimeError("smtp caído")):
+            self.assertEqual(drenar()[:2], (0, 1))
+        evento = NotificacionOutbox.objects.get()
+        self.assertEqual((evento.estado, evento.intentos), ("pendiente", 1))
+        self.assertGreater(evento.disponible_en, timezone.now())
+        self.assertIn("smtp caído", evento.ultimo_error)
+        # Aún no disponible: el backoff lo deja fuera del lote
+        self.assertEqual(drenar()[:2], (0, 0))
+
+        NotificacionOutbox.objects.update(disponible_en=timezone.now(), intentos=OUTBOX_MAX_INTENTOS - 1)
+        with mock.patch.object(Notificacion.objects, "bulk_create", side_effect=RuntimeError("smtp caído")):
+            drenar()
+        self.assertEqual(NotificacionOutbox.objects.get().estado, "fallido")
+        self.assertFalse(Notificacion.objects.exists())
 
-# Create your tests here.
+    def test_lease_perdido_no_se_cuenta(self):
+        from . import outbox
+        notificar_usuario(self.dueno, "T", "M")
+        eventos = outbox.reclamar_lote()
+        # Otro worker lo reclamó al vencer el lease
+        NotificacionOutbox.objects.update(intentos=F("intentos") + 1)
+        with mock.patch.object(outbox, "reclamar_lote", return_value=eventos):
+            self.assertEqual(outbox.procesar_lote(), (0, 0, 1))
+            with mock.patch.object(outbox, "entregar", side_effect=RuntimeError("caído")):
+                self.assertEqual(outbox.procesar_lote(), (0, 0, 1))
+        evento = NotificacionOutbox.objects.get()
+        self.assertEqual((evento.estado, evento.ultimo_error), ("pendiente", ""))
+        self.assertFalse(Notificacion.objects.exists())
@@ -5,11 +5,91 @@ from .config import (
     VENTANA_FUTURA_MAX_DIAS,
     LEAD_MINUTES,
 )
+from .feriados import es_feriado, feriados_entre
+
+
+def upsert(modelo, filas, campo_unico, update_fields, batch_size=None):
+    """
+    bulk_create que actualiza 'update_fields' si ya existe una fila con el mismo
+    'campo_unico'. PostgreSQL/SQLite: ON CONFLICT (campo) DO UPDATE. MySQL no
+    admite columna de conflicto: ON DUPLICATE KEY UPDATE (cualquier clave única).
+    Otros motores: UPDATE de las existentes e INSERT de las nuevas.
+    """
+    from django.db import connections, router
+
+    if not filas:
+        return
+    conexion = connections[router.db_for_write(modelo)]
+    features = conexion.features
+    if features.supports_update_conflicts_with_target:
+        modelo.objects.bulk_create(
+            filas, batch_size=batch_size,
+            update_conflicts=True, unique_fields=[campo_unico], update_fields=update_fields,
+        )
+        return
+    if conexion.vendor == "mysql" and features.supports_update_conflicts:
+        modelo.objects.bulk_create(
+            filas, batch_size=batch_size, update_conflicts=True, update_fields=update_fields,
+        )
+        return
+
+    attname = modelo._meta.get_field(campo_unico).attname
+    existentes = dict(
+        modelo.objects
+        .filter(**{f"{attname}__in": [getattr(f, attname) for f in filas]})
+        .values_list(attname, "pk")
+    )
+    nuevas, cambiadas = [], []
+    for fila in filas:
+        pk = existentes.get(getattr(fila, attname))
+        if pk is None:
+            nuevas.append(fila)
+        else:
+            fila.pk = pk
+            cambiadas.append(fila)
+    if cambiadas:
+        modelo.objects.bulk_update(cambiadas, update_fields, batch_size=batch_size)
+    if nuevas:
+        modelo.objects.bulk_create(nuevas, batch_size=batch_size)
+
+
+def con_fotos(qs):
+    # Precarga las fotos ordenadas de todas las propiedades del queryset en una sola consulta
+    from django.db.models import Prefetch
+    from .models import PropiedadFoto
+    return qs.prefetch_related(
+        Prefetch("fotos", queryset=PropiedadFoto.objects.order_by("orden", "id"))
+    )
+
+def con_totales_pago(qs):
+    """
+    Anota total_pagos, saldo, cuotas_pendientes y proximo_vencimiento desde el
+    saldo materializado (SaldoContrato) con un LEFT JOIN. Si a un contrato aún
+    no se le calculó, total_pagos cae a una subconsulta de sus pagos.
+    """
+    from decimal import Decimal
+    from django.db.models import Sum, F, Value, DecimalField, OuterRef, Subquery
+    from django.db.models.functions import Coalesce
+    from .models import Pago
+    monto = DecimalField(max_digits=14, decimal_places=2)
+    pagos = (
+        Pago.objects.filter(contrato=OuterRef("pk"))
+        .values("contrato").annotate(t=Sum("monto")).values("t")
+    )
+    return qs.annotate(
+        total_pagos=Coalesce(
+            F("saldo_actual__total_pagado"), Subquery(pagos, output_field=monto), Value(Decimal("0")),
+            output_field=monto,
+        ),
+        cuotas_pendientes=F("saldo_actual__cuotas_pendientes"),
+        proximo_vencimiento=F("saldo_actual__proximo_vencimiento"),
+    ).annotate(
+        saldo=F("precio_pactado") - F("total_pagos"),
+    )
 
 def es_habil(fecha):
-    # Lunes(0) a Viernes(4) y no feriados
-    from .models import Feriado
-    return fecha.weekday() <= 4 and not Feriado.objects.filter(fecha=fecha).exists()
+    # Lunes(0) a Viernes(4) y no feriados (calendario en memoria, ver feriados.py)
+    return fecha.weekday() <= 4 and not es_feriado(fecha)
 
 def slots_futuro(fecha, hora):
     # True si fecha y hora es en futuro
@@ -41,30 +121,121 @@ def slots_disponibles_para_propiedad(propiedad_id, fecha):
     libres = [h for h in candidatos if h not in ocupados]
     return libres
 
-def generar_agenda_disponible(propiedad_id, start_date=None, days=14):
-    # Genera días habiles con disponibilidad y normaliza cant de días
+def feriados_en_rango(desde, hasta):
+    # Set de fechas feriadas en [desde, hasta] desde el calendario en memoria
+    return feriados_entre(desde, hasta)
+
+def horas_ocupadas_en_rango(propiedad_ids, desde, hasta):
+    # {(propiedad_id, fecha): {horas}} para todas las propiedades con una sola consulta
+    from .models import Visita
+    ocupados = {}
+    filas = (
+        Visita.objects.filter(propiedad_id__in=propiedad_ids, fecha__gte=desde, fecha__lte=hasta)
+        .values_list("propiedad_id", "fecha", "hora")
+    )
+    for prop_id, fecha, hora in filas:
+        ocupados.setdefault((prop_id, fecha), set()).add(hora)
+    return ocupados
+
+def _normalizar_dias(days):
     if days < 1:
-        days = 1
+        return 1
     if days > 31:
-        days = 31
+        return 31
+    return days
+
+def generar_agendas_disponibles(propiedad_ids, start_date=None, days=14):
+    # Agenda de varias propiedades: feriados y visitas de toda la ventana se
+    # cargan en dos consultas y los slots libres se calculan en memoria.
+    days = _normalizar_dias(days)
+    propiedad_ids = list(dict.fromkeys(propiedad_ids))
 
     hoy = timezone.localdate()
     inicio = start_date or hoy
     fin_max = hoy + timedelta(days=VENTANA_FUTURA_MAX_DIAS)
 
+    agendas = {prop_id: [] for prop_id in propiedad_ids}
+    if not propiedad_ids or inicio > fin_max:
+        return agendas
+
+    feriados = feriados_en_rango(inicio, fin_max)
+    ocupados = horas_ocupadas_en_rango(propiedad_ids, inicio, fin_max)
+
+    # Días hábiles de la ventana con sus slots futuros (comunes a todas las propiedades)
+    dias = []
     fecha = inicio
-    salida = []
+    while fecha <= fin_max:
+        if fecha.weekday() <= 4 and fecha not in feriados:
+            candidatos = [h for h in INTERVALO_PERMITIDOS if slots_futuro(fecha, h)]
+            if candidatos:
+                dias.append((fecha, candidatos))
+        fecha += timedelta(days=1)
 
-    while fecha <= fin_max and len(salida) < days:
-        if es_habil(fecha):
-            libres = slots_disponibles_para_propiedad(propiedad_id, fecha)
+    for prop_id in propiedad_ids:
+        salida = agendas[prop_id]
+        for fecha, candidatos in dias:
+            tomadas = ocupados.get((prop_id, fecha), ())
+            libres = [h for h in candidatos if h not in tomadas]
             if libres:  # Solo días con disponibilidad
                 salida.append({
                     "fecha": fecha.isoformat(),
                     "weekday": fecha.weekday(),
-                    "is_holiday": False, 
+                    "is_holiday": False,
                     "slots": [t.strftime("%H:%M") for t in libres],
                 })
-        fecha += timedelta(days=1)
+                if len(salida) >= days:
+                    break
+
+    return agendas
+
+def generar_agenda_disponible(propiedad_id, start_date=None, days=14):
+    # Genera días habiles con disponibilidad y normaliza cant de días
+    return generar_agendas_disponibles([propiedad_id], start_date=start_date, days=days)[propiedad_id]
+
+def disponibilidad_propiedades(propiedades_qs, fechas):
+    # Produce (id, titulo, {fecha: [horas libres]}) para las propiedades del
+    # queryset con algún slot libre. Usa una consulta de Feriado y una de Visita
+    # ordenada por propiedad, que se consume en paralelo con las propiedades
+    # (merge por id) sin cargar todo en memoria.
+    from .models import Visita
+
+    fechas = sorted(set(fechas))
+    if not fechas:
+        return
+    feriados = feriados_entre(fechas[0], fechas[-1])
+    # Mismas reglas que slots_disponibles_para_propiedad, evaluadas una vez por fecha
+    candidatos = {}
+    for fecha in fechas:
+        if fecha.weekday() <= 4 and fecha not in feriados:
+            horas = [h for h in INTERVALO_PERMITIDOS if slots_futuro(fecha, h)]
+            if horas:
+                candidatos[fecha] = horas
+    habiles = list(candidatos)
+    if not habiles:
+        return
+
+    visitas = iter(
+        Visita.objects.filter(fecha__in=habiles, propiedad__in=propiedades_qs.values("id"))
+        .order_by("propiedad_id")
+        .values_list("propiedad_id", "fecha", "hora")
+        .iterator(chunk_size=2000)
+    )
+    pendiente = next(visitas, None)
+
+    propiedades = propiedades_qs.order_by("id").values_list("id", "titulo").iterator(chunk_size=500)
+    for prop_id, titulo in propiedades:
+        ocupados = {}
+        while pendiente is not None and pendiente[0] < prop_id:
+            pendiente = next(visitas, None)
+        while pendiente is not None and pendiente[0] == prop_id:
+            ocupados.setdefault(pendiente[1], set()).add(pendiente[2])
+            pendiente = next(visitas, None)
 
-    return salida
+        libres = {}
+        for fecha, horas in candidatos.items():
+            tomadas = ocupados.get(fecha, ())
+            libres_dia = [h for h in horas if h not in tomadas]
+            if libres_dia:
+                libres[fecha] = libres_dia
+        if libres:
+            yield prop_id, titulo, libres
@@ -1,6 +1,7 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import HttpResponse, JsonResponse
-from datetime import datetime
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+import json
+from datetime import datetime, timedelta
 from django.utils import timezone
 
 from django.db.models import Sum, Count, Q
@@ -27,6 +28,10 @@ from .serializers import (
     VisitaSerializer,
     PagoSerializer,
     CuotaContratoSerializer,
+    PagarCuotaSerializer,
+    GenerarCuotasSerializer,
+    PagarCuotasLoteSerializer,
+    TransicionPropiedadesSerializer,
     PropiedadConFotosSerializer,
     PropiedadFotoSerializer,
     PropiedadDocumentoSerializer,
@@ -34,10 +39,19 @@ from .serializers import (
     ContratoSerializer,
     ReservaSerializer,
     HistorialSerializer,
+    CambioPrecioSerializer,
+    MedianaPrecioSerializer,
     SolicitudClienteSerializer,
 )
 
-from .notifications import notificar_usuario
+from django.db import transaction
+
+from .notifications import notificar_usuario, despacho_notificaciones
+from .cuotas import generar_cronogramas, pagar_cuotas
+from .aprobaciones import transicionar_propiedades
+from .historial import historial_propiedad
+from .precios import serie_precios, medianas_precio
+from .reportes import resumen_morosidad, csv_morosidad
 
 from .config import *
 from .utils import *
@@ -45,7 +59,9 @@ from .permissions import ReadOnlyOrAdminAsesor
 
 from .permisssions_roles import PropiedadPermission, IsAdmin, NotificacionPermission
 
-from .filters import PropiedadFilter
+from .filters import PropiedadFilter, BusquedaTextoFilter
+from .pagination import PaginacionMixta
+from rest_framework.pagination import PageNumberPagination
 
 # Create your views here.
 
@@ -118,12 +134,8 @@ class VisitaViewSet(viewsets.ModelViewSet):
         libres = slots_disponibles_para_propiedad(int(prop_id), fecha)
         return Response([h.strftime("%H:%M") for h in libres], status=200)
 
-    @action(detail=False, methods=["GET"], url_path="agenda")
-    def agenda(self, request):
-        prop_id = request.query_params.get("propiedad")
-        if not prop_id:
-            return Response({"detail": "Falta propiedad"}, status=400)
-
+    def _parametros_agenda(self, request):
+        # Retorna (start, days) o lanza ValueError con el mensaje para el cliente
         start_str = request.query_params.get("start")
         days_str = request.query_params.get("days")
 
@@ -132,7 +144,7 @@ class VisitaViewSet(viewsets.ModelViewSet):
             try:
                 start = datetime.strptime(start_str, "%Y-%m-%d").date()
             except ValueError:
-                return Response({"detail": "start inválido, use YYYY-MM-DD"}, status=400)
+                raise ValueError("start inválido, use YYYY-MM-DD")
 
         days = DEFAULT_DAYS_PAGE
         if days_str:
@@ -144,10 +156,81 @@ class VisitaViewSet(viewsets.ModelViewSet):
             days = 1
         if days > MAX_DAYS_PAGE:
             days = MAX_DAYS_PAGE
+        return start, days
+
+    @action(detail=False, methods=["GET"], url_path="agenda")
+    def agenda(self, request):
+        prop_id = request.query_params.get("propiedad")
+        if not prop_id:
+            return Response({"detail": "Falta propiedad"}, status=400)
+
+        try:
+            start, days = self._parametros_agenda(request)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=400)
 
         data = generar_agenda_disponible(int(prop_id), start_date=start, days=days)
         return Response(data, status=200)
 
+    @action(detail=False, methods=["GET"], url_path="agendas")
+    def agendas(self, request):
+        # Agenda de varias propiedades en lote: ?propiedades=1,2,3
+        ids_str = request.query_params.get("propiedades", "")
+        try:
+            prop_ids = [int(x) for x in ids_str.split(",") if x.strip()]
+        except ValueError:
+            return Response({"detail": "propiedades debe ser una lista de ids separados por coma"}, status=400)
+        if not prop_ids:
+            return Response({"detail": "Falta propiedades"}, status=400)
+        if len(prop_ids) > MAX_PROPIEDADES_AGENDA:
+            return Response({"detail": f"Máximo {MAX_PROPIEDADES_AGENDA} propiedades por consulta"}, status=400)
+
+        try:
+            start, days = self._parametros_agenda(request)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=400)
+
+        agendas = generar_agendas_disponibles(prop_ids, start_date=start, days=days)
+        return Response({str(k): v for k, v in agendas.items()}, status=200)
+
+    @action(detail=False, methods=["GET"], url_path="disponibilidad")
+    def disponibilidad(self, request):
+        # Propiedades aprobadas de una ciudad con algún slot libre en las fechas pedidas:
+        # ?ciudad=Talca&fechas=2025-01-06,2025-01-07[&tipo=casa]
+        ciudad = (request.query_params.get("ciudad") or "").strip()
+        fechas_str = request.query_params.get("fechas") or ""
+        if not ciudad or not fechas_str:
+            return Response({"detail": "Falta ciudad o fechas"}, status=400)
+        try:
+            fechas = [datetime.strptime(f.strip(), "%Y-%m-%d").date() for f in fechas_str.split(",") if f.strip()]
+        except ValueError:
+            return Response({"detail": "Formato de fecha inválido (YYYY-MM-DD)"}, status=400)
+        if len(fechas) > MAX_DAYS_PAGE:
+            return Response({"detail": f"Máximo {MAX_DAYS_PAGE} fechas por consulta"}, status=400)
+
+        qs = Propiedad.objects.filter(aprobada=True, ciudad__iexact=ciudad)
+        tipo = request.query_params.get("tipo")
+        if tipo:
+            qs = qs.filter(tipo__iexact=tipo)
+
+        def generar():
+            yield "["
+            primero = True
+            for prop_id, titulo, libres in disponibilidad_propiedades(qs, fechas):
+                item = {
+                    "propiedad": prop_id,
+                    "titulo": titulo,
+                    "fechas": [
+                        {"fecha": f.isoformat(), "slots": [h.strftime("%H:%M") for h in horas]}
+                        for f, horas in libres.items()
+                    ],
+                }
+                yield ("" if primero else ",") + json.dumps(item, ensure_ascii=False)
+                primero = False
+            yield "]"
+
+        return StreamingHttpResponse(generar(), content_type="application/json")
+
 
 
 class ReservaViewSet(viewsets.ModelViewSet):
@@ -203,63 +286,63 @@ class ReservaViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # ---- Cancelar ----
-        reserva.activa = False
-        reserva.save()
+        with transaction.atomic(), despacho_notificaciones():
+            # ---- Cancelar ----
+            reserva.activa = False
+            reserva.save()
 
-        # ---- Notificaciones ----
-        interesado = reserva.interesado
+            # ---- Notificaciones (un solo bulk_create al confirmar) ----
+            interesado = reserva.interesado
+            evento = ("reserva_cancelada", reserva.id)
 
-        propietario_user = getattr(propiedad, "propietario_user", None)
-        if not propietario_user and hasattr(propiedad, "propietario"):
-            propietario_user = getattr(propiedad.propietario, "usuario", None)
+            propietario_user = propiedad.propietario_user_id or propiedad.propietario.usuario_id
+            cliente_user = interesado.usuario_id
 
-        cliente_user = getattr(interesado, "usuario", None)
+            titulo = f"Reserva cancelada en '{propiedad.titulo}'"
 
-        titulo = f"Reserva cancelada en '{propiedad.titulo}'"
-
-        msg_prop = (
-            f"Has cancelado la reserva #{reserva.id} de "
-            f"{interesado.nombre_completo} para la propiedad '{propiedad.titulo}'."
-        )
-        notificar_usuario(propietario_user, titulo, msg_prop, tipo="RESERVA")
-
-        if cliente_user:
-            msg_cli = (
-                f"El propietario ha cancelado tu reserva #{reserva.id} "
-                f"para la propiedad '{propiedad.titulo}'."
+            msg_prop = (
+                f"Has cancelado la reserva #{reserva.id} de "
+                f"{interesado.nombre_completo} para la propiedad '{propiedad.titulo}'."
             )
-            notificar_usuario(cliente_user, titulo, msg_cli, tipo="RESERVA")
+            notificar_usuario(propietario_user, titulo, msg_prop, tipo="RESERVA", evento=evento)
+
+            if cliente_user:
+                msg_cli = (
+                    f"El propietario ha cancelado tu reserva #{reserva.id} "
+                    f"para la propiedad '{propiedad.titulo}'."
+                )
+                notificar_usuario(cliente_user, titulo, msg_cli, tipo="RESERVA", evento=evento)
 
         serializer = self.get_serializer(reserva)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     def perform_create(self, serializer):
-        reserva = serializer.save(creada_por=self.request.user)
-        prop = reserva.propiedad
-        interesado = reserva.interesado
-
-        propietario_user = getattr(prop, "propietario_user", None)
-        if not propietario_user and hasattr(prop, "propietario"):
-            propietario_user = getattr(prop.propietario, "usuario", None)
-
-        cliente_user = getattr(interesado, "usuario", None)
-
-        titulo = f"Nueva reserva en '{prop.titulo}'"
-
-        msg_prop = (
-            f"Se creó la reserva #{reserva.id} para la propiedad '{prop.titulo}' "
-            f"a nombre de {interesado.nombre_completo} por "
-            f"${reserva.monto_reserva:,.0f}."
-        )
-        notificar_usuario(propietario_user, titulo, msg_prop, tipo="RESERVA")
-
-        if cliente_user:
-            msg_cli = (
-                f"Hemos registrado tu reserva #{reserva.id} para la propiedad "
-                f"'{prop.titulo}' por ${reserva.monto_reserva:,.0f}."
+        # La señal post_save de Reserva notifica el mismo evento: el despacho
+        # descarta los duplicados y escribe todo en un bulk_create al confirmar.
+        with transaction.atomic(), despacho_notificaciones():
+            reserva = serializer.save(creada_por=self.request.user)
+            prop = reserva.propiedad
+            interesado = reserva.interesado
+            evento = ("reserva_creada", reserva.id)
+
+            propietario_user = prop.propietario_user_id or prop.propietario.usuario_id
+            cliente_user = interesado.usuario_id
+
+            titulo = f"Nueva reserva en '{prop.titulo}'"
+
+            msg_prop = (
+                f"Se creó la reserva #{reserva.id} para la propiedad '{prop.titulo}' "
+                f"a nombre de {interesado.nombre_completo} por "
+                f"${reserva.monto_reserva:,.0f}."
             )
-            notificar_usuario(cliente_user, titulo, msg_cli, tipo="RESERVA")
+            notificar_usuario(propietario_user, titulo, msg_prop, tipo="RESERVA", evento=evento)
+
+            if cliente_user:
+                msg_cli = (
+                    f"Hemos registrado tu reserva #{reserva.id} para la propiedad "
+                    f"'{prop.titulo}' por ${reserva.monto_reserva:,.0f}."
+                )
+                notificar_usuario(cliente_user, titulo, msg_cli, tipo="RESERVA", evento=evento)
 
     
     
@@ -270,7 +353,9 @@ class ContratoViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         rol = getattr(user, "rol", "")
-        qs = Contrato.objects.all().select_related("comprador_arrendatario", "propiedad").order_by("-fecha_firma")
+        qs = con_totales_pago(
+            Contrato.objects.all().select_related("comprador_arrendatario", "propiedad")
+        ).order_by("-fecha_firma")
         if rol == "ADMIN":
             return qs
         if rol == "CLIENTE":
@@ -288,6 +373,8 @@ class ContratoViewSet(viewsets.ModelViewSet):
 class PagoViewSet(viewsets.ModelViewSet):
     serializer_class = PagoSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacionMixta
+    cursor_ordering = ("-fecha", "-id")
 
     def get_queryset(self):
         user = self.request.user
@@ -307,41 +394,42 @@ class PagoViewSet(viewsets.ModelViewSet):
         return qs.none()
 
     def perform_create(self, serializer):
-        pago = serializer.save()
-        contrato = pago.contrato
-        prop = contrato.propiedad
-        comprador = contrato.comprador_arrendatario
-
-        propietario_user = getattr(prop, "propietario_user", None)
-        if not propietario_user and hasattr(prop, "propietario"):
-            propietario_user = getattr(prop.propietario, "usuario", None)
+        with transaction.atomic(), despacho_notificaciones():
+            pago = serializer.save()
+            contrato = pago.contrato
+            prop = contrato.propiedad
+            comprador = contrato.comprador_arrendatario
+            evento = ("pago_creado", pago.id)
 
-        cliente_user = getattr(comprador, "usuario", None)
+            propietario_user = prop.propietario_user_id or prop.propietario.usuario_id
+            cliente_user = comprador.usuario_id
 
-        titulo = f"Pago registrado para '{prop.titulo}'"
+            titulo = f"Pago registrado para '{prop.titulo}'"
 
-        msg_prop = (
-            f"Se registró un pago de ${pago.monto:,.0f} para el contrato "
-            f"#{contrato.id} de la propiedad '{prop.titulo}'."
-        )
-        notificar_usuario(propietario_user, titulo, msg_prop, tipo="PAGO")
-
-        if cliente_user:
-            msg_cli = (
-                f"Hemos registrado tu pago de ${pago.monto:,.0f} "
-                f"para el contrato #{contrato.id} de la propiedad '{prop.titulo}'."
+            msg_prop = (
+                f"Se registró un pago de ${pago.monto:,.0f} para el contrato "
+                f"#{contrato.id} de la propiedad '{prop.titulo}'."
             )
-            notificar_usuario(cliente_user, titulo, msg_cli, tipo="PAGO")
+            notificar_usuario(propietario_user, titulo, msg_prop, tipo="PAGO", evento=evento)
+
+            if cliente_user:
+                msg_cli = (
+                    f"Hemos registrado tu pago de ${pago.monto:,.0f} "
+                    f"para el contrato #{contrato.id} de la propiedad '{prop.titulo}'."
+                )
+                notificar_usuario(cliente_user, titulo, msg_cli, tipo="PAGO", evento=evento)
 
     
 class PropiedadViewSet(viewsets.ModelViewSet):
     queryset = Propiedad.objects.all().order_by("-fecha_registro")
     permission_classes = [PropiedadPermission]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    # ?search= usa el índice de texto (título, descripción, ciudad, tipo, propietario)
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, BusquedaTextoFilter]
     filterset_class = PropiedadFilter
-    search_fields = ["titulo", "descripcion", "ciudad", "propietario__primer_nombre", "propietario__rut"]
     ordering_fields = ["precio", "metros2", "dormitorios", "baos", "fecha_registro"]
     ordering = ["-fecha_registro"]
+    pagination_class = PaginacionMixta
+    cursor_ordering = ("-fecha_registro", "-id")
 
     def get_serializer_class(self):
         if self.action in ["list", "retrieve"]:
@@ -349,7 +437,7 @@ class PropiedadViewSet(viewsets.ModelViewSet):
         return PropiedadSerializer
 
     def get_queryset(self):
-        qs = super().get_queryset()
+        qs = con_fotos(super().get_queryset())
         user = self.request.user
 
         # visitante no autenticado
@@ -384,30 +472,39 @@ class PropiedadViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=["post"], permission_classes=[IsAdmin])
     def aprobar(self, request, pk=None):
         propiedad = self.get_object()
-        propiedad.aprobada = True
-        propiedad.estado_aprobacion = "aprobada"
-        propiedad.observacion_admin = ""
-        propiedad.save(update_fields=["aprobada", "estado_aprobacion", "observacion_admin"])
+        transicionar_propiedades([propiedad.pk], "aprobar", usuario=request.user.username)
         return Response({"detail": "Propiedad aprobada exitosamente."})
 
     @action(detail=True, methods=["post"], permission_classes=[IsAdmin])
     def rechazar(self, request, pk=None):
         propiedad = self.get_object()
         obs = request.data.get("observacion", "")
-        propiedad.aprobada = False
-        propiedad.estado_aprobacion = "rechazada"
-        propiedad.observacion_admin = obs
-        propiedad.save(update_fields=["aprobada", "estado_aprobacion", "observacion_admin"])
+        transicionar_propiedades([propiedad.pk], "rechazar", observacion=obs, usuario=request.user.username)
         return Response({"detail": "Propiedad rechazada.", "observacion": obs})
 
     @action(detail=True, methods=["post"], permission_classes=[IsAdmin])
     def pausar(self, request, pk=None):
         propiedad = self.get_object()
-        propiedad.aprobada = False
-        propiedad.estado_aprobacion = "pausada"
-        propiedad.save(update_fields=["aprobada", "estado_aprobacion"])
+        transicionar_propiedades([propiedad.pk], "pausar", usuario=request.user.username)
         return Response({"detail": "Propiedad pausada."})
 
+    @action(detail=False, methods=["post"], permission_classes=[IsAdmin])
+    def transicion(self, request):
+        """
+        Aprueba, rechaza o pausa muchas propiedades en una transacción.
+        Body: {"propiedades": [ids], "accion": "aprobar"|"rechazar"|"pausar", "observacion"?}
+        """
+        ser = TransicionPropiedadesSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        datos = ser.validated_data
+        resultado = transicionar_propiedades(
+            datos["propiedades"], datos["accion"],
+            observacion=datos["observacion"], usuario=request.user.username,
+        )
+        encontradas = set(resultado["actualizadas"]) | set(resultado["sin_cambio"])
+        resultado["no_existe"] = sorted(set(datos["propiedades"]) - encontradas)
+        return Response(resultado, status=status.HTTP_200_OK)
+
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop("partial", False)
         instance = self.get_object()
@@ -440,10 +537,59 @@ class PropiedadViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=["get"], url_path="historial")
     def historial(self, request, pk=None):
+        """
+        Historial paginado (vigente + archivado), del más reciente al más antiguo.
+        Filtros opcionales ?desde=YYYY-MM-DD&hasta=YYYY-MM-DD (ambos inclusive).
+        """
         propiedad = self.get_object()
-        qs = Historial.objects.filter(propiedad=propiedad).order_by("-fecha")
-        serializer = HistorialSerializer(qs, many=True)
-        return Response(serializer.data)
+        try:
+            desde, hasta = (
+                datetime.strptime(request.query_params[p], "%Y-%m-%d").date() if request.query_params.get(p) else None
+                for p in ("desde", "hasta")
+            )
+        except ValueError:
+            return Response({"detail": "Formato de fecha inválido (YYYY-MM-DD)"}, status=400)
+
+        def inicio_dia(d):
+            return timezone.make_aware(datetime.combine(d, datetime.min.time()))
+
+        qs = historial_propiedad(
+            propiedad.pk,
+            desde=inicio_dia(desde) if desde else None,
+            hasta=inicio_dia(hasta + timedelta(days=1)) if hasta else None,
+        )
+        # Paginación por número: el cursor no aplica sobre la unión de las dos tablas
+        paginador = PageNumberPagination()
+        pagina = paginador.paginate_queryset(qs, request, view=self)
+        return paginador.get_paginated_response(HistorialSerializer(pagina, many=True).data)
+
+    @action(detail=True, methods=["get"])
+    def precios(self, request, pk=None):
+        # Serie numérica de precios de la propiedad (ver CambioPrecio)
+        propiedad = self.get_object()
+        serie = CambioPrecioSerializer(serie_precios(propiedad.pk), many=True).data
+        return Response({"propiedad": propiedad.pk, "serie": serie})
+
+    @action(detail=False, methods=["get"], url_path="precios-mercado")
+    def precios_mercado(self, request):
+        """
+        Mediana mensual del precio por ciudad y tipo (propiedades aprobadas).
+        Filtros: ?ciudad=&tipo=&desde=YYYY-MM&hasta=YYYY-MM
+        """
+        try:
+            desde, hasta = (
+                datetime.strptime(request.query_params[p], "%Y-%m").date() if request.query_params.get(p) else None
+                for p in ("desde", "hasta")
+            )
+        except ValueError:
+            return Response({"detail": "Formato de mes inválido (YYYY-MM)"}, status=400)
+        filas = medianas_precio(
+            ciudad=request.query_params.get("ciudad"),
+            tipo=request.query_params.get("tipo"),
+            desde=desde,
+            hasta=hasta,
+        )
+        return Response(MedianaPrecioSerializer(filas, many=True).data)
 
 
 class PropiedadFotoViewSet(viewsets.ModelViewSet):
@@ -503,6 +649,40 @@ class PropiedadFotoViewSet(viewsets.ModelViewSet):
 class CuotaContratoViewSet(viewsets.ModelViewSet):
     queryset = CuotaContrato.objects.select_related("contrato", "pago").all()
     serializer_class = CuotaContratoSerializer 
+    filterset_fields = ["contrato", "pagada"]
+
+    @action(detail=False, methods=["get"])
+    def morosidad(self, request):
+        """
+        Cuotas vencidas e impagas al corte (?fecha=YYYY-MM-DD, por defecto hoy) en
+        tramos de atraso por propietario y contrato. ?formato=csv descarga el
+        detalle por cuota en streaming. ADMIN ve todo (?propietario=id filtra);
+        PROPIETARIO solo sus contratos.
+        """
+        user = request.user
+        rol = getattr(user, "rol", "")
+        qs = CuotaContrato.objects.all()
+        if rol == "PROPIETARIO":
+            qs = qs.filter(contrato__propiedad__propietario_user=user)
+        elif rol != "ADMIN":
+            raise PermissionDenied("Solo administradores y propietarios.")
+        elif request.query_params.get("propietario"):
+            propietario = request.query_params["propietario"]
+            if not propietario.isdigit():
+                return Response({"detail": "propietario debe ser un id numérico"}, status=400)
+            qs = qs.filter(contrato__propiedad__propietario_id=propietario)
+
+        try:
+            fecha = request.query_params.get("fecha")
+            corte = datetime.strptime(fecha, "%Y-%m-%d").date() if fecha else timezone.localdate()
+        except ValueError:
+            return Response({"detail": "Formato de fecha inválido (YYYY-MM-DD)"}, status=400)
+
+        if request.query_params.get("formato") == "csv":
+            resp = StreamingHttpResponse(csv_morosidad(qs, corte), content_type="text/csv; charset=utf-8")
+            resp["Content-Disposition"] = f'attachment; filename="morosidad_{corte.isoformat()}.csv"'
+            return resp
+        return Response(resumen_morosidad(qs, corte))
 
     @action(detail=True, methods=["post"])
     def pagar(self, request, pk=None):
@@ -511,12 +691,51 @@ class CuotaContratoViewSet(viewsets.ModelViewSet):
         ser.is_valid(raise_exception=True)
         pago = cuota.registrar_pago(**ser.validated_data)
         return Response({"detalle": "Cuota pagada correctamente.", "pago_id": pago.id}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["post"], url_path="pagar-lote", permission_classes=[IsAdmin])
+    def pagar_lote(self, request):
+        """
+        Paga muchas cuotas (de distintos contratos) en una transacción.
+        Body: {"pagos": [{"cuota": id, "monto": "1000.00", "fecha"?, "medio"?, "notas"?}]}
+        Responde un resultado por línea: pagada, monto_distinto, ya_pagada,
+        bloqueada (tomada por otra transacción), no_existe o duplicada.
+        """
+        ser = PagarCuotasLoteSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        resultados = pagar_cuotas(ser.validated_data["pagos"])
+        resumen = {}
+        for r in resultados:
+            resumen[r["estado"]] = resumen.get(r["estado"], 0) + 1
+        return Response({"resumen": resumen, "resultados": resultados}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["post"], permission_classes=[IsAdmin])
+    def generar(self, request):
+        """
+        Genera (o regenera) en lote el cronograma mensual de varios contratos de arriendo.
+        Body: {"contratos": [ids], "cuotas": 12, "dia": 5, "monto": opcional,
+               "redondeo": 1|10|100|1000, "reemplazar": false}
+        """
+        ser = GenerarCuotasSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        datos = ser.validated_data
+        with transaction.atomic():
+            contratos, creadas = generar_cronogramas(
+                datos["contratos"],
+                datos["cuotas"],
+                dia=datos.get("dia"),
+                monto=datos.get("monto"),
+                redondeo=datos["redondeo"],
+                reemplazar=datos["reemplazar"],
+            )
+        return Response({"contratos": contratos, "cuotas_creadas": creadas}, status=status.HTTP_201_CREATED)
     
 class NotificacionViewSet(viewsets.ModelViewSet):
     serializer_class = NotificacionSerializer
     permission_classes = [IsAuthenticated, NotificacionPermission]
     filterset_fields = ["tipo", "leida"]
     ordering = ["-created_at"]
+    pagination_class = PaginacionMixta
+    cursor_ordering = ("-created_at", "-id")
 
     def get_queryset(self):
         qs = Notificacion.objects.select_related("usuario").order_by("-created_at")
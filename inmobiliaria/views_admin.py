@@ -11,6 +11,7 @@ from .serializers import (
 )
 
 from .permisssions_roles import IsAdmin
+from .kpis import respuesta_resumen
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 
@@ -18,38 +19,8 @@ from rest_framework.response import Response
 @api_view(["GET"])
 @permission_classes([permissions.IsAuthenticated, IsAdmin])
 def admin_resumen(request):
-    hoy = timezone.localdate()
-
-    propiedades_por_aprobar = Propiedad.objects.filter(
-        estado_aprobacion__in=["pendiente", "en_revision"]
-    ).count()
-
-    reservas_activas = Reserva.objects.filter(
-        activa=True,
-        expires_at__gt=timezone.now(),
-    ).count()
-
-    solicitudes_nuevas = SolicitudCliente.objects.filter(
-        estado="nueva"
-    ).count()
-
-    pagos_mes = (
-        Pago.objects.filter(
-            fecha__year=hoy.year,
-            fecha__month=hoy.month,
-        ).aggregate(total=Sum("monto"))["total"]
-        or 0
-    )
-
-    data = {
-        "total_propiedades": Propiedad.objects.count(),
-        "total_propietarios": Propietario.objects.count(),
-        "propiedades_por_aprobar": propiedades_por_aprobar,
-        "reservas_activas": reservas_activas,
-        "solicitudes_nuevas": solicitudes_nuevas,
-        "pagos_mes": pagos_mes,
-    }
-    return Response(data)
+    # Snapshot cacheado (ver kpis.resumen_admin); el cálculo vive en kpis.calcular_resumen
+    return Response(respuesta_resumen())
 
 # PROPIETARIO
 class AdminPropietarioListCreateView(generics.ListCreateAPIView):